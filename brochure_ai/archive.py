@@ -0,0 +1,194 @@
+"""
+Archivo de snapshots de sitios: graba las descargas de un run y las reproduce.
+
+Con record(path) cada fetch_page (estado, cabeceras y cuerpo) se añade a un
+único fichero comprimido; con replay(path) fetch_page sirve las páginas desde
+ese fichero sin tocar la red, así que regenerar un folleto o repetir un
+benchmark da siempre el mismo resultado.
+
+Formato (al estilo WARC, una entrada por URL):
+- cada registro es un miembro gzip independiente: una línea JSON de cabecera
+  (url, status, headers, encoding, final_url, fetched_at) y el cuerpo en bytes
+- al cerrar se añade un miembro gzip con el índice {url: [offset, length]}
+- y una cola fija de 16 bytes: INDEX_MAGIC + offset del índice (8 bytes)
+
+Cualquier registro se lee con un seek y una descompresión, sin recorrer el
+fichero. Si una URL se descargó varias veces gana la última.
+"""
+import gzip
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b"BRARCIDX"
+_TAIL = struct.Struct(">8sQ")
+
+_MODE: Optional[str] = None
+_ARCHIVE: Any = None
+_LOCK = threading.Lock()
+
+
+class ArchiveError(Exception):
+    """Fichero de archivo inválido o incompleto."""
+
+
+class ArchiveMiss(LookupError):
+    """La URL no está en el archivo que se reproduce."""
+
+
+class ArchiveWriter:
+    """
+    Añade registros a un archivo nuevo. Thread-safe (batch, prefetch).
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._f = open(path, "wb")
+        self._index: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        url: str,
+        status: int,
+        headers: Dict[str, str],
+        body: bytes,
+        encoding: Optional[str] = None,
+        final_url: Optional[str] = None,
+    ) -> None:
+        header = {
+            "url": url,
+            "status": status,
+            "headers": dict(headers),
+            "encoding": encoding,
+            "final_url": final_url or url,
+            "fetched_at": time.time(),
+            "length": len(body),
+        }
+        member = gzip.compress(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n" + body, mtime=0)
+        with self._lock:
+            if self._f.closed:  # descarga que acaba después de cerrar el run
+                return
+            offset = self._f.tell()
+            self._f.write(member)
+            self._index[url] = [offset, len(member)]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._f.closed:
+                return
+            offset = self._f.tell()
+            self._f.write(gzip.compress(json.dumps(self._index).encode("utf-8"), mtime=0))
+            self._f.write(_TAIL.pack(INDEX_MAGIC, offset))
+            self._f.close()
+        logger.info("Archive saved: %s (%d urls)", self.path, len(self._index))
+
+
+class ArchiveReader:
+    """
+    Acceso aleatorio a los registros de un archivo cerrado.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        self._lock = threading.Lock()
+        try:
+            self._f.seek(-_TAIL.size, os.SEEK_END)
+            magic, offset = _TAIL.unpack(self._f.read(_TAIL.size))
+            if magic != INDEX_MAGIC:
+                raise ArchiveError(f"{path}: missing index (archive not closed?)")
+            end = self._f.seek(0, os.SEEK_END) - _TAIL.size
+            self._f.seek(offset)
+            self.index: Dict[str, List[int]] = json.loads(gzip.decompress(self._f.read(end - offset)))
+        except (OSError, ValueError, struct.error) as e:
+            self._f.close()
+            raise ArchiveError(f"{path}: {e}") from e
+        except ArchiveError:
+            self._f.close()
+            raise
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.index
+
+    def urls(self) -> List[str]:
+        return list(self.index)
+
+    def get(self, url: str) -> Dict[str, Any]:
+        """
+        Registro de url: la cabecera JSON más "body" (bytes).
+        """
+        if url not in self.index:
+            raise ArchiveMiss(url)
+        offset, length = self.index[url]
+        with self._lock:
+            self._f.seek(offset)
+            data = gzip.decompress(self._f.read(length))
+        head, _, body = data.partition(b"\n")
+        record = json.loads(head)
+        record["body"] = body
+        return record
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def record(path: str) -> None:
+    """
+    Graba en path todas las descargas hasta close().
+    """
+    global _MODE, _ARCHIVE
+    close()
+    with _LOCK:
+        _ARCHIVE, _MODE = ArchiveWriter(path), "record"
+    logger.info("Recording fetches to %s", path)
+
+
+def replay(path: str) -> None:
+    """
+    Sirve todas las descargas desde path hasta close() (sin red).
+    """
+    global _MODE, _ARCHIVE
+    close()
+    reader = ArchiveReader(path)
+    with _LOCK:
+        _ARCHIVE, _MODE = reader, "replay"
+    logger.info("Replaying fetches from %s (%d urls)", path, len(reader.index))
+
+
+def close() -> None:
+    """
+    Cierra el archivo activo (al grabar escribe el índice).
+    """
+    global _MODE, _ARCHIVE
+    with _LOCK:
+        archive, _ARCHIVE, _MODE = _ARCHIVE, None, None
+    if archive is not None:
+        archive.close()
+
+
+def mode() -> Optional[str]:
+    return _MODE
+
+
+def recorder() -> Optional[ArchiveWriter]:
+    """
+    Archivo en el que se graba, o None.
+    """
+    archive = _ARCHIVE
+    return archive if isinstance(archive, ArchiveWriter) else None
+
+
+def player() -> Optional[ArchiveReader]:
+    """
+    Archivo que se reproduce, o None.
+    """
+    archive = _ARCHIVE
+    return archive if isinstance(archive, ArchiveReader) else None
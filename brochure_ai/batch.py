@@ -0,0 +1,329 @@
+"""
+Modo batch: folletos para una lista de empresas en un único proceso.
+
+Entrada CSV (cabecera company,url,tone,languages) o JSONL con las mismas
+claves; languages admite "en,fr", "en;fr", "en fr" o una lista JSON.
+
+Las etapas del pipeline (ver pipeline.STAGES) se encadenan por empresa pero
+cada una corre en su pool:
+- fetch (scrape, compile): I/O de red, BATCH_FETCH_WORKERS hilos
+  El parseo HTML de compile va a un pool de BATCH_PARSE_WORKERS procesos
+  (parsing.py): con hilos BeautifulSoup no pasaría de un núcleo
+- llm (select, generate, translate): BATCH_LLM_WORKERS hilos, y el total de
+  llamadas simultáneas sigue acotado por LLM_MAX_CONCURRENCY
+Así mientras una empresa espera al LLM se descargan las páginas de otras.
+Un fallo en una empresa no afecta a las demás; cada resultado se añade al
+fichero JSONL de resultados en cuanto termina.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from . import archive, metrics
+from .llm import LLM_MAX_CONCURRENCY, keep_models_loaded
+from .llm_ollama import llm_stats_summary
+from .parsing import process_pool
+from .pipeline import STAGES, check_generation_modes, finish_run, new_run, parse_languages, run_stage
+
+logger = logging.getLogger(__name__)
+
+BATCH_FETCH_WORKERS = int(os.getenv("BATCH_FETCH_WORKERS", "8"))
+BATCH_LLM_WORKERS = int(os.getenv("BATCH_LLM_WORKERS", str(LLM_MAX_CONCURRENCY)))
+# Procesos del pool de parseo HTML (0 = parsear en los hilos de fetch)
+BATCH_PARSE_WORKERS = int(os.getenv("BATCH_PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+# Pool en el que corre cada etapa
+STAGE_POOLS = {
+    "scrape": "fetch",
+    "select": "llm",
+    "compile": "fetch",
+    "generate": "llm",
+    "translate": "llm",
+}
+
+
+def _normalize_job(raw: Dict[str, Any], index: int) -> Dict[str, Any]:
+    langs = raw.get("languages") or []
+    if isinstance(langs, str):
+        langs = langs.replace(";", ",").replace(" ", ",").split(",")
+    job = {
+        "index": index,
+        "company": str(raw.get("company") or "").strip(),
+        "url": str(raw.get("url") or "").strip(),
+        "tone": str(raw.get("tone") or "formal").strip(),
+        "languages": parse_languages(langs),
+    }
+    if not job["url"]:
+        job["error"] = "missing url"
+    elif not job["company"]:
+        job["company"] = "Ejemplo SA"  # placeholder: se autodetecta del HTML
+    return job
+
+
+def read_jobs(path: str) -> List[Dict[str, Any]]:
+    """
+    Lee los trabajos de un CSV o JSONL (según la extensión).
+    Las filas ilegibles o sin url se devuelven con "error" para que aparezcan
+    en los resultados en vez de abortar el batch.
+    """
+    jobs: List[Dict[str, Any]] = []
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = []
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    rows.append({"error": f"line {n}: {e}"})
+        else:
+            rows = list(csv.DictReader(f))
+    for i, row in enumerate(rows):
+        job = _normalize_job(row, i)
+        if row.get("error"):
+            job["error"] = row["error"]
+        jobs.append(job)
+    return jobs
+
+
+def _record(item: Dict[str, Any]) -> Dict[str, Any]:
+    job, run = item["job"], item.get("run") or {}
+    record: Dict[str, Any] = {
+        "index": job["index"],
+        "company": job["company"],
+        "url": job["url"],
+        "status": "error" if item.get("error") else "ok",
+        "error": item.get("error"),
+        "failed_stage": item.get("failed_stage"),
+        "stage_seconds": run.get("stage_seconds", {}),
+        "queue_seconds": {k: round(v, 3) for k, v in item["waits"].items()},
+        "total_seconds": round(time.perf_counter() - item["start"], 3),
+    }
+    if item.get("result"):
+        result = item["result"]
+        record.update(
+            company=result["company"],
+            md_path=result["md_path"],
+            html_path=result["html_path"],
+            translated_paths=result["translated_paths"],
+            failed_languages=result["failed_languages"],
+            skipped=result["skipped"],
+            avoided_fetches=result["compile_stats"].get("avoided_fetches", 0),
+            degraded=result["degraded"],
+        )
+    return record
+
+
+def run_batch(
+    jobs: List[Dict[str, Any]],
+    output_dir: str = "outputs",
+    results_path: Optional[str] = None,
+    with_html: bool = False,
+    mock: bool = False,
+    sectioned: Optional[bool] = None,
+    map_reduce: Optional[bool] = None,
+    force: bool = False,
+    fetch_workers: Optional[int] = None,
+    llm_workers: Optional[int] = None,
+    parse_workers: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Ejecuta todos los trabajos y devuelve un registro por trabajo (en orden de
+    entrada). Si results_path, cada registro se añade como línea JSON al acabar.
+    deadline (segundos) limita cada run desde que empieza su primera etapa.
+    """
+    check_generation_modes(sectioned, map_reduce)
+    with process_pool(BATCH_PARSE_WORKERS if parse_workers is None else parse_workers):
+        return _run_batch(
+            jobs, output_dir, results_path, with_html, mock, sectioned, map_reduce,
+            force, fetch_workers, llm_workers, deadline,
+        )
+
+
+def _run_batch(
+    jobs: List[Dict[str, Any]],
+    output_dir: str,
+    results_path: Optional[str],
+    with_html: bool,
+    mock: bool,
+    sectioned: Optional[bool],
+    map_reduce: Optional[bool],
+    force: bool,
+    fetch_workers: Optional[int],
+    llm_workers: Optional[int],
+    deadline: Optional[float],
+) -> List[Dict[str, Any]]:
+    pools = {
+        "fetch": ThreadPoolExecutor(
+            max_workers=max(1, fetch_workers or BATCH_FETCH_WORKERS), thread_name_prefix="fetch"
+        ),
+        "llm": ThreadPoolExecutor(
+            max_workers=max(1, llm_workers or BATCH_LLM_WORKERS), thread_name_prefix="llm"
+        ),
+    }
+    done: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    names = [name for name, _ in STAGES]
+
+    def submit(item: Dict[str, Any], idx: int) -> None:
+        item["queued_at"] = time.perf_counter()
+        pools[STAGE_POOLS[names[idx]]].submit(step, item, idx)
+
+    def step(item: Dict[str, Any], idx: int) -> None:
+        name = names[idx]
+        item["waits"][name] = time.perf_counter() - item["queued_at"]
+        try:
+            run_stage(item["run"], name)
+            if idx + 1 < len(names):
+                submit(item, idx + 1)
+                return
+            item["result"] = finish_run(item["run"])
+        except Exception as e:
+            logger.error("Batch item %d (%s) failed at %s: %s", item["job"]["index"], item["job"]["url"], name, e)
+            item["error"] = f"{type(e).__name__}: {e}"
+            item["failed_stage"] = name
+        done.put(item)
+
+    start = time.perf_counter()
+    records: Dict[int, Dict[str, Any]] = {}
+    out_lock = threading.Lock()
+    out = None
+    if results_path:
+        os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+        out = open(results_path, "a", encoding="utf-8")
+
+    try:
+        for job in jobs:
+            item = {"job": job, "start": time.perf_counter(), "waits": {}}
+            if job.get("error"):
+                item["error"] = job["error"]
+                done.put(item)
+                continue
+            item["run"] = new_run(
+                job["company"], job["url"], job["tone"], output_dir, with_html, mock,
+                sectioned, map_reduce, job["languages"], force, deadline,
+            )
+            submit(item, 0)
+
+        for _ in jobs:
+            record = _record(done.get())
+            records[record["index"]] = record
+            logger.info("Batch %d/%d: %s %s", len(records), len(jobs), record["status"], record["url"])
+            if out:
+                with out_lock:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+        if out:
+            out.close()
+
+    wall = time.perf_counter() - start
+    ok = sum(1 for r in records.values() if r["status"] == "ok")
+    logger.info(
+        "Batch done: %d ok, %d failed in %.1fs (%.0f brochures/hour)",
+        ok, len(records) - ok, wall, ok / wall * 3600 if wall else 0.0,
+    )
+    return [records[i] for i in sorted(records)]
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Generador de folletos en lote (CSV o JSONL)")
+    parser.add_argument("jobs", help="Fichero CSV o JSONL con company,url,tone,languages")
+    parser.add_argument("--output-dir", default="outputs", help="Directorio de salida")
+    parser.add_argument(
+        "--results",
+        default=None,
+        help="Fichero JSONL de resultados y métricas (default <output-dir>/batch_results.jsonl)",
+    )
+    parser.add_argument("--export-html", action="store_true", help="Exportar también a HTML")
+    parser.add_argument("--mock", action="store_true", help="Usar modo mock (sin LLM)")
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument("--sectioned", action="store_true", help="Generar las secciones en paralelo")
+    mode_group.add_argument("--map-reduce", action="store_true", help="Folleto a partir de resúmenes por página")
+    parser.add_argument("--force", action="store_true", help="Ignorar las huellas de runs anteriores")
+    parser.add_argument("--fetch-workers", type=int, default=None, help="Hilos del pool de descargas")
+    parser.add_argument("--llm-workers", type=int, default=None, help="Hilos del pool de etapas LLM")
+    parser.add_argument(
+        "--deadline", type=float, default=None, metavar="SECONDS", help="Tiempo máximo de cada run (degrada al agotarse)"
+    )
+    parser.add_argument(
+        "--metrics-file", default=None, help="Volcar al terminar las métricas del batch (formato Prometheus)"
+    )
+    archive_group = parser.add_mutually_exclusive_group()
+    archive_group.add_argument(
+        "--record", metavar="ARCHIVE", default=None, help="Grabar todas las descargas del batch en un archivo"
+    )
+    archive_group.add_argument(
+        "--replay", metavar="ARCHIVE", default=None, help="Servir las descargas desde un archivo grabado (sin red)"
+    )
+    parser.add_argument(
+        "--parse-workers", type=int, default=None, help="Procesos del pool de parseo HTML (0 = en proceso)"
+    )
+    args = parser.parse_args()
+
+    mock_mode = args.mock or os.getenv("MOCK_MODE", "false").lower() == "true"
+    if mock_mode:
+        os.environ["MOCK_MODE"] = "true"
+
+    jobs = read_jobs(args.jobs)
+    results_path = args.results or os.path.join(args.output_dir, "batch_results.jsonl")
+    # Precarga los modelos mientras se descargan las primeras landings
+    with keep_models_loaded(enabled=not mock_mode):
+        if args.record:
+            archive.record(args.record)
+        elif args.replay:
+            archive.replay(args.replay)
+        try:
+            records = run_batch(
+                jobs,
+                output_dir=args.output_dir,
+                results_path=results_path,
+                with_html=args.export_html,
+                mock=mock_mode,
+                sectioned=args.sectioned or None,
+                map_reduce=args.map_reduce or None,
+                force=args.force,
+                fetch_workers=args.fetch_workers,
+                llm_workers=args.llm_workers,
+                parse_workers=args.parse_workers,
+                deadline=args.deadline,
+            )
+        finally:
+            archive.close()
+            if args.metrics_file:
+                metrics.write_textfile(args.metrics_file)
+
+    failed = [r for r in records if r["status"] != "ok"]
+    llm = llm_stats_summary()
+    print("\n" + "=" * 60)
+    print(f"Brochures: {len(records) - len(failed)} ok, {len(failed)} failed")
+    for r in failed:
+        print(f"  FAILED {r['url'] or '(sin url)'}: {r['error']}")
+    if llm["calls"]:
+        print(f"LLM calls: {llm['calls']} ({llm['wall_s']:.1f}s)")
+    print(f"Results: {results_path}")
+    if args.record:
+        print(f"Site archive: {args.record}")
+    if args.metrics_file:
+        print(f"Metrics: {args.metrics_file}")
+    print("=" * 60 + "\n")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
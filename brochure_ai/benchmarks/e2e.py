@@ -0,0 +1,237 @@
+"""
+Benchmark extremo a extremo sin red ni Ollama reales.
+
+    python -m brochure_ai.benchmarks.e2e --sites 6 --pages 12 --llm-latency 0.2 \
+        --output bench.json [--compare baseline.json]
+
+Sirve sitios sintéticos (sites.py), sustituye Ollama por el emulador local
+(ollama_emulator.py: TTFT, tokens/s, paralelismo y errores configurables) y
+ejecuta el pipeline de la CLI en dos modos:
+- single: una empresa detrás de otra (como un bucle de `cli`)
+- batch: todas a la vez con batch.run_batch
+Cada modo corre en un subproceso propio para medir su pico de RSS. El JSON
+resultante incluye folletos/hora, p50/p95 por etapa y por folleto, y pico de
+RSS; con --compare se imprime la variación frente a una referencia.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import platform
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("single", "batch")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    Percentil q (0-100) con interpolación lineal; None sin datos.
+    """
+    if not values:
+        return None
+    data = sorted(values)
+    k = (len(data) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(data) - 1)
+    return round(data[lo] + (data[hi] - data[lo]) * (k - lo), 4)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB, macOS en bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_mode(mode: str, urls: List[str], output_dir: str, languages: List[str]) -> Dict[str, Any]:
+    """
+    Ejecuta un modo en este proceso y devuelve sus métricas. El backend LLM
+    es el del entorno (el emulador en los subprocesos del benchmark).
+    """
+    from ..pipeline import run_pipeline
+    from ..batch import run_batch
+
+    records: List[Dict[str, Any]] = []
+    start = time.perf_counter()
+    if mode == "single":
+        for url in urls:
+            t0 = time.perf_counter()
+            try:
+                result = run_pipeline("Ejemplo SA", url, output_dir=output_dir, languages=languages, force=True)
+                records.append({"status": "ok", "stage_seconds": result["stage_seconds"],
+                                "total_seconds": time.perf_counter() - t0})
+            except Exception as e:
+                records.append({"status": "error", "error": str(e), "stage_seconds": {},
+                                "total_seconds": time.perf_counter() - t0})
+    elif mode == "batch":
+        jobs = [
+            {"index": i, "company": "Ejemplo SA", "url": url, "tone": "formal", "languages": languages}
+            for i, url in enumerate(urls)
+        ]
+        records = run_batch(jobs, output_dir=output_dir, force=True)
+    else:
+        raise ValueError(f"unknown mode {mode}")
+    wall = time.perf_counter() - start
+
+    ok = [r for r in records if r["status"] == "ok"]
+    stages: Dict[str, List[float]] = {}
+    for r in ok:
+        for name, secs in r["stage_seconds"].items():
+            stages.setdefault(name, []).append(secs)
+    totals = [r["total_seconds"] for r in ok]
+    return {
+        "mode": mode,
+        "items": len(records),
+        "ok": len(ok),
+        "failed": len(records) - len(ok),
+        "wall_s": round(wall, 3),
+        "brochures_per_hour": round(len(ok) / wall * 3600, 1) if wall else None,
+        "latency_s": {"p50": percentile(totals, 50), "p95": percentile(totals, 95)},
+        "stages": {
+            name: {"p50": percentile(v, 50), "p95": percentile(v, 95)}
+            for name, v in stages.items()
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_child(mode: str, urls: List[str], config: Dict[str, Any], llm_url: str) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix=f"bench-{mode}-") as tmp:
+        env = dict(
+            os.environ,
+            BROCHURE_CACHE_DIR=os.path.join(tmp, "cache"),
+            MOCK_MODE="false",
+            LLM_BACKEND="ollama",
+            OLLAMA_URL=llm_url,
+        )
+        payload = json.dumps({"mode": mode, "urls": urls, "output_dir": os.path.join(tmp, "out"), **config})
+        proc = subprocess.run(
+            [sys.executable, "-m", "brochure_ai.benchmarks.e2e", "--child", payload],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark {mode} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(config: Dict[str, Any], modes=MODES) -> Dict[str, Any]:
+    """
+    Sirve los sitios y lanza un subproceso por modo, cada uno con su emulador
+    de Ollama (sus estadísticas quedan en llm_server).
+    """
+    from .ollama_emulator import serve_emulator
+    from .sites import serve_sites
+
+    spec = {k: config[k] for k in ("pages", "page_kb", "links", "slow", "slow_delay", "failing")}
+    llm_config = {
+        "ttft_s": config["llm_latency"],
+        "tokens_per_s": config["llm_token_rate"],
+        "parallel": config["llm_parallel"],
+        "error_rate": config["llm_error_rate"],
+    }
+    results = {}
+    with serve_sites(config["sites"], spec) as urls:
+        for mode in modes:
+            logger.info("Running %s mode over %d sites", mode, len(urls))
+            with serve_emulator(llm_config) as emulator:
+                results[mode] = _run_child(mode, urls, {"languages": config["languages"]}, emulator.url)
+            results[mode]["llm_server"] = dict(emulator.stats)
+    return {
+        "config": config,
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "modes": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Líneas legibles con la variación de throughput y latencias frente a baseline.
+    """
+    lines = []
+    for mode, cur in current["modes"].items():
+        base = baseline.get("modes", {}).get(mode)
+        if not base:
+            continue
+
+        def delta(a, b):
+            return f"{(a - b) / b * 100:+.1f}%" if a is not None and b else "n/a"
+
+        lines.append(
+            f"{mode}: brochures/h {cur['brochures_per_hour']} ({delta(cur['brochures_per_hour'], base['brochures_per_hour'])}), "
+            f"p95 {cur['latency_s']['p95']}s ({delta(cur['latency_s']['p95'], base['latency_s']['p95'])}), "
+            f"peak RSS {cur['peak_rss_mb']} MB ({delta(cur['peak_rss_mb'], base['peak_rss_mb'])})"
+        )
+        for stage, stats in cur["stages"].items():
+            ref = base["stages"].get(stage)
+            if ref:
+                lines.append(f"  {stage:<10} p95 {stats['p95']}s ({delta(stats['p95'], ref['p95'])})")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end offline del pipeline")
+    parser.add_argument("--sites", type=int, default=6, help="Número de sitios sintéticos")
+    parser.add_argument("--pages", type=int, default=12, help="Páginas por sitio (sin contar la home)")
+    parser.add_argument("--page-kb", type=int, default=30, help="Tamaño aproximado de cada página")
+    parser.add_argument("--links", type=int, default=40, help="Enlaces por página")
+    parser.add_argument("--slow", type=int, default=1, help="Páginas lentas por sitio")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="Segundos de las páginas lentas")
+    parser.add_argument("--failing", type=int, default=1, help="Páginas con 500 por sitio")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Segundos hasta el primer token de cada llamada LLM")
+    parser.add_argument("--llm-token-rate", type=float, default=0.0, help="Tokens/s del LLM emulado (0 = sin límite)")
+    parser.add_argument("--llm-parallel", type=int, default=4, help="Peticiones LLM simultáneas (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fracción de llamadas LLM que responden 500")
+    parser.add_argument("--languages", nargs="*", default=["en"], help="Idiomas de traducción")
+    parser.add_argument("--mode", choices=MODES + ("both",), default="both")
+    parser.add_argument("--output", default=None, help="Fichero JSON de resultados")
+    parser.add_argument("--compare", default=None, help="JSON de referencia con el que comparar")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        logging.basicConfig(level=logging.WARNING)
+        cfg = json.loads(args.child)
+        print(json.dumps(run_mode(cfg["mode"], cfg["urls"], cfg["output_dir"], cfg["languages"])))
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    config = {
+        "sites": args.sites,
+        "pages": args.pages,
+        "page_kb": args.page_kb,
+        "links": args.links,
+        "slow": args.slow,
+        "slow_delay": args.slow_delay,
+        "failing": args.failing,
+        "llm_latency": args.llm_latency,
+        "llm_token_rate": args.llm_token_rate,
+        "llm_parallel": args.llm_parallel,
+        "llm_error_rate": args.llm_error_rate,
+        "languages": args.languages,
+    }
+    report = run_benchmark(config, MODES if args.mode == "both" else (args.mode,))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(report, baseline)))
+
+
+if __name__ == "__main__":
+    main()
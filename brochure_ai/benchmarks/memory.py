@@ -0,0 +1,119 @@
+"""
+Benchmark de memoria: páginas compiladas como dicts completos frente a Page.
+
+    python -m brochure_ai.benchmarks.memory --runs 20 --pages 15 --page-kb 30
+
+Simula un batch que mantiene vivo el estado de cada run: por run se compilan
+`pages` páginas sintéticas, se resumen, se calculan sus huellas y se monta el
+prompt del folleto. La variante "dict" guarda cada página como el dict ancho
+de antes (texto, metadatos y resumen); la variante "page" usa compiler.Page y
+la suelta (release) tras montar el prompt. Cada variante corre en su propio
+subproceso para medir su pico de RSS; también se informa del texto retenido
+al final (determinista).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from .e2e import _peak_rss_mb
+
+VARIANTS = ("dict", "page")
+
+
+def _current_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):  # no Linux
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+
+
+def run_variant(variant: str, runs: int, pages: int, page_kb: int) -> Dict[str, Any]:
+    """
+    Ejecuta una variante en este proceso y devuelve sus métricas.
+    """
+    from ..brochure import BROCHURE_CONTENT_TOKENS, _pages_for_prompt
+    from ..compiler import _build_page, release_pages, summarize_content
+    from ..fingerprints import hash_pages
+    from .micro import make_html
+
+    if variant not in VARIANTS:
+        raise ValueError(f"unknown variant {variant}")
+    kept: List[List[Any]] = []
+    start = time.perf_counter()
+    for i in range(runs):
+        compiled: List[Any] = []
+        for j in range(pages):
+            url = f"https://empresa{i}.example/p{j}"
+            page = _build_page(make_html(page_kb * 1024, 40, seed=i * pages + j), url, "page")
+            compiled.append(page.parse().to_dict() if variant == "dict" else page)
+        summarize_content(compiled)
+        hash_pages(compiled)
+        _pages_for_prompt(compiled, max_tokens=BROCHURE_CONTENT_TOKENS)
+        if variant == "page":
+            release_pages(compiled)
+        kept.append(compiled)
+
+    retained = sum(len(p["content"]) + len(p["summary"]) for run in kept for p in run)
+    return {
+        "variant": variant,
+        "pages": runs * pages,
+        "wall_s": round(time.perf_counter() - start, 3),
+        "retained_text_mb": round(retained / (1024 * 1024), 2),
+        "rss_mb": _current_rss_mb(),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_child(variant: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    # sin /api/tokenize: el conteo de tokens es local
+    env = dict(os.environ, OLLAMA_TOKENIZE="false")
+    payload = json.dumps({"variant": variant, **config})
+    proc = subprocess.run(
+        [sys.executable, "-m", "brochure_ai.benchmarks.memory", "--child", payload],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark {variant} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pico de RSS: páginas como dict frente a Page")
+    parser.add_argument("--runs", type=int, default=20, help="Runs cuyo estado se mantiene vivo")
+    parser.add_argument("--pages", type=int, default=15, help="Páginas por run")
+    parser.add_argument("--page-kb", type=int, default=30, help="Tamaño aproximado de cada página")
+    parser.add_argument("--output", default=None, help="Fichero JSON de resultados")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        cfg = json.loads(args.child)
+        print(json.dumps(run_variant(cfg["variant"], cfg["runs"], cfg["pages"], cfg["page_kb"])))
+        return
+
+    config = {"runs": args.runs, "pages": args.pages, "page_kb": args.page_kb}
+    report = {"config": config, "variants": {v: _run_child(v, config) for v in VARIANTS}}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    old, new = report["variants"]["dict"], report["variants"]["page"]
+    if old["peak_rss_mb"] and new["peak_rss_mb"]:
+        print(
+            f"peak RSS {old['peak_rss_mb']} MB -> {new['peak_rss_mb']} MB "
+            f"({(new['peak_rss_mb'] - old['peak_rss_mb']) / old['peak_rss_mb'] * 100:+.1f}%), "
+            f"retained text {old['retained_text_mb']} MB -> {new['retained_text_mb']} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
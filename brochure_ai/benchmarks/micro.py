@@ -0,0 +1,277 @@
+"""
+Microbenchmarks de los caminos calientes de CPU con umbral de regresión.
+
+    python -m brochure_ai.benchmarks.micro --save baseline_micro.json
+    python -m brochure_ai.benchmarks.micro --check baseline_micro.json --threshold 0.25
+
+Fixtures sintéticos de tamaño realista (deterministas):
+- small: landing de ~20 KB
+- 1mb: página de contenido de ~1 MB
+- 5mb: página de ~5 MB con un mega-menú de miles de enlaces
+- respuestas LLM grandes: JSON de selección con ruido alrededor y un folleto
+  Markdown largo con placeholders
+
+Cada caso se calibra para que una repetición dure >= MIN_ROUND_S y se repite
+`repeats` veces; se informa mediana, IQR y mínimo por llamada. --check falla
+(código 1) si la mediana de algún caso supera la referencia en más de threshold.
+
+Cada ronda de un caso va seguida de una ronda de una carga fija de Python puro
+(calibración); "relative" es la mediana de los cocientes caso/calibración. Al
+comparar se usa relative si ambos lo tienen: no depende de la máquina ni de
+su carga, así que sirve la referencia del repositorio (DEFAULT_BASELINE).
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MIN_ROUND_S = 0.05
+DEFAULT_REPEATS = 7
+DEFAULT_THRESHOLD = 0.25
+SIZES = ("small", "1mb", "5mb")
+# casos small y de parseo LLM, grabados con --sizes small --repeats 5
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline_micro.json")
+
+_WORDS = (
+    "empresa soluciones clientes proyectos equipo innovación tecnología servicios "
+    "digitalización consultoría datos cloud sector industria banca retail energía "
+    "misión valores calidad experiencia talento sostenibilidad crecimiento mercado"
+).split()
+
+
+def _text(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n_words))
+
+
+def make_html(target_bytes: int, menu_links: int, seed: int = 0) -> str:
+    """
+    HTML corporativo sintético: mega-menú de menu_links enlaces, scripts,
+    estilos y secciones de contenido hasta ~target_bytes.
+    """
+    rng = random.Random(seed)
+    sections = ["about", "careers", "customers", "community", "press", "blog", "products", "legal"]
+    menu = "".join(
+        f'<li><a href="/{rng.choice(sections)}/{i}?ref=menu">{_text(rng, 2)}</a></li>'
+        for i in range(menu_links)
+    )
+    head = (
+        "<html><head><title>ACME | Soluciones</title>"
+        '<meta name="description" content="ACME ayuda a empresas a digitalizarse.">'
+        "<style>body{margin:0}.nav{display:flex}</style>"
+        "<script>window.dataLayer=[];function track(){}</script></head><body>"
+        f'<nav class="mega"><ul>{menu}</ul></nav><main>'
+    )
+    parts = [head]
+    size = len(head)
+    i = 0
+    while size < target_bytes:
+        block = (
+            f"<section><h2>{_text(rng, 4)}</h2><p>{_text(rng, 80)}.</p>"
+            f'<p>{_text(rng, 40)} <a href="https://acme.example/{rng.choice(sections)}/{i}">más</a></p>'
+            f"<script>track({i})</script></section>"
+        )
+        parts.append(block)
+        size += len(block)
+        i += 1
+    parts.append("</main><footer>© ACME</footer></body></html>")
+    return "".join(parts)
+
+
+def make_links_response(n_links: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    links = [
+        {
+            "type": rng.choice(["about", "careers", "customers", "blog"]),
+            "url": f"/{rng.choice(['about', 'careers', 'casos', 'blog'])}/{i}",
+            "score": rng.randint(0, 100),
+            "rationale": _text(rng, 12),
+        }
+        for i in range(n_links)
+    ]
+    return "Claro, aquí tienes el JSON:\n```json\n" + json.dumps({"links": links}, ensure_ascii=False) + "\n```\nEspero que ayude."
+
+
+def make_brochure_output(n_sections: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    out = ["# ACME – Folleto Corporativo", ""]
+    for i in range(n_sections):
+        out += [f"## {_text(rng, 3)}", "", _text(rng, 60) + " [placeholder].", "", "-", ""]
+        out += [f"- {_text(rng, 10)} [dato]" for _ in range(6)]
+        out += ["", "", "", "###", ""]
+    return "\n".join(out)
+
+
+# tamaño -> (bytes, enlaces del menú, semilla)
+HTML_FIXTURES = {
+    "small": (20_000, 60, 1),
+    "1mb": (1_000_000, 300, 2),
+    "5mb": (5_000_000, 8000, 3),
+}
+
+
+def _fixtures() -> Dict[str, Any]:
+    return {
+        "links_json": make_links_response(400),
+        "brochure_md": make_brochure_output(200),
+        "urls": [f"https://acme.example/{s}/{i}" for i, s in enumerate(
+            ["about", "careers", "customers", "blog", "legal", "products", "press", "x"] * 250)],
+    }
+
+
+def _calibration() -> List[str]:
+    return sorted(str(i * 7919 % 10007) for i in range(5000))
+
+
+def cases(sizes=SIZES) -> List[Tuple[str, Callable[[], Any]]]:
+    """
+    (nombre, función sin argumentos) de cada caso a medir.
+    """
+    from ..scraping import clean_text, extract_links
+    from ..compiler import extract_metadata
+    from ..link_selector import _parse_llm_response, _score_link
+    from ..brochure import _sanitize_brochure
+
+    fx = _fixtures()
+    base = "https://acme.example/"
+    out: List[Tuple[str, Callable[[], Any]]] = []
+    for size in sizes:
+        html = make_html(*HTML_FIXTURES[size])
+        out += [
+            (f"clean_text[{size}]", lambda html=html: clean_text(html)),
+            (f"extract_links[{size}]", lambda html=html: extract_links(html, base)),
+            (f"extract_metadata[{size}]", lambda html=html: extract_metadata(html, base)),
+        ]
+    out += [
+        ("_score_link[2000 urls]", lambda: [_score_link(u) for u in fx["urls"]]),
+        ("_parse_llm_response[400 links]", lambda: _parse_llm_response(fx["links_json"], base)),
+        ("_sanitize_brochure[200 sections]", lambda: _sanitize_brochure(fx["brochure_md"])),
+    ]
+    return out
+
+
+def _loops(fn: Callable[[], Any], min_round_s: float) -> int:
+    fn()  # calentamiento (imports diferidos, cachés de regex)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_round_s or number >= 1_000_000:
+            return number
+        number *= 2
+
+
+def _round(fn: Callable[[], Any], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number
+
+
+def _quartiles(samples: List[float]) -> List[float]:
+    return statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+
+
+def measure(
+    fn: Callable[[], Any],
+    repeats: int = DEFAULT_REPEATS,
+    min_round_s: float = MIN_ROUND_S,
+    reference: Optional[Callable[[], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Segundos por llamada: mediana, IQR y mínimo sobre `repeats` rondas.
+    Con reference, cada ronda va seguida de una de reference y se añade
+    relative (mediana de los cocientes) y su IQR.
+    """
+    number = _loops(fn, min_round_s)
+    ref_number = _loops(reference, min_round_s) if reference else 0
+    samples, ratios = [], []
+    for _ in range(repeats):
+        samples.append(_round(fn, number))
+        if reference:
+            ratios.append(samples[-1] / _round(reference, ref_number))
+    q = _quartiles(samples)
+    stats = {
+        "median_s": statistics.median(samples),
+        "iqr_s": q[2] - q[0],
+        "min_s": min(samples),
+        "loops": number,
+        "repeats": repeats,
+    }
+    if ratios:
+        q = _quartiles(ratios)
+        stats.update(relative=statistics.median(ratios), relative_iqr=q[2] - q[0])
+    return stats
+
+
+def run(sizes=SIZES, repeats: int = DEFAULT_REPEATS, only: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name, fn in cases(sizes):
+        if only and only not in name:
+            continue
+        results[name] = measure(fn, repeats, reference=_calibration)
+        r = results[name]
+        print(f"{name:<34} {r['median_s'] * 1000:>10.3f} ms  ±{r['iqr_s'] * 1000:.3f} (IQR)", file=sys.stderr)
+    return results
+
+
+def find_regressions(
+    current: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[str]:
+    """
+    Casos cuya mediana supera la de referencia en más de threshold (0.25 = +25%).
+    Para no fallar por ruido, la diferencia también debe superar el IQR de ambos.
+    Si los dos tienen relative se compara eso (independiente de la máquina).
+    Los casos sin referencia se ignoran.
+    """
+    regressions = []
+    for name, cur in current.items():
+        ref = baseline.get(name)
+        if not ref or not ref.get("median_s"):
+            continue
+        key, spread, unit, scale = "median_s", "iqr_s", " ms", 1000
+        if cur.get("relative") and ref.get("relative"):
+            key, spread, unit, scale = "relative", "relative_iqr", "x calibration", 1
+        ratio = cur[key] / ref[key]
+        noise = cur.get(spread, 0.0) + ref.get(spread, 0.0)
+        if ratio > 1 + threshold and cur[key] - ref[key] > noise:
+            regressions.append(
+                f"{name}: {ref[key] * scale:.3f}{unit} -> {cur[key] * scale:.3f}{unit} ({ratio - 1:+.0%})"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmarks de scraping, compilación y parseo LLM")
+    parser.add_argument("--sizes", default=",".join(SIZES), help="Tamaños de HTML (small,1mb,5mb)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Rondas por caso")
+    parser.add_argument("--only", default=None, help="Solo casos cuyo nombre contiene este texto")
+    parser.add_argument("--save", default=None, help="Guardar resultados como referencia JSON")
+    parser.add_argument("--check", default=None, help="Comparar con una referencia JSON y fallar si hay regresión")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Regresión tolerada (0.25 = +25%%)")
+    args = parser.parse_args()
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    results = run(sizes, args.repeats, args.only)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save}", file=sys.stderr)
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
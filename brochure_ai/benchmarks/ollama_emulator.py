@@ -0,0 +1,438 @@
+"""
+Emulador local y determinista de Ollama para pruebas de carga y de fallos.
+
+    python -m brochure_ai.benchmarks.ollama_emulator --port 11434 \
+        --tokens-per-s 40 --ttft 0.3 --parallel 2 --error-rate 0.05
+
+Implementa lo que usa el proyecto:
+    POST /api/generate   prompt -> response (stream o no); sin prompt = carga del modelo
+    POST /api/chat       messages -> message (stream o no)
+    POST /api/tokenize   content -> tokens
+    GET  /api/tags       modelos disponibles
+
+Comportamiento configurable (DEFAULT_CONFIG):
+- respuestas: `responses` {modelo o texto contenido en el prompt: respuesta};
+  si nada coincide, una respuesta por defecto según el tipo de prompt (enlaces,
+  resumen, traducción o folleto), compatible con el pipeline
+- tiempos: ttft_s antes del primer token, tokens_per_s durante la generación
+  (0 = sin límite) y load_s la primera vez que se usa cada modelo
+- concurrencia: `parallel` peticiones generando a la vez (OLLAMA_NUM_PARALLEL);
+  el resto espera en cola y por encima de max_queue se responde 503
+- fallos: error_rate (error_status, 500 por defecto), malformed_rate (JSON roto)
+  y timeout_rate (la petición se cuelga hang_s sin responder). Se deciden con un
+  RNG con semilla en orden de llegada; `script` fija los primeros ("error",
+  "malformed", "timeout" u "ok") para tests exactos. Solo afectan a peticiones
+  que generan texto, no a la carga del modelo, tokenize ni tags.
+"""
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "models": [],  # vacío = acepta cualquier modelo
+    "responses": {},
+    "tokens_per_s": 0.0,
+    "ttft_s": 0.0,
+    "load_s": 0.0,
+    "parallel": 4,
+    "max_queue": 512,
+    "error_rate": 0.0,
+    "malformed_rate": 0.0,
+    "timeout_rate": 0.0,
+    "error_status": 500,
+    "hang_s": 30.0,
+    "script": [],
+    "seed": 0,
+}
+FAULTS = ("error", "malformed", "timeout")
+
+_NS = 1_000_000_000
+_TOKEN_RE = re.compile(r"\s*\S+|\s+")
+
+
+def split_tokens(text: str) -> List[str]:
+    """
+    "Tokens" del emulador: cada palabra con el espacio que la precede.
+    Concatenados reproducen el texto exacto.
+    """
+    return _TOKEN_RE.findall(text)
+
+
+def _user_text(prompt: str) -> str:
+    # chat_ollama envuelve los mensajes en <system>/<user>
+    match = re.search(r"<user>\n(.*)\n</user>", prompt, re.S)
+    return match.group(1) if match else prompt
+
+
+def default_response(prompt: str) -> str:
+    """
+    Respuesta por defecto según el tipo de prompt del pipeline (mismas reglas
+    que llm.MockBackend, que recibe el call_type explícito).
+    """
+    from ..llm import MockBackend
+
+    user = _user_text(prompt)
+    if "Enlaces encontrados:" in user:
+        call_type = "links"
+    elif "Resume en 3" in user:
+        call_type = "summary"
+    elif user.startswith("Target language:"):
+        # traducción por segmentos: devuelve el fragmento tal cual
+        return user.rsplit("\n\n", 1)[-1]
+    elif "```markdown" in user:
+        call_type = "translate"
+    else:
+        call_type = "brochure"
+    return MockBackend._default_response(user, call_type)
+
+
+class _Hang(Exception):
+    pass
+
+
+class OllamaEmulatorHandler(BaseHTTPRequestHandler):
+    server_version = "OllamaEmulator/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    def _send(self, status: int, data: Any, raw: Optional[bytes] = None) -> None:
+        raw = raw if raw is not None else json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0].rstrip("/") == "/api/tags":
+            return self._send(200, {"models": [{"name": m, "model": m} for m in self.server.known_models()]})
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            return self._send(400, {"error": f"invalid JSON: {e}"})
+        if path == "/api/tokenize":
+            tokens = [zlib.crc32(t.encode("utf-8")) % 32000 for t in split_tokens(body.get("content") or "")]
+            return self._send(200, {"model": body.get("model"), "tokens": tokens})
+        if path not in ("/api/generate", "/api/chat"):
+            return self._send(404, {"error": "not found"})
+        self.server.count("requests")
+        try:
+            self._generate(path, body)
+        except _Hang:
+            # sin respuesta: el cliente verá su propio timeout
+            self.close_connection = True
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _generate(self, path: str, body: Dict[str, Any]) -> None:
+        server = self.server
+        model = body.get("model") or ""
+        if server.config["models"] and model not in server.config["models"]:
+            return self._send(404, {"error": f"model '{model}' not found"})
+
+        chat = path == "/api/chat"
+        if chat:
+            messages = body.get("messages") or []
+            prompt = "\n\n".join(m.get("content") or "" for m in messages)
+        else:
+            prompt = body.get("prompt") or ""
+
+        if not prompt:
+            # petición de carga/descarga (warm-up o keep_alive=0)
+            load_s = server.load(model, body.get("keep_alive"))
+            return self._send(200, self._final(model, chat, "", 0, 0, load_s, 0.0, done_reason="load"))
+
+        fault = server.next_fault()
+        if fault == "error":
+            return self._send(server.config["error_status"], {"error": "emulated server error"})
+        if fault == "timeout":
+            server.closing.wait(server.config["hang_s"])
+            raise _Hang()
+
+        if not server.enter():
+            server.count("rejected")
+            return self._send(503, {"error": "server busy, please try again.  maximum pending requests exceeded"})
+        try:
+            load_s = server.load(model, body.get("keep_alive"))
+            text = server.respond(model, prompt)
+            tokens = split_tokens(text)
+            prompt_tokens = len(split_tokens(prompt))
+            if body.get("stream", True):
+                self._stream(model, chat, tokens, prompt_tokens, load_s, malformed=fault == "malformed")
+            else:
+                eval_s = server.sleep_generation(len(tokens))
+                data = self._final(model, chat, text, prompt_tokens, len(tokens), load_s, eval_s)
+                raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self._send(200, data, raw[: len(raw) // 2] if fault == "malformed" else None)
+        finally:
+            server.leave()
+
+    def _stream(self, model: str, chat: bool, tokens: List[str], prompt_tokens: int, load_s: float, malformed: bool) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(line: bytes) -> None:
+            self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+
+        start = time.perf_counter()
+        self.server.sleep(self.server.config["ttft_s"])
+        rate = self.server.config["tokens_per_s"]
+        for i, token in enumerate(tokens):
+            if i and rate:
+                self.server.sleep(1 / rate)
+            if malformed and i == len(tokens) // 2:
+                write(b'{"model": "' + model.encode() + b'", "response": \n')
+                break
+            chunk = self._chunk(model, chat, token)
+            write(json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n")
+        else:
+            final = self._final(model, chat, "", prompt_tokens, len(tokens), load_s, time.perf_counter() - start)
+            write(json.dumps(final).encode("utf-8") + b"\n")
+        write(b"")
+
+    @staticmethod
+    def _chunk(model: str, chat: bool, text: str) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "done": False}
+        if chat:
+            data["message"] = {"role": "assistant", "content": text}
+        else:
+            data["response"] = text
+        return data
+
+    def _final(
+        self,
+        model: str,
+        chat: bool,
+        text: str,
+        prompt_tokens: int,
+        eval_tokens: int,
+        load_s: float,
+        eval_s: float,
+        done_reason: str = "stop",
+    ) -> Dict[str, Any]:
+        data = self._chunk(model, chat, text)
+        data.update(
+            done=True,
+            done_reason=done_reason,
+            total_duration=int((load_s + eval_s) * _NS),
+            load_duration=int(load_s * _NS),
+            prompt_eval_count=prompt_tokens,
+            prompt_eval_duration=0,
+            eval_count=eval_tokens,
+            eval_duration=int(eval_s * _NS),
+        )
+        return data
+
+
+class OllamaEmulator(ThreadingHTTPServer):
+    """
+    Servidor del emulador con su estado: modelos cargados, cola y estadísticas.
+    """
+    daemon_threads = True
+    # las peticiones colgadas no deben bloquear server_close()
+    block_on_close = False
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), OllamaEmulatorHandler)
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.closing = threading.Event()
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config["seed"])
+        self._script = list(self.config["script"])
+        self._slots = threading.Semaphore(max(1, self.config["parallel"]))
+        self._waiting = 0
+        self._loaded: set = set()
+        self._seen: List[str] = []
+        self.stats: Dict[str, int] = {
+            "requests": 0, "in_flight": 0, "max_in_flight": 0, "rejected": 0,
+            "loads": 0, **{f: 0 for f in FAULTS},
+        }
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def known_models(self) -> List[str]:
+        with self._lock:
+            return list(self.config["models"] or self._seen)
+
+    def next_fault(self) -> Optional[str]:
+        with self._lock:
+            if self._script:
+                fault = self._script.pop(0)
+            else:
+                r = self._rng.random()
+                fault = None
+                for name in FAULTS:
+                    rate = self.config[f"{name}_rate"]
+                    if r < rate:
+                        fault = name
+                        break
+                    r -= rate
+            if fault in FAULTS:
+                self.stats[fault] += 1
+                return fault
+            return None
+
+    def enter(self) -> bool:
+        """
+        Espera un hueco de generación; False si la cola está llena.
+        """
+        with self._lock:
+            free = self._slots.acquire(blocking=False)
+            if not free:
+                if self._waiting >= self.config["max_queue"]:
+                    return False
+                self._waiting += 1
+        if not free:
+            self._slots.acquire()
+        with self._lock:
+            if not free:
+                self._waiting -= 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self.stats["in_flight"] -= 1
+        self._slots.release()
+
+    def load(self, model: str, keep_alive: Any = None) -> float:
+        """
+        Carga el modelo si no lo está (load_s) y devuelve el tiempo de carga.
+        keep_alive=0 lo descarga al terminar, como Ollama.
+        """
+        with self._lock:
+            if model not in self._seen:
+                self._seen.append(model)
+            cold = model not in self._loaded
+            if str(keep_alive) in ("0", "0s"):
+                self._loaded.discard(model)
+                return 0.0
+            self._loaded.add(model)
+            if cold:
+                self.stats["loads"] += 1
+        load_s = self.config["load_s"] if cold else 0.0
+        self.sleep(load_s)
+        return load_s
+
+    def respond(self, model: str, prompt: str) -> str:
+        responses = self.config["responses"]
+        if model in responses:
+            return responses[model]
+        for needle, text in responses.items():
+            if needle in prompt:
+                return text
+        return default_response(prompt)
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.closing.wait(seconds)
+
+    def sleep_generation(self, n_tokens: int) -> float:
+        rate = self.config["tokens_per_s"]
+        seconds = self.config["ttft_s"] + (max(0, n_tokens - 1) / rate if rate else 0.0)
+        self.sleep(seconds)
+        return seconds
+
+    def server_close(self) -> None:
+        self.closing.set()
+        super().server_close()
+
+
+@contextmanager
+def serve_emulator(config: Optional[Dict[str, Any]] = None) -> Iterator[OllamaEmulator]:
+    """
+    Arranca el emulador en un puerto libre de localhost (server.url) y lo para al salir.
+    """
+    server = OllamaEmulator(config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Emulador local de Ollama con latencia e inyección de fallos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", nargs="*", default=[], help="Modelos aceptados (vacío = cualquiera)")
+    parser.add_argument("--responses", default=None, help="JSON {modelo o texto del prompt: respuesta}")
+    parser.add_argument("--tokens-per-s", type=float, default=DEFAULT_CONFIG["tokens_per_s"])
+    parser.add_argument("--ttft", type=float, default=DEFAULT_CONFIG["ttft_s"], help="Segundos hasta el primer token")
+    parser.add_argument("--load", type=float, default=DEFAULT_CONFIG["load_s"], help="Segundos de carga por modelo")
+    parser.add_argument("--parallel", type=int, default=DEFAULT_CONFIG["parallel"])
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_CONFIG["max_queue"])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=DEFAULT_CONFIG["error_status"])
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--hang", type=float, default=DEFAULT_CONFIG["hang_s"], help="Segundos que se cuelga un timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    responses = {}
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            responses = json.load(f)
+    server = OllamaEmulator(
+        {
+            "models": args.models,
+            "responses": responses,
+            "tokens_per_s": args.tokens_per_s,
+            "ttft_s": args.ttft,
+            "load_s": args.load,
+            "parallel": args.parallel,
+            "max_queue": args.max_queue,
+            "error_rate": args.error_rate,
+            "error_status": args.error_status,
+            "malformed_rate": args.malformed_rate,
+            "timeout_rate": args.timeout_rate,
+            "hang_s": args.hang,
+            "seed": args.seed,
+        },
+        args.host,
+        args.port,
+    )
+    logger.info("Ollama emulator listening on %s", server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
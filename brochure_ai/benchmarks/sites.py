@@ -0,0 +1,128 @@
+"""
+Sitios corporativos sintéticos para benchmarks, servidos en localhost.
+
+Cada sitio se genera de forma determinista (semilla) a partir de un spec:
+- pages: páginas además de la home (about, services, careers, customers,
+  community, press y el resto posts de blog)
+- page_kb: tamaño aproximado del HTML de cada página
+- links: enlaces por página (menú + pie + enlaces en el cuerpo)
+- slow: páginas que tardan slow_delay segundos en responder
+- failing: páginas que responden 500
+
+Todos los sitios cuelgan del mismo servidor bajo /s<i>/.
+"""
+import time
+import random
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List
+
+DEFAULT_SPEC: Dict[str, Any] = {
+    "pages": 12,
+    "page_kb": 30,
+    "links": 40,
+    "slow": 0,
+    "slow_delay": 0.5,
+    "failing": 0,
+    "seed": 0,
+}
+
+_SECTIONS = ["about", "services", "careers", "customers", "community", "press"]
+_WORDS = (
+    "empresa soluciones clientes proyectos equipo innovación tecnología servicios "
+    "digitalización consultoría datos cloud sector industria banca retail energía "
+    "misión valores calidad experiencia talento sostenibilidad crecimiento mercado "
+    "plataforma producto integración seguridad analítica estrategia alianzas"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 18))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paths(spec: Dict[str, Any]) -> List[str]:
+    named = _SECTIONS[: spec["pages"]]
+    posts = [f"blog/post-{i}" for i in range(max(0, spec["pages"] - len(named)))]
+    return [""] + named + posts
+
+
+def generate_site(name: str, spec: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Devuelve {ruta: {"html": bytes, "slow": bool, "failing": bool}}.
+    La ruta "" es la home.
+    """
+    spec = {**DEFAULT_SPEC, **spec}
+    rng = random.Random(f"{name}:{spec['seed']}")
+    paths = _paths(spec)
+    inner = paths[1:]
+    slow = set(rng.sample(inner, min(spec["slow"], len(inner))))
+    failing = set(rng.sample([p for p in inner if p not in slow], min(spec["failing"], len(inner) - len(slow))))
+
+    site: Dict[str, Dict[str, Any]] = {}
+    for path in paths:
+        title = path.split("/")[-1].replace("-", " ").title() or "Inicio"
+        links = [f'<a href="/{{prefix}}/{p}">{p or "inicio"}</a>' for p in paths]
+        while len(links) < spec["links"]:
+            links.append(f'<a href="/{{prefix}}/{rng.choice(inner or [""])}#{len(links)}">más</a>')
+        body: List[str] = []
+        size = 0
+        while size < spec["page_kb"] * 1024:
+            para = " ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+            body.append(f"<h2>{_sentence(rng)[:40]}</h2><p>{para}</p>")
+            size += len(para) + 60
+        html = (
+            f"<html><head><title>{name} | {title}</title>"
+            f'<meta name="description" content="{name}: {_sentence(rng)}"></head><body>'
+            f"<nav>{' '.join(links[: spec['links'] // 2])}</nav>"
+            f"<main><h1>{title}</h1>{''.join(body)}</main>"
+            f"<footer>{' '.join(links[spec['links'] // 2:])}</footer></body></html>"
+        )
+        site[path] = {"html": html, "slow": path in slow, "failing": path in failing}
+    return site
+
+
+class _SitesHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parts = self.path.split("#", 1)[0].split("?", 1)[0].strip("/").split("/", 1)
+        site = self.server.sites.get(parts[0])
+        page = site.get(parts[1] if len(parts) > 1 else "") if site else None
+        if page is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if page["slow"]:
+            time.sleep(self.server.slow_delay)
+        if page["failing"]:
+            self.send_response(500)
+            self.end_headers()
+            return
+        raw = page["html"].replace("{prefix}", parts[0]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+@contextmanager
+def serve_sites(count: int, spec: Dict[str, Any]) -> Iterator[List[str]]:
+    """
+    Sirve count sitios generados con spec y devuelve sus URLs base.
+    """
+    spec = {**DEFAULT_SPEC, **spec}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SitesHandler)
+    server.daemon_threads = True
+    server.sites = {f"s{i}": generate_site(f"Empresa{i}", dict(spec, seed=spec["seed"] + i)) for i in range(count)}
+    server.slow_delay = spec["slow_delay"]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    try:
+        yield [f"http://127.0.0.1:{port}/s{i}/" for i in range(count)]
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,16 +1,73 @@
 import os
 import logging
-from typing import List, Any, Dict
+from collections.abc import Mapping
+from typing import List, Any, Dict, Optional, Tuple
 import json
 import re
-
-from .llm_ollama import chat_ollama
+from concurrent.futures import ThreadPoolExecutor
+
+from .deadline import Deadline, DeadlineExceeded, expired
+from .llm import chat, get_route, model_num_ctx
+from .tokens import count_tokens, pack_to_budget, prompt_budget
+from .passages import SECTION_TOPICS, format_passages, select_passages
+from .translation import translate_markdown
+from .page_summaries import summarize_pages
 from .scraping import scrape_and_extract
 from .link_selector import select_relevant_links
 from .compiler import compile_pages,summarize_content
 
 logger = logging.getLogger(__name__)
 MOCK_MODE = os.getenv("MOCK_MODE", "false").lower() == "true"
+# Tokens máximos de contenido libre en el prompt del folleto (~12.000 chars)
+BROCHURE_CONTENT_TOKENS = int(os.getenv("BROCHURE_CONTENT_TOKENS", "3000"))
+# Modo por secciones: cada sección se genera en paralelo con su propio contexto
+BROCHURE_SECTIONED = os.getenv("BROCHURE_SECTIONED", "false").lower() == "true"
+BROCHURE_SECTION_WORKERS = int(os.getenv("BROCHURE_SECTION_WORKERS", "5"))
+BROCHURE_SECTION_TOKENS = int(os.getenv("BROCHURE_SECTION_TOKENS", "900"))
+# Modo map-reduce: resumen LLM por página (cacheado) y folleto solo con resúmenes
+BROCHURE_MAP_REDUCE = os.getenv("BROCHURE_MAP_REDUCE", "false").lower() == "true"
+# Traducción por segmentos con memoria de traducción (false = un único prompt)
+TRANSLATION_SEGMENTED = os.getenv("TRANSLATION_SEGMENTED", "true").lower() == "true"
+
+# Secciones del folleto: clave de tema (passages.SECTION_TOPICS), tipos de página
+# de los que salen sus FACTS y tokens máximos de salida.
+SECTIONS: List[Dict[str, Any]] = [
+    {
+        "key": "resumen",
+        "title": "Resumen Ejecutivo",
+        "instructions": "1–2 párrafos con misión/propósito y foco real detectado en FACTS.",
+        "page_types": ("home", "about"),
+        "max_output": 300,
+    },
+    {
+        "key": "servicios",
+        "title": "Líneas de Servicio / Programas / Recursos",
+        "instructions": "Bullets con capacidades, programas, publicaciones o iniciativas que aparezcan en títulos/headings.",
+        "page_types": ("home", "about", "products", "services", "blog"),
+        "max_output": 350,
+    },
+    {
+        "key": "comunidad",
+        "title": "Comunidad / Ecosistema / Sectores",
+        "instructions": "Bullets con comunidades, eventos, públicos o sectores citados en FACTS.",
+        "page_types": ("community", "partners", "customers", "home"),
+        "max_output": 300,
+    },
+    {
+        "key": "evidencias",
+        "title": "Evidencias / Casos / Recursos",
+        "instructions": "4–8 bullets con nombres de páginas/secciones/recursos concretos (usa los títulos/headings).",
+        "page_types": ("customers", "press", "blog", "partners"),
+        "max_output": 350,
+    },
+    {
+        "key": "siguientes",
+        "title": "Próximos Pasos",
+        "instructions": "CTA coherente con lo observado (contribuir, unirse, descargar, participar, contactar).",
+        "page_types": ("careers", "community", "home"),
+        "max_output": 150,
+    },
+]
 
 
 def _extract_text_from_pages(pages: List[Any]) -> List[str]:
@@ -19,11 +76,11 @@ def _extract_text_from_pages(pages: List[Any]) -> List[str]:
     Prioriza:
     - summary
     - content
-    Si la pagina es un dict. Si no convierte a str
+    Si la pagina es un dict (o Page). Si no convierte a str
     """
     texts: List[str] = []
     for p in pages:
-        if isinstance(p, dict):
+        if isinstance(p, Mapping):
             txt = p.get("summary") or p.get("content") or ""
         else:
             txt = str(p)
@@ -43,7 +100,7 @@ def _facts_from_pages(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     facts: List[Dict[str, Any]] = []
     for p in pages[:10]:
-        if isinstance(p, dict):
+        if not isinstance(p, Mapping):
             continue
 
         facts.append({
@@ -55,15 +112,29 @@ def _facts_from_pages(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         })
     return facts
 
-def _pages_for_prompt(pages: List[Any], max_chars:int=12000)->str:
+def _pages_for_prompt(
+    pages: List[Any],
+    max_chars: int = 12000,
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+) -> str:
     """
     Junta el contenido relevante de las paginas en un unico bloque de texto,
-    respetando un limite de caracteres para no inflar el contetxo del LLM
+    respetando un limite de caracteres para no inflar el contetxo del LLM.
+    Si se pasa max_tokens, elige los pasajes mas relevantes para las secciones
+    del folleto (ver passages.py) hasta ese presupuesto exacto de tokens.
     """
     chunks = _extract_text_from_pages(pages)
     if not chunks:
         return ""
 
+    if max_tokens is not None:
+        selected = select_passages(pages, max_tokens, model)
+        if selected:
+            return format_passages(selected)
+        # sin pasajes puntuables: contenido en orden hasta el presupuesto
+        return "\n\n".join(pack_to_budget(chunks, max_tokens, model))
+
     buf:List[str] = []
     total=0
     for chunk in chunks:
@@ -72,7 +143,7 @@ def _pages_for_prompt(pages: List[Any], max_chars:int=12000)->str:
             remaining=max_chars-total
             if remaining>0:
                 buf.append(chunk[:remaining])
-                total+=re
+                total+=remaining
             break
         buf.append(chunk)
         total+=len(chunk)
@@ -141,24 +212,17 @@ def generate_brochure_mock(company_name: str, pages: List[Any], tone: str = "for
     return brochure
 
 
-def generate_brochure_llm(company_name: str, pages: List[Any], tone: str = "formal") -> str:
-    """
-    Genera el folleto llamando al LLM con:
-    -FACTS (json compacto)
-    - CONTENIDO libre (texto recortado de las paginas)
-    """
-
-    texts_for_prompt= _pages_for_prompt(pages, max_chars=12000)
-    facts_json= json.dumps(_facts_from_pages(pages), ensure_ascii=False, indent=2)
-
-    system_prompt = (
+def _system_prompt(tone: str) -> str:
+    return (
         "Eres un copywriter B2B. Entrega SOLO Markdown. "
         "PROHIBIDO inventar datos o usar placeholders. "
         "Tu misión es redactar un folleto corporativo sólido usando únicamente los FACTS "
         "y el contenido proporcionado. Tono: " + tone
     )
 
-    user_prompt = (
+
+def _brochure_user_prompt(company_name: str, facts_json: str, texts_for_prompt: str) -> str:
+    return (
         f"Empresa: {company_name}\n\n"
         f"FACTS (JSON fiable):\n{facts_json}\n\n"
         "Contenido adicional (texto libre):\n"
@@ -177,23 +241,214 @@ def generate_brochure_llm(company_name: str, pages: List[Any], tone: str = "form
         "• CTA coherente con lo observado (contribuir, unirse, descargar, participar, contactar).\n"
     )
 
-    draft = chat_ollama(system_prompt, user_prompt)
+
+def _content_budget(system_prompt: str, company_name: str, facts_json: str) -> int:
+    """
+    Tokens de contenido libre que caben en el prompt del folleto junto al resto
+    del prompt y la salida reservada (como mucho BROCHURE_CONTENT_TOKENS).
+    """
+    route = get_route("brochure")
+    fixed_prompt = system_prompt + _brochure_user_prompt(company_name, facts_json, "")
+    return min(
+        BROCHURE_CONTENT_TOKENS,
+        prompt_budget(fixed_prompt, route["max_output"], route["model"], model_num_ctx(route["model"])),
+    )
+
+
+def resolve_generation_modes(sectioned: Optional[bool], map_reduce: Optional[bool]) -> Tuple[bool, bool]:
+    """
+    Modos de generación efectivos: manda el argumento explícito y, si es None,
+    BROCHURE_SECTIONED / BROCHURE_MAP_REDUCE.
+    """
+    return (
+        BROCHURE_SECTIONED if sectioned is None else bool(sectioned),
+        BROCHURE_MAP_REDUCE if map_reduce is None else bool(map_reduce),
+    )
+
+
+def compile_budget(mode: str) -> Optional[int]:
+    """
+    Tokens de contenido de página que aprovecha la generación en cada modo,
+    para no descargar páginas que no cabrían (None = sin límite: map-reduce
+    resume cada página por separado y el mock no usa el contenido).
+    """
+    if mode == "single":
+        return BROCHURE_CONTENT_TOKENS
+    if mode == "sectioned":
+        return BROCHURE_SECTION_TOKENS * len(SECTIONS)
+    return None
+
+
+def generate_brochure_llm(
+    company_name: str, pages: List[Any], tone: str = "formal", deadline: Optional[Deadline] = None
+) -> str:
+    """
+    Genera el folleto llamando al LLM con:
+    -FACTS (json compacto)
+    - CONTENIDO libre (texto de las paginas ajustado al presupuesto de tokens
+      que deja el resto del prompt y la salida reservada)
+    """
+    facts_json= json.dumps(_facts_from_pages(pages), ensure_ascii=False, indent=2)
+
+    system_prompt = _system_prompt(tone)
+
+    model = get_route("brochure")["model"]
+    budget = _content_budget(system_prompt, company_name, facts_json)
+    texts_for_prompt = _pages_for_prompt(pages, max_tokens=budget, model=model)
+    logger.info("Brochure prompt: %d tokens de contenido (presupuesto %d)",
+                count_tokens(texts_for_prompt, model), budget)
+
+    user_prompt = _brochure_user_prompt(company_name, facts_json, texts_for_prompt)
+
+    draft = chat(system_prompt, user_prompt, call_type="brochure", deadline=deadline)
+    cleaned = _sanitize_brochure(draft)
+    return cleaned or "# Folleto\n\n(El modelo devolvió salida vacía.)"
+
+
+def generate_brochure_map_reduce(
+    company_name: str, pages: List[Any], tone: str = "formal", deadline: Optional[Deadline] = None
+) -> str:
+    """
+    Map-reduce: resume cada página con el LLM en paralelo (ver page_summaries.py)
+    y genera el folleto solo con FACTS y esos resúmenes, sin texto bruto.
+    """
+    facts_json = json.dumps(_facts_from_pages(pages), ensure_ascii=False, indent=2)
+    system_prompt = _system_prompt(tone)
+
+    summaries = [
+        f"[{s['type']}] {s['url']}\n{s['summary']}"
+        for s in summarize_pages(pages, deadline=deadline)
+        if s["summary"]
+    ]
+    model = get_route("brochure")["model"]
+    budget = _content_budget(system_prompt, company_name, facts_json)
+    texts_for_prompt = "\n\n".join(pack_to_budget(summaries, budget, model))
+    logger.info("Brochure prompt (map-reduce): %d resúmenes, %d tokens de contenido",
+                len(summaries), count_tokens(texts_for_prompt, model))
+
+    user_prompt = _brochure_user_prompt(company_name, facts_json, texts_for_prompt)
+    draft = chat(system_prompt, user_prompt, call_type="brochure", deadline=deadline)
     cleaned = _sanitize_brochure(draft)
     return cleaned or "# Folleto\n\n(El modelo devolvió salida vacía.)"
 
 
-def generate_brochure(company_name: str, pages: List[Any], tone: str = "formal", mock: bool = False) -> str:
+def _section_facts(pages: List[Any], section: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    FACTS de las páginas cuyo tipo encaja con la sección.
+    Si ninguna encaja (p. ej. tipos "auto" del modo mock), usa todos.
+    """
+    facts = _facts_from_pages(pages)
+    sliced = [f for f in facts if str(f.get("type", "")).lower() in section["page_types"]]
+    return (sliced or facts)[:6]
+
+
+def _generate_section(
+    company_name: str,
+    pages: List[Any],
+    tone: str,
+    section: Dict[str, Any],
+    deadline: Optional[Deadline] = None,
+) -> str:
+    """
+    Genera una única sección con sus FACTS y sus pasajes más relevantes.
+    """
+    route = get_route("brochure")
+    passages = select_passages(
+        pages,
+        BROCHURE_SECTION_TOKENS,
+        route["model"],
+        topics={section["key"]: SECTION_TOPICS[section["key"]]},
+    )
+    facts_json = json.dumps(_section_facts(pages, section), ensure_ascii=False, indent=2)
+
+    user_prompt = (
+        f"Empresa: {company_name}\n\n"
+        f"FACTS (JSON fiable):\n{facts_json}\n\n"
+        "Contenido adicional (texto libre):\n"
+        f"{format_passages(passages)}\n\n"
+        "Redacta SOLO esta sección del folleto, anclada en FACTS. "
+        "Si no hay evidencia suficiente, responde con una cadena vacía.\n"
+        f"## {section['title']}\n"
+        f"• {section['instructions']}\n"
+    )
+
+    draft = chat(
+        _system_prompt(tone),
+        user_prompt,
+        call_type="brochure",
+        max_output_tokens=section["max_output"],
+        deadline=deadline,
+    )
+    # el modelo a veces repite el título del folleto o reescribe el de la
+    # sección: quitamos los #/## y ponemos el título canónico
+    body = "\n".join(
+        line for line in (draft or "").splitlines()
+        if not re.match(r"^\s*#{1,2}\s", line)
+    ).strip()
+    if not body:
+        return ""
+    return f"## {section['title']}\n\n{body}"
+
+
+def generate_brochure_sectioned(
+    company_name: str, pages: List[Any], tone: str = "formal", deadline: Optional[Deadline] = None
+) -> str:
+    """
+    Genera las cinco secciones en paralelo (una llamada corta por sección) y
+    las une en orden. Reduce la latencia total cuando Ollama tiene varios slots
+    (OLLAMA_NUM_PARALLEL > 1).
+    """
+    workers = max(1, min(BROCHURE_SECTION_WORKERS, len(SECTIONS)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="section") as pool:
+        futures = [
+            pool.submit(_generate_section, company_name, pages, tone, section, deadline)
+            for section in SECTIONS
+        ]
+        parts = []
+        for section, fut in zip(SECTIONS, futures):
+            try:
+                parts.append(fut.result())
+            except Exception as e:
+                logger.warning("Sección '%s' omitida: %s", section["title"], e)
+
+    body = "\n\n".join(p for p in parts if p)
+    if not body and expired(deadline):
+        raise DeadlineExceeded("run deadline exceeded before any section was generated")
+    cleaned = _sanitize_brochure(f"# {company_name} – Folleto Corporativo\n\n{body}")
+    return cleaned if body else "# Folleto\n\n(El modelo devolvió salida vacía.)"
+
+
+def generate_brochure(
+    company_name: str,
+    pages: List[Any],
+    tone: str = "formal",
+    mock: bool = False,
+    sectioned: Optional[bool] = None,
+    map_reduce: Optional[bool] = None,
+    deadline: Optional[Deadline] = None,
+) -> str:
     """
     Punto de entrada actual utilizado por CLI.
     - Si mock=TRUE o MOCK_MODE=true -> usa generate_brochure_mock
+    - Si sectioned (o BROCHURE_SECTIONED=true) -> usa generate_brochure_sectioned
+    - Si map_reduce (o BROCHURE_MAP_REDUCE=true) -> usa generate_brochure_map_reduce
     - En caso contrario -> usa generate_brochure_llm
     """
     if mock or MOCK_MODE:
         logger.info("Generating brochure in MOCK mode (explicit)")
         return generate_brochure_mock(company_name, pages, tone)
 
+    sectioned, map_reduce = resolve_generation_modes(sectioned, map_reduce)
+    if sectioned:
+        logger.info("Generating brochure with LLM (sectioned, parallel)")
+        return generate_brochure_sectioned(company_name, pages, tone, deadline)
+
+    if map_reduce:
+        logger.info("Generating brochure with LLM (map-reduce over page summaries)")
+        return generate_brochure_map_reduce(company_name, pages, tone, deadline)
+
     logger.info("Generating brochure with OLLAMA")
-    return generate_brochure_llm(company_name, pages, tone)
+    return generate_brochure_llm(company_name, pages, tone, deadline)
 
 def details(url:str, mock:bool = False,max_chars:int=12000) -> str:
     """
@@ -211,11 +466,19 @@ def details(url:str, mock:bool = False,max_chars:int=12000) -> str:
 def translate_brochure(
     brochure_text: str,
     target_lang: str = "en",
+    segmented: Optional[bool] = None,
+    deadline: Optional[Deadline] = None,
 ) -> str:
     """
     Traduce el folleto a target_lang manteniendo el formato Markdown.
     Fuerza al modelo a responder solo en el idioma destino, sin mezclar.
+    - segmented (por defecto TRANSLATION_SEGMENTED): traduce por segmentos en
+      paralelo reutilizando la memoria de traducción (ver translation.py)
+    - si no, envía el folleto entero en un único prompt
     """
+    if segmented if segmented is not None else TRANSLATION_SEGMENTED:
+        return translate_markdown(brochure_text, target_lang, deadline=deadline)
+
     system_prompt = (
         "You are a professional translator. "
         "You ALWAYS respond only in the target language, "
@@ -252,5 +515,9 @@ Now translate this brochure:
 ```markdown
 {brochure_text}""".strip()
 
-    translated = chat_ollama(system_prompt, user_prompt)
+    # La traducción ocupa algo más que el original (tokenizers sesgados al inglés)
+    max_output = int(count_tokens(brochure_text, get_route("translate")["model"]) * 1.3) + 64
+    translated = chat(
+        system_prompt, user_prompt, call_type="translate", max_output_tokens=max_output, deadline=deadline
+    )
     return translated.strip() if translated else brochure_text
\ No newline at end of file
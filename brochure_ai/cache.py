@@ -0,0 +1,91 @@
+"""
+Cachés persistentes (SQLite) compartidas entre runs, hilos y procesos.
+"""
+import os
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+BROCHURE_CACHE_DIR = os.getenv("BROCHURE_CACHE_DIR", os.path.join("outputs", ".cache"))
+
+
+class KVCache:
+    """
+    Caché clave -> texto en un fichero SQLite.
+    Una conexión por instancia protegida con lock; WAL permite que varios
+    procesos (batch, servicio) la lean y escriban a la vez.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS kv (k TEXT PRIMARY KEY, v TEXT NOT NULL)")
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT v FROM kv WHERE k = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.CACHE_REQUESTS.inc(cache=self.name, result="miss")
+                return None
+            self.hits += 1
+            metrics.CACHE_REQUESTS.inc(cache=self.name, result="hit")
+            return row[0]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        with self._lock:
+            # SQLite limita el número de parámetros por consulta
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for k, v in self._conn.execute(f"SELECT k, v FROM kv WHERE k IN ({marks})", chunk):
+                    found[k] = v
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        if found:
+            metrics.CACHE_REQUESTS.inc(len(found), cache=self.name, result="hit")
+        if len(keys) > len(found):
+            metrics.CACHE_REQUESTS.inc(len(keys) - len(found), cache=self.name, result="miss")
+        return found
+
+    def set(self, key: str, value: str) -> None:
+        self.set_many([(key, value)])
+
+    def set_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO kv (k, v) VALUES (?, ?)", items)
+            self._conn.commit()
+
+
+_CACHES: Dict[str, KVCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(name: str) -> KVCache:
+    """
+    Devuelve (creándola la primera vez) la caché BROCHURE_CACHE_DIR/<name>.sqlite.
+    """
+    with _CACHES_LOCK:
+        if name not in _CACHES:
+            path = os.path.join(BROCHURE_CACHE_DIR, f"{name}.sqlite")
+            logger.info("Cache %s: %s", name, path)
+            _CACHES[name] = KVCache(path)
+        return _CACHES[name]
@@ -0,0 +1,164 @@
+"""
+Checkpoints por etapa para reanudar un run que ha fallado.
+
+Cada etapa terminada deja su artefacto en el directorio del run y se apunta en
+manifest.json:
+- scrape   -> landing.html + links.json
+- select   -> selected.json
+- compile  -> pages.json
+- generate -> brochure.md
+- translate (sin artefacto propio: las traducciones ya están en output_dir)
+
+Con resume=True se restauran las etapas completas cuyas entradas no han
+cambiado y el pipeline sigue desde la primera incompleta; un fallo en la
+generación o la traducción solo cuesta repetir ese paso.
+"""
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from .llm import get_route
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+MANIFEST = "manifest.json"
+
+# etapa -> {clave del run: fichero}; .json se serializa, el resto es texto
+STAGE_ARTIFACTS: Dict[str, Dict[str, str]] = {
+    "scrape": {"html_main": "landing.html", "links": "links.json"},
+    "select": {"selected": "selected.json"},
+    "compile": {"pages": "pages.json"},
+    "generate": {"brochure_md": "brochure.md"},
+    "translate": {},
+}
+# valores pequeños del run que se guardan en el propio manifest
+STAGE_STATE: Dict[str, List[str]] = {
+    "scrape": ["company_name", "slug", "fp_path"],
+    "select": ["degraded"],
+    "compile": ["compile_stats", "degraded"],
+    "generate": ["md_path", "html_path", "degraded"],
+    "translate": ["translated_paths", "timings", "failed_languages"],
+}
+
+
+def default_run_dir(output_dir: str, url: str) -> str:
+    """
+    <output_dir>/.runs/<url normalizada>: un directorio por sitio.
+    """
+    key = "".join(c if c.isalnum() else "_" for c in url.split("://", 1)[-1].rstrip("/")).lower()
+    return os.path.join(output_dir, ".runs", key or "run")
+
+
+def _stage_inputs(run: Dict[str, Any], name: str) -> Dict[str, Any]:
+    """
+    Parámetros del run de los que depende cada etapa.
+    """
+    if name == "scrape":
+        return {"url": run["url"], "company": run["company"]}
+    if name == "select":
+        return {"mock": run["mock"], "model": None if run["mock"] else get_route("links")["model"]}
+    if name == "compile":
+        # las páginas se compilan hasta el presupuesto del modo de generación
+        return {"mode": run["mode"], "budget": run["compile_budget"]}
+    if name == "generate":
+        return {
+            "tone": run["tone"],
+            "mode": run["mode"],
+            "model": None if run["mock"] else get_route("brochure")["model"],
+        }
+    if name == "translate":
+        return {"languages": run["languages"]}
+    return {}
+
+
+def load_manifest(run_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(run_dir, MANIFEST), encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning("Manifest ilegible en %s: %s", run_dir, e)
+        return {}
+    if data.get("version") != CHECKPOINT_VERSION:
+        return {}
+    return data
+
+
+def _jsonable(obj: Any) -> Any:
+    # páginas compiladas (compiler.Page) -> dict
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def _write(path: str, content: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def save_stage(run_dir: str, manifest: Dict[str, Any], name: str, run: Dict[str, Any]) -> None:
+    """
+    Persiste el artefacto de una etapa y la marca como completa en el manifest.
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    files = {}
+    for key, filename in STAGE_ARTIFACTS[name].items():
+        value = run[key]
+        content = json.dumps(value, ensure_ascii=False, default=_jsonable) if filename.endswith(".json") else value
+        _write(os.path.join(run_dir, filename), content)
+        files[key] = filename
+
+    # las etapas posteriores dejan de valer: dependen de esta
+    names = list(STAGE_ARTIFACTS)
+    for later in names[names.index(name) + 1:]:
+        manifest.setdefault("stages", {}).pop(later, None)
+    manifest.setdefault("stages", {})[name] = {
+        "files": files,
+        "state": {k: run.get(k) for k in STAGE_STATE[name]},
+        "inputs": _stage_inputs(run, name),
+        "current": run.get("current", {}),
+        "skipped": list(run["skipped"]),
+        "finished_at": time.time(),
+    }
+    manifest.update(version=CHECKPOINT_VERSION, url=run["url"], complete=name == names[-1])
+    _write(os.path.join(run_dir, MANIFEST), json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+def restore(run_dir: str, manifest: Dict[str, Any], run: Dict[str, Any]) -> List[str]:
+    """
+    Carga en run las etapas completas (en orden) hasta la primera que falta,
+    tiene artefactos perdidos o entradas distintas. Devuelve sus nombres.
+    Un run ya completo no se restaura: --resume sobre él empieza de cero.
+    """
+    if not manifest or manifest.get("complete") or manifest.get("url") != run["url"]:
+        return []
+
+    restored: List[str] = []
+    last: Optional[Dict[str, Any]] = None
+    for name, artifacts in STAGE_ARTIFACTS.items():
+        entry = manifest.get("stages", {}).get(name)
+        if not entry or entry.get("inputs") != _stage_inputs(run, name):
+            break
+        values = {}
+        try:
+            for key, filename in artifacts.items():
+                with open(os.path.join(run_dir, filename), encoding="utf-8") as f:
+                    values[key] = json.load(f) if filename.endswith(".json") else f.read()
+        except (OSError, ValueError) as e:
+            logger.warning("Checkpoint %s incompleto (%s): se repite desde aquí", name, e)
+            break
+        run.update(values)
+        run.update(entry.get("state", {}))
+        restored.append(name)
+        last = entry
+
+    if last is not None:
+        run["current"] = dict(last.get("current", {}))
+        run["skipped"] = list(last.get("skipped", []))
+    return restored
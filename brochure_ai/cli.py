@@ -5,13 +5,19 @@ import argparse
 import os
 import sys
 import logging
-from pathlib import Path
-from bs4 import BeautifulSoup
 
-from .scraping import scrape_and_extract
-from .link_selector import select_relevant_links
-from .compiler import compile_pages, summarize_content
-from .brochure import generate_brochure, translate_brochure
+# Los módulos del pipeline (bs4, requests, numpy...) se importan dentro de main,
+# después de parsear los argumentos: --help y los errores de uso no los cargan.
+_PIPELINE_EXPORTS = ("_autodetect_company_name", "export_html", "run_pipeline", "save_markdown", "slugify")
+
+
+def __getattr__(name):
+    # slugify/save_markdown/export_html viven en pipeline; se re-exportan aquí
+    if name in _PIPELINE_EXPORTS:
+        from . import pipeline
+        return getattr(pipeline, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 logging.basicConfig(
     level=logging.INFO,
@@ -20,87 +26,6 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def slugify(text: str) -> str:
-    """
-    Convierte un nombre arbitrario a un slug de fichero sencillo
-    """
-    return "".join(c if c.isalnum() else "_" for c in text).lower()
-
-
-def save_markdown(content: str, filepath: str):
-    """
-    Persiste contenido MD en disco creando carpetas si hace falta
-    """
-    path = Path(filepath)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(content,encoding="utf-8")
-    logger.info(f"Contenido MD guardadi en disco {path}")
-
-
-def export_html(markdown_content: str, filepath: str):
-    """
-    Exporta MD a HTML sencillo y legible
-    """
-    try:
-        import markdown
-    except ImportError:
-        logger.warning("markdown library not installed. Skipping HTML export.")
-        return
-
-    try:
-        html = markdown.markdown(markdown_content)
-        full_html = f"""<!DOCTYPE html>
-<html lang="es">
-<head>
-<meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1.0">
-<title>Corporate Brochure</title>
-<style>
-body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; color: #333; }}
-h1 {{ color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px; }}
-h2 {{ color: #34495e; margin-top: 30px; }}
-h3 {{ color: #555; }}
-ul {{ padding-left: 20px; }}
-li {{ margin: 8px 0; }}
-hr {{ margin: 30px 0; border: none; border-top: 1px solid #ddd; }}
-</style>
-</head>
-<body>
-{html}
-</body>
-</html>"""
-        path = Path(filepath)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(full_html, encoding="utf-8")
-        logger.info("HTML exported to: %s", path)
-    except Exception as e:
-        logger.error("Error exporting HTML: %s", e)
-
-def _autodetect_company_name(html_main:str, fallback:str)->str:
-    """
-    Intenta extraer un nombre de empresa razonable del HTML si el nombre pasado
-    es un placeholder como 'EJEMPLO SA'
-    """
-    lower_name= fallback.strip().lower()
-    if lower_name not in ("ejemplo sa","ejemplo","example","demo",""):
-        return fallback
-
-    try:
-        soup=BeautifulSoup(html_main,"html.parser")
-        auto = None
-        og_site= soup.find("meta", attrs={"property":"og:site_name"})
-        if og_site and og_site.get("content"):
-            auto = og_site.get("content").strip()
-        elif soup.title and soup.title.string:
-            auto = soup.title.string.strip().split("_")[0].split("|")[0]
-
-        if auto:
-            logger.info(f"Autodetected company name: {auto}")
-            return auto
-    except Exception as e:
-        logger.error("Error autodetecting company name: %s", e)
-    return fallback
-
-
 def main() -> None:
     parser = argparse.ArgumentParser(description="Generador de Folletos Corporativos con IA")
     parser.add_argument("--company", required=True, help="Nombre de la empresa")
@@ -122,13 +47,90 @@ def main() -> None:
         action="store_true",
         help="Usar modo mock (sin LLM)",
     )
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument(
+        "--sectioned",
+        action="store_true",
+        help="Generar cada sección del folleto en paralelo (útil con OLLAMA_NUM_PARALLEL > 1)",
+    )
+    mode_group.add_argument(
+        "--map-reduce",
+        action="store_true",
+        help="Resumir cada página con el LLM (en paralelo y cacheado) y generar el folleto solo con los resúmenes",
+    )
     parser.add_argument(
         "--translate-to",
-        help="Si se indica, traduce el folleto al idioma destino (por ejemplo: en, fr, de)",
+        nargs="+",
+        metavar="LANG",
+        help=(
+            "Si se indica, traduce el folleto a uno o varios idiomas destino en paralelo "
+            "(por ejemplo: --translate-to en fr de, o en,fr,de)"
+        ),
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerar todo aunque el contenido del sitio no haya cambiado",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reanudar el último run fallido desde la primera etapa incompleta",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Medir cada etapa y cada URL: escribe <slug>_trace.json (Chrome trace) e imprime un resumen",
+    )
+    parser.add_argument(
+        "--profile-cpu",
+        action="store_true",
+        help="Como --profile y además un perfil cProfile del parseo en <slug>_cpu.prof",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Tiempo máximo del run: al agotarse se genera con lo compilado hasta entonces (default RUN_DEADLINE)",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Volcar al terminar las métricas del run (formato Prometheus, textfile de node_exporter)",
+    )
+    archive_group = parser.add_mutually_exclusive_group()
+    archive_group.add_argument(
+        "--record",
+        metavar="ARCHIVE",
+        default=None,
+        help="Grabar todas las descargas del run en un archivo comprimido e indexado",
+    )
+    archive_group.add_argument(
+        "--replay",
+        metavar="ARCHIVE",
+        default=None,
+        help="Servir las descargas desde un archivo grabado con --record (sin red)",
+    )
+    parser.add_argument(
+        "--run-dir",
+        default=None,
+        help="Directorio de checkpoints del run (default <output-dir>/.runs/<url>)",
     )
 
     args = parser.parse_args()
 
+    from .pipeline import run_pipeline
+    from .checkpoint import default_run_dir
+    from .llm import keep_models_loaded
+    from .llm_ollama import llm_stats_summary
+    from . import archive, metrics, tracing
+
+    if args.profile or args.profile_cpu:
+        tracing.enable(profile_cpu=args.profile_cpu)
+    result = None
+
     mock_mode = args.mock or os.getenv("MOCK_MODE", "false").lower() == "true"
     if mock_mode:
         os.environ["MOCK_MODE"] = "true"
@@ -136,65 +138,88 @@ def main() -> None:
     else:
         logger.info("Running in LLM mode (Ollama)")
 
-    try:
-        # Paso 1: Scraping
-        logger.info("Step 1/4: Scraping %s", args.url)
-        html_main, links = scrape_and_extract(args.url)
-        logger.info("Found %d links", len(links))
-
-        # Autodetectar nombre real si pasas 'Ejemplo SA' u otro placeholder
-        company_name = _autodetect_company_name(html_main, args.company)
-
-        # Paso 2: Selección de enlaces con LLM o mock
-        logger.info("Step 2/4: Selecting relevant links")
-        selected = select_relevant_links(args.url, links, mock=mock_mode)
-        logger.info("Selected %d relevant links", len(selected.get("links", [])))
-
-        # Paso 3: Compilar y resumir contenido
-        logger.info("Step 3/4: Compiling pages")
-        pages = compile_pages(selected, html_main, base_url=args.url)
-        pages = summarize_content(pages)
-        logger.info("Compiled %d pages", len(pages))
-
-        # Paso 4: Generación folleto
-        logger.info("Step 4/4: Generating brochure")
-        brochure_md = generate_brochure(company_name, pages, args.tone, mock=mock_mode)
-
-        slug = slugify(company_name)
-        out_dir = args.output_dir
-
-        # Guardar folleto original
-        md_path = os.path.join(out_dir, f"{slug}_brochure.md")
-        save_markdown(brochure_md, md_path)
-        if args.export_html:
-            html_path = os.path.join(out_dir, f"{slug}_brochure.html")
-            export_html(brochure_md, html_path)
-
-        # Traducción opcional
-        translated_paths = []
-        if args.translate_to:
-            target = args.translate_to
-            logger.info("Translating brochure to %s", target)
-            brochure_tr = translate_brochure(brochure_md, target_lang=target)
-            md_tr_path = os.path.join(out_dir, f"{slug}_brochure_{target}.md")
-            save_markdown(brochure_tr, md_tr_path)
-            translated_paths.append(md_tr_path)
-
-            if args.export_html:
-                html_tr_path = os.path.join(out_dir, f"{slug}_brochure_{target}.html")
-                export_html(brochure_tr, html_tr_path)
-                translated_paths.append(html_tr_path)
-
-        logger.info("Brochure generation completed successfully!")
-        print("\n" + "=" * 60)
-        print(f"Brochure saved to: {md_path}")
-        if translated_paths:
-            for p in translated_paths:
-                print(f"Translated version saved to: {p}")
-        print("=" * 60 + "\n")
-
-    except Exception as e:
-        logger.error("Error during execution: %s", e)
-        sys.exit(1)
+    # Precarga los modelos en segundo plano mientras se hace el scraping
+    with keep_models_loaded(enabled=not mock_mode):
+        try:
+            if args.record:
+                archive.record(args.record)
+            elif args.replay:
+                archive.replay(args.replay)
+            result = run_pipeline(
+                args.company,
+                args.url,
+                tone=args.tone,
+                output_dir=args.output_dir,
+                with_html=args.export_html,
+                mock=mock_mode,
+                sectioned=args.sectioned or None,
+                map_reduce=args.map_reduce or None,
+                languages=args.translate_to,
+                force=args.force,
+                run_dir=args.run_dir or default_run_dir(args.output_dir, args.url),
+                resume=args.resume,
+                deadline=args.deadline,
+            )
+
+            logger.info("Brochure generation completed successfully!")
+            llm = llm_stats_summary()
+            if llm["calls"]:
+                logger.info(
+                    "LLM: %d calls, load %.2fs, prompt eval %.2fs, generation %.2fs (cold start %.0f%% of %.2fs)",
+                    llm["calls"],
+                    llm["load_s"],
+                    llm["prompt_eval_s"],
+                    llm["eval_s"],
+                    llm["cold_start_ratio"] * 100,
+                    llm["wall_s"],
+                )
+            print("\n" + "=" * 60)
+            print(f"Brochure saved to: {result['md_path']}")
+            if result["translated_paths"]:
+                for p in result["translated_paths"]:
+                    print(f"Translated version saved to: {p}")
+            for lang in result["languages"]:
+                if lang in result["timings"]:
+                    status = f"{result['timings'][lang]:.1f}s"
+                elif lang in result["failed_languages"]:
+                    status = "FAILED"
+                else:
+                    status = "unchanged"
+                print(f"  translate {lang:<6} {status}")
+            if result["compile_stats"].get("avoided_fetches"):
+                print(f"Fetches avoided (prompt budget covered): {result['compile_stats']['avoided_fetches']}")
+            if result["degraded"]:
+                print(f"Deadline reached, degraded: {', '.join(result['degraded'])}")
+            if result["resumed"]:
+                print(f"Resumed after: {', '.join(result['resumed'])}")
+            if result["skipped"]:
+                print(f"Reused from previous run: {', '.join(result['skipped'])}")
+            if args.record:
+                print(f"Site archive saved to: {args.record}")
+            print("=" * 60 + "\n")
+
+        except Exception as e:
+            logger.error("Error during execution: %s", e)
+            sys.exit(1)
+        finally:
+            archive.close()
+            if tracing.is_enabled():
+                _write_profile(tracing, args.output_dir, result["slug"] if result else "run")
+            if args.metrics_file:
+                print(f"Metrics saved to: {metrics.write_textfile(args.metrics_file)}")
+
+
+def _write_profile(tracing, output_dir: str, slug: str) -> None:
+    """
+    Vuelca la traza (también si el run falló) y el resumen por etapa.
+    """
+    trace_path = tracing.write_chrome_trace(os.path.join(output_dir, f"{slug}_trace.json"))
+    print(tracing.summary_table())
+    print(f"Trace saved to: {trace_path} (chrome://tracing o ui.perfetto.dev)")
+    cpu_path = tracing.dump_cpu_profile(os.path.join(output_dir, f"{slug}_cpu.prof"))
+    if cpu_path:
+        print(f"CPU profile saved to: {cpu_path} (python -m pstats)")
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
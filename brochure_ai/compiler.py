@@ -1,12 +1,35 @@
+import os
+import time
 import logging
-from typing import Dict, List, Any
-
-from bs4 import BeautifulSoup
+import threading
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 
+from . import metrics
+from .deadline import Deadline, expired, timeout_for
+from .parsing import PARSE_CHUNKSIZE, is_active as parse_pool_active, parse_pages
 from .scraping import fetch_page, clean_text
+from .summarizer import page_summary
+from .tokens import estimate_tokens_local
+from .tracing import cpu_profile, span
 
 logger = logging.getLogger(__name__)
 
+# Páginas candidatas que se descargan mientras el LLM elige enlaces (0 = desactivado)
+PREFETCH_TOP = int(os.getenv("PREFETCH_TOP", "6"))
+# Hilos compartidos por todos los runs del proceso para esas descargas
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+
+# Con presupuesto, se compila hasta HEADROOM x los tokens que usará el prompt:
+# el margen deja elegir pasajes por sección en vez de quedarse con los primeros
+COMPILE_BUDGET_HEADROOM = float(os.getenv("COMPILE_BUDGET_HEADROOM", "1.5"))
+# Páginas seleccionadas que se compilan siempre (sus FACTS cubren varias secciones)
+COMPILE_MIN_PAGES = int(os.getenv("COMPILE_MIN_PAGES", "3"))
+
+_PREFETCH_POOL: Optional[ThreadPoolExecutor] = None
+_PREFETCH_LOCK = threading.Lock()
+
 
 def extract_metadata(html: str, url: str, page_type: str = "page") -> Dict[str, Any]:
     """
@@ -15,6 +38,8 @@ def extract_metadata(html: str, url: str, page_type: str = "page") -> Dict[str,
     - headings (h1, h2)
     - meta description
     """
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html or "", "html.parser")
 
     title = ""
@@ -35,11 +60,203 @@ def extract_metadata(html: str, url: str, page_type: str = "page") -> Dict[str,
     }
 
 
+_EMPTY_META: Dict[str, Any] = {"title": "", "headings": [], "description": ""}
+
+
+class Page(Mapping):
+    """
+    Página compilada compacta. Guarda el HTML en bytes y calcula al primer
+    acceso el texto limpio y los metadatos (y después el resumen); en cuanto
+    los tiene suelta el HTML. Se lee como el dict de antes (page["content"],
+    page.get("title")...) y release() suelta también el texto cuando el
+    prompt ya está montado: quedan url, tipo, metadatos y resumen.
+    """
+    __slots__ = ("type", "url", "_raw", "_encoding", "_content", "_meta", "_summary")
+
+    FIELDS = ("type", "url", "content", "title", "headings", "description", "summary")
+
+    def __init__(self, raw: bytes, url: str, type: str = "page", encoding: str = "utf-8"):
+        self.type = type
+        self.url = url
+        self._raw: Optional[bytes] = raw
+        self._encoding = encoding
+        self._content: Optional[str] = None
+        self._meta: Optional[Dict[str, Any]] = None
+        self._summary: Optional[str] = None
+
+    @classmethod
+    def from_html(cls, html: str, url: str, type: str = "page") -> "Page":
+        return cls((html or "").encode("utf-8"), url, type)
+
+    def _parse(self) -> None:
+        start = time.perf_counter()
+        html = self._raw.decode(self._encoding, errors="replace") if self._raw is not None else ""
+        with span("parse", cat="cpu", url=self.url), cpu_profile():
+            if self._content is None:
+                self._content = clean_text(html)
+            if self._meta is None:
+                self._meta = extract_metadata(html, self.url, self.type)
+        self._raw = None
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - start, where="inline")
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._parse()
+        return self._content
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        if self._meta is None:
+            self._parse()
+        return self._meta
+
+    @property
+    def summary(self) -> str:
+        if self._summary is None:
+            self._summary = page_summary(self.meta["description"], self.content)
+        return self._summary
+
+    @summary.setter
+    def summary(self, value: str) -> None:
+        self._summary = value
+
+    @property
+    def raw_size(self) -> int:
+        """
+        Bytes de HTML aún sin parsear (0 una vez parseada).
+        """
+        return len(self._raw) if self._raw is not None else 0
+
+    @property
+    def parsed(self) -> bool:
+        return self._content is not None and self._meta is not None
+
+    def raw_html(self) -> Tuple[bytes, str]:
+        """
+        (HTML en bytes, codificación) para parsear fuera (parsing.parse_pages).
+        """
+        return self._raw or b"", self._encoding
+
+    def set_parsed(self, content: str, meta: Dict[str, Any]) -> None:
+        """
+        Guarda el resultado de un parseo hecho fuera y suelta el HTML.
+        """
+        self._content = content
+        self._meta = meta
+        self._raw = None
+
+    def parse(self) -> "Page":
+        """
+        Calcula ya texto, metadatos y resumen (p. ej. en un hilo de prefetch).
+        """
+        _ = self.summary
+        return self
+
+    def release(self) -> None:
+        """
+        Suelta HTML y texto limpio. Lo no calculado antes queda vacío.
+        """
+        self._raw = None
+        self._content = ""
+        if self._meta is None:
+            self._meta = dict(_EMPTY_META)
+        if self._summary is None:
+            self._summary = self._meta["description"]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in ("type", "url", "content", "summary"):
+            return getattr(self, key)
+        if key in _EMPTY_META:
+            return self.meta[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in ("type", "url", "summary"):
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f"Page({self.type!r}, {self.url!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self.FIELDS}
+
+
+def _build_page(html: str, url: str, ptype: str) -> Page:
+    """
+    Página a partir del HTML descargado; el parseo (CPU) se hace al leerla.
+    """
+    return Page.from_html(html, url, ptype)
+
+
+def _prefetch_pool() -> ThreadPoolExecutor:
+    global _PREFETCH_POOL
+    with _PREFETCH_LOCK:
+        if _PREFETCH_POOL is None:
+            _PREFETCH_POOL = ThreadPoolExecutor(
+                max_workers=max(1, PREFETCH_WORKERS),
+                thread_name_prefix="prefetch",
+            )
+        return _PREFETCH_POOL
+
+
+def _fetch_and_build(url: str, deadline: Optional[Deadline] = None) -> Page:
+    page = _build_page(fetch_page(url, deadline=deadline), url, "page")
+    if parse_pool_active():
+        # con pool, compile_pages la envía junto con las demás en un lote
+        return page
+    # se parsea ya: el CPU también se solapa con la espera del LLM
+    return page.parse()
+
+
+def _content_tokens(pages: List[Page]) -> int:
+    # un solo envío al pool para todas (las pequeñas se parsean aquí al leerlas)
+    parse_pages(pages)
+    return sum(estimate_tokens_local(p.content) for p in pages)
+
+
+def prefetch_pages(urls: List[str], deadline: Optional[Deadline] = None) -> Dict[str, Future]:
+    """
+    Descarga y parsea urls en segundo plano. Devuelve {url: Future con la
+    página}; compile_pages usa las que acaben seleccionadas.
+    """
+    pool = _prefetch_pool()
+    logger.info("Prefetching %d candidate pages", len(urls))
+    return {url: pool.submit(_fetch_and_build, url, deadline) for url in urls}
+
+
+def cancel_prefetch(prefetched: Optional[Dict[str, Future]]) -> None:
+    """
+    Cancela las descargas que aún no han empezado (las que ya corren terminan
+    y su resultado se descarta).
+    """
+    for fut in (prefetched or {}).values():
+        fut.cancel()
+
+
+def _link_score(item: Dict[str, Any]) -> float:
+    try:
+        return float(item.get("score") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
 def compile_pages(
     selected_links: Dict[str, Any],
     main_html: str,
     base_url: str,
-) -> List[Dict[str, Any]]:
+    prefetched: Optional[Dict[str, Future]] = None,
+    budget_tokens: Optional[int] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    deadline: Optional[Deadline] = None,
+) -> List[Page]:
     """
     A partir de:
       - HTML principal (landing)
@@ -55,79 +272,151 @@ def compile_pages(
       - headings
       - description
       - summary
+
+    prefetched ({url: Future}, ver prefetch_pages) evita volver a descargar
+    las páginas ya pedidas mientras el LLM elegía; las no usadas se cancelan.
+    Las páginas son objetos Page (se leen como dicts y se parsean al leerlas).
+    Con el pool de parseo activo (parsing.py, modo batch) el HTML grande se
+    parsea en otros procesos, en lotes.
+
+    Con budget_tokens (tokens de contenido que aprovechará el prompt) los
+    enlaces se procesan por score y se deja de descargar cuando el contenido
+    compilado cubre el presupuesto (con COMPILE_BUDGET_HEADROOM de margen y
+    al menos COMPILE_MIN_PAGES páginas). stats recibe cuántas descargas se
+    han evitado. Con el pool activo el presupuesto se comprueba cada
+    PARSE_CHUNKSIZE páginas descargadas, que van al pool en un solo envío
+    (a cambio, se pueden descargar hasta PARSE_CHUNKSIZE - 1 páginas de más).
+
+    Con deadline cada descarga tiene como máximo el tiempo que queda y, al
+    agotarse, se devuelven las páginas compiladas hasta entonces (el resto
+    de enlaces, salvo los ya adelantados, se cuenta en stats["deadline_skipped"]).
     """
     pages: List[Dict[str, Any]] = []
+    prefetched = dict(prefetched or {})
+    prefetch_used = 0
+    limit = int(budget_tokens * COMPILE_BUDGET_HEADROOM) if budget_tokens is not None else None
+    content_tokens = 0
+    # páginas descargadas aún sin contar en content_tokens
+    uncounted: List[Page] = []
+    batch = max(1, PARSE_CHUNKSIZE) if parse_pool_active() else 1
 
     # 1) Página principal (landing)
     if main_html:
-        content = clean_text(main_html)
-        main_page: Dict[str, Any] = {
-            "type": "home",
-            "url": base_url,
-            "content": content,
-        }
-        main_page.update(extract_metadata(main_html, base_url, "home"))
-        main_page["summary"] = (
-            (main_page.get("description") or "")[:500]
-            or content[:600]
-        )
+        main_page = _build_page(main_html, base_url, "home")
         logger.info(
-            "Compilada landing (%s): %s chars",
+            "Compilada landing (%s): %s bytes",
             base_url,
-            len(content),
+            main_page.raw_size,
         )
         pages.append(main_page)
+        uncounted.append(main_page)
 
     # 2) Páginas seleccionadas por el LLM (About, Careers, Customers, etc.)
     items = selected_links.get("links", []) if isinstance(selected_links, dict) else []
-    for item in items:
-        if not isinstance(item, dict):
-            continue
+    items = [
+        item for item in items
+        if isinstance(item, dict) and item.get("url") and item["url"] != base_url
+    ]
+    if limit is not None:
+        items.sort(key=_link_score, reverse=True)
 
-        url = item.get("url")
-        if not url or url == base_url:
-            continue
+    compiled = 0
+    skipped: List[Dict[str, Any]] = []
+    late: List[Dict[str, Any]] = []
+    for idx, item in enumerate(items):
+        if limit is not None and compiled >= COMPILE_MIN_PAGES and len(uncounted) >= batch:
+            content_tokens += _content_tokens(uncounted)
+            uncounted = []
+            if content_tokens >= limit:
+                skipped = items[idx:]
+                break
 
+        url = item["url"]
         ptype = item.get("type") or "page"
 
-        try:
-            html = fetch_page(url)
-        except Exception as e:
-            logger.warning("Error al descargar %s: %s", url, e)
+        # sin tiempo solo se aprovechan las páginas adelantadas ya descargadas
+        if expired(deadline) and not (url in prefetched and prefetched[url].done()):
+            late.append(item)
             continue
 
-        content = clean_text(html)
-        page_dict: Dict[str, Any] = {
-            "type": ptype,
-            "url": url,
-            "content": content,
-        }
-        page_dict.update(extract_metadata(html, url, ptype))
-        page_dict["summary"] = (
-            (page_dict.get("description") or "")[:500]
-            or content[:600]
-        )
+        future = prefetched.pop(url, None)
+        if future is not None and not future.cancelled():
+            prefetch_used += 1
+            try:
+                page = future.result(timeout=None if future.done() else timeout_for(deadline))
+                page.type = ptype
+            except Exception as e:
+                logger.warning("Error al descargar %s: %s", url, e)
+                continue
+        else:
+            try:
+                html = fetch_page(url, deadline=deadline)
+            except Exception as e:
+                logger.warning("Error al descargar %s: %s", url, e)
+                continue
+
+            page = _build_page(html, url, ptype)
 
         logger.info(
-            "Compilada página %s (%s): %s chars",
+            "Compilada página %s (%s): %s bytes",
             url,
             ptype,
-            len(content),
+            page.raw_size,
         )
-        pages.append(page_dict)
+        pages.append(page)
+        uncounted.append(page)
+        compiled += 1
 
+    # una descarga adelantada que ya está en curso no se ha evitado
+    avoided = sum(
+        1 for item in skipped
+        if item["url"] not in prefetched or prefetched[item["url"]].cancel()
+    )
+    if skipped:
+        logger.info(
+            "Presupuesto de contenido cubierto (%d/%s tokens): %d enlaces sin compilar, %d descargas evitadas",
+            content_tokens, limit, len(skipped), avoided,
+        )
+    if late:
+        logger.warning("Run deadline reached: compiled %d pages, %d links left", compiled, len(late))
+    if prefetch_used or prefetched:
+        logger.info("Prefetch: %d pages used, %d discarded", prefetch_used, len(prefetched))
+    cancel_prefetch(prefetched)
+    if limit is not None and uncounted:
+        content_tokens += _content_tokens(uncounted)
+    # sin presupuesto nada se ha leído aún: todas al pool de una vez (en lotes)
+    parse_pages(pages)
+    if stats is not None:
+        stats.update(
+            selected=len(items),
+            compiled=compiled,
+            skipped=len(skipped),
+            avoided_fetches=avoided,
+            deadline_skipped=len(late),
+            prefetch_used=prefetch_used,
+            budget_tokens=limit,
+            content_tokens=content_tokens if limit is not None else None,
+        )
     return pages
 
 
-def summarize_content(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def release_pages(pages: List[Any]) -> None:
+    """
+    Suelta el texto de las páginas Page (las restauradas de un checkpoint son dicts).
+    """
+    for p in pages:
+        if isinstance(p, Page):
+            p.release()
+
+
+def summarize_content(pages: List[Any]) -> List[Any]:
     """
     Garantiza que cada página tenga un campo 'summary':
-    - prioriza la description
-    - si no hay, usa los primeros caracteres del content
+    - la description, si la hay
+    - más las frases clave del content (resumen extractivo, ver summarizer.py)
+    con una longitud máxima de SUMMARY_MAX_CHARS
     """
     for p in pages:
         if not p.get("summary"):
-            desc = p.get("description") or ""
-            content = p.get("content") or ""
-            p["summary"] = (desc[:500] or content[:600])
+            p["summary"] = page_summary(p.get("description"), p.get("content") or "")
     return pages
\ No newline at end of file
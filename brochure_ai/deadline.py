@@ -0,0 +1,78 @@
+"""
+Deadline global de un run.
+
+Un Deadline se crea al empezar el run (--deadline en la CLI y el batch,
+deadline= en run_pipeline y en el servicio) y se pasa explícitamente a
+fetch_page, compile_pages y llm.chat, que lo convierten en timeouts con el
+tiempo que queda. Al agotarse el trabajo pendiente se corta y el pipeline
+degrada en vez de fallar (ver pipeline.py): selección heurística de enlaces,
+folleto con las páginas compiladas hasta entonces, folleto sin LLM.
+"""
+import os
+import time
+from typing import Optional
+
+# Segundos por run por defecto (0 = sin límite)
+RUN_DEADLINE = float(os.getenv("RUN_DEADLINE", "0"))
+# Parte del deadline que selección y compilación dejan libre para generar
+RUN_DEADLINE_RESERVE = float(os.getenv("RUN_DEADLINE_RESERVE", "0.4"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Se agotó el tiempo del run."""
+
+
+class Deadline:
+    """
+    Instante límite (monotonic) con el total del que salió.
+    """
+    __slots__ = ("seconds", "expires_at")
+
+    def __init__(self, seconds: float, expires_at: Optional[float] = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if expires_at is None else expires_at
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, default: Optional[float] = None) -> float:
+        """
+        Timeout para una operación: lo que quede, sin pasar de default.
+        Lanza DeadlineExceeded si ya no queda nada.
+        """
+        left = self.remaining()
+        if left <= 0:
+            raise DeadlineExceeded(f"run deadline of {self.seconds:.0f}s exceeded")
+        return left if default is None else min(default, left)
+
+    def reserve(self, fraction: float) -> "Deadline":
+        """
+        Deadline anterior que deja libre fraction del total (p. ej. para
+        que tras compilar quede tiempo de generar).
+        """
+        return Deadline(self.seconds, self.expires_at - self.seconds * fraction)
+
+    def __repr__(self) -> str:
+        return f"Deadline({self.seconds}s, {self.remaining():.1f}s left)"
+
+
+def start(seconds: Optional[float] = None) -> Optional[Deadline]:
+    """
+    Deadline de seconds (por defecto RUN_DEADLINE); None si no hay límite.
+    """
+    seconds = RUN_DEADLINE if seconds is None else seconds
+    return Deadline(seconds) if seconds and seconds > 0 else None
+
+
+def timeout_for(deadline: Optional[Deadline], default: Optional[float] = None) -> Optional[float]:
+    """
+    deadline.timeout(default), o default si el run no tiene deadline.
+    """
+    return default if deadline is None else deadline.timeout(default)
+
+
+def expired(deadline: Optional[Deadline]) -> bool:
+    return deadline is not None and deadline.expired()
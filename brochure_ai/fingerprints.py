@@ -0,0 +1,85 @@
+"""
+Huellas de contenido por etapa para regenerar solo lo que ha cambiado.
+
+Se guardan junto al folleto en <output_dir>/<slug>_fingerprints.json:
+- links_hash: conjunto de enlaces de la landing (y la selección resultante)
+- pages: hash del texto limpio de cada página compilada
+- facts_hash: hash de los FACTS enviados al LLM
+- brochure_input: hash de todo lo que determina el folleto (páginas, FACTS,
+  tono, modo, modelo) y brochure_hash: hash del folleto generado
+- translations: brochure_hash con el que se tradujo cada idioma
+"""
+import os
+import json
+import hashlib
+import logging
+from collections.abc import Mapping
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_VERSION = 1
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def hash_json(data: Any) -> str:
+    return hash_text(json.dumps(data, ensure_ascii=False, sort_keys=True))
+
+
+def hash_links(links: List[str]) -> str:
+    """
+    El orden de los enlaces en el HTML no cambia la selección: se ordenan.
+    """
+    return hash_json(sorted(set(links)))
+
+
+def hash_pages(pages: List[Any]) -> Dict[str, str]:
+    """
+    url -> hash del texto limpio de cada página.
+    """
+    return {
+        str(p.get("url", "")): hash_text(f"{p.get('type', '')}\n{p.get('content', '')}")
+        for p in pages
+        if isinstance(p, Mapping)
+    }
+
+
+def fingerprint_path(output_dir: str, slug: str) -> str:
+    return os.path.join(output_dir, f"{slug}_fingerprints.json")
+
+
+def load_fingerprints(path: str) -> Dict[str, Any]:
+    """
+    Devuelve las huellas del run anterior o {} si no hay (o son de otra versión).
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning("Fingerprints ilegibles en %s: %s", path, e)
+        return {}
+    if data.get("version") != FINGERPRINT_VERSION:
+        return {}
+    return data
+
+
+def save_fingerprints(path: str, data: Dict[str, Any]) -> None:
+    data = dict(data, version=FINGERPRINT_VERSION)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def changed_pages(previous: Dict[str, str], current: Dict[str, str]) -> List[str]:
+    """
+    URLs nuevas o con contenido distinto (y las que han desaparecido).
+    """
+    urls = set(previous) | set(current)
+    return sorted(u for u in urls if previous.get(u) != current.get(u))
@@ -1,12 +1,14 @@
 import json
 import os
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from urllib.parse import urlparse, urljoin
 
 import re
 
-from .llm_ollama import chat_ollama
+from . import metrics
+from .deadline import Deadline
+from .llm import chat
 
 logger = logging.getLogger(__name__)
 MOCK_MODE = os.getenv("MOCK_MODE", "false").lower() == "true"
@@ -73,21 +75,27 @@ def _score_link(url: str) -> int:
     return 40
 
 
-def select_relevant_links_mock(base_url: str, links: List[str]) -> Dict[str, Any]:
+def _same_domain_links(base_url: str, links: List[str]) -> List[str]:
     """
-    Versión sin LLM para pruebas y modo offline.
-    Filtra enlaces por dominio y los ordena por score heurístico.
+    Enlaces normalizados, sin duplicados y del mismo dominio que base_url.
     """
-    logger.info("Link selector MOCK: %d links de entrada", len(links))
-
     normalized = [
         _normalize_url(l, base_url)
         for l in links
     ]
-    normalized = _dedupe_keep_order(
+    return _dedupe_keep_order(
         [l for l in normalized if _same_domain(l, base_url)]
     )
 
+
+def _heuristic_links(base_url: str, links: List[str]) -> List[Dict[str, Any]]:
+    """
+    Enlaces del mismo dominio con score heurístico >= 60, de mayor a menor.
+    """
+    return _score_candidates(_same_domain_links(base_url, links))
+
+
+def _score_candidates(normalized: List[str]) -> List[Dict[str, Any]]:
     scored: List[Dict[str, Any]] = []
     for url in normalized:
         score = _score_link(url)
@@ -101,13 +109,33 @@ def select_relevant_links_mock(base_url: str, links: List[str]) -> Dict[str, Any
                 }
             )
 
-    scored = sorted(scored, key=lambda x: x["score"], reverse=True)[:10]
+    return sorted(scored, key=lambda x: x["score"], reverse=True)
+
+
+def select_relevant_links_mock(base_url: str, links: List[str]) -> Dict[str, Any]:
+    """
+    Versión sin LLM para pruebas y modo offline.
+    Filtra enlaces por dominio y los ordena por score heurístico.
+    """
+    logger.info("Link selector MOCK: %d links de entrada", len(links))
+
+    candidates = _same_domain_links(base_url, links)
+    metrics.LINKS.observe(len(candidates), step="filtered")
+    scored = _score_candidates(candidates)[:10]
 
     logger.info("Link selector MOCK: %d links seleccionados", len(scored))
 
     return {"links": scored}
 
 
+def likely_links(base_url: str, links: List[str], limit: int = 10) -> List[str]:
+    """
+    URLs que probablemente elegirá el LLM según la heurística: sirven para
+    empezar a descargarlas mientras el LLM responde.
+    """
+    return [item["url"] for item in _heuristic_links(base_url, links)[:limit]]
+
+
 def _build_system_prompt(base_url: str) -> str:
     dominio = _base_host(base_url)
     return f"""
@@ -303,9 +331,12 @@ def _parse_llm_response(raw: str, base_url: str) -> Dict[str, Any]:
     return {"links": cleaned}
 
 
-def select_relevant_links_llm(base_url: str, links: List[str]) -> Dict[str, Any]:
+def select_relevant_links_llm(
+    base_url: str, links: List[str], deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
     """
-    Llama al LLM (Ollama) para clasificar enlaces y devolver los relevantes.
+    Llama al LLM (backend configurado, modelo de la ruta "links") para clasificar
+    enlaces y devolver los relevantes.
     """
     # limpiamos la lista de entrada
     normalized = _dedupe_keep_order(
@@ -314,6 +345,7 @@ def select_relevant_links_llm(base_url: str, links: List[str]) -> Dict[str, Any]
     normalized = [l for l in normalized if _same_domain(l, base_url)]
 
     logger.info("LLM link selector: %d links normalizados", len(normalized))
+    metrics.LINKS.observe(len(normalized), step="filtered")
 
     if not normalized:
         logger.warning("No hay enlaces del mismo dominio, devolviendo vacío")
@@ -337,19 +369,24 @@ def select_relevant_links_llm(base_url: str, links: List[str]) -> Dict[str, Any]
         content = m["content"]
         fewshot_block += f"\n\n[{role.upper()}]\n{content}"
 
-    raw = chat_ollama(full_system, fewshot_block.strip())
+    raw = chat(full_system, fewshot_block.strip(), call_type="links", deadline=deadline)
     return _parse_llm_response(raw, base_url)
 
 
-def select_relevant_links(base_url: str, links: List[str], mock: bool = False) -> Dict[str, Any]:
+def select_relevant_links(
+    base_url: str, links: List[str], mock: bool = False, deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
     """
     Punto de entrada usado por la CLI:
     - Devuelve SIEMPRE un dict con clave "links" -> lista de {type, url, score, rationale}.
     - Respeta MOCK_MODE global y el flag mock explícito.
     """
+    metrics.LINKS.observe(len(links), step="raw")
     if mock or MOCK_MODE:
         logger.info("Using MOCK mode for link selection")
-        return select_relevant_links_mock(base_url, links)
-
-    logger.info("Using LLM (Ollama) for link selection")
-    return select_relevant_links_llm(base_url, links)
\ No newline at end of file
+        selected = select_relevant_links_mock(base_url, links)
+    else:
+        logger.info("Using LLM (Ollama) for link selection")
+        selected = select_relevant_links_llm(base_url, links, deadline)
+    metrics.LINKS.observe(len(selected.get("links", [])), step="selected")
+    return selected
\ No newline at end of file
@@ -0,0 +1,475 @@
+"""
+Capa de backends LLM con enrutado por tipo de llamada y failover.
+
+- Backends: Ollama nativo, endpoint local compatible con OpenAI y mock determinista.
+- Cada tipo de llamada (links, brochure, translate...) puede usar su propio modelo.
+- Si el modelo principal supera su deadline o falla, se reintenta con un modelo
+  más rápido (LLM_FALLBACK_MODEL).
+"""
+import os
+import re
+import time
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from . import metrics
+from .deadline import Deadline, DeadlineExceeded, expired, timeout_for
+from .llm_ollama import (
+    OLLAMA_MODEL,
+    OLLAMA_RELEASE_ON_EXIT,
+    OLLAMA_TIMEOUT,
+    OLLAMA_URL,
+    _record_stats,
+    chat_ollama,
+    release_model,
+    start_warmup,
+)
+from .tokens import OLLAMA_MAX_CTX, context_options, count_tokens, ctx_bucket
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# ollama | openai | mock
+LLM_BACKEND = os.getenv("LLM_BACKEND", "ollama").lower()
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "http://localhost:8000/v1")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.2"))
+
+# Modelo más pequeño/rápido al que se cae si el principal es lento o falla
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+# Segundos durante los que, tras un failover, se va directo al modelo de reserva
+LLM_FAILOVER_COOLDOWN = float(os.getenv("LLM_FAILOVER_COOLDOWN", "300"))
+# Llamadas LLM simultáneas en todo el proceso (secciones, segmentos, idiomas...).
+# Conviene igualarlo a OLLAMA_NUM_PARALLEL.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+
+def _env_route(call_type: str, default_deadline: float, default_max_output: int) -> Dict[str, Any]:
+    prefix = f"LLM_{call_type.upper()}"
+    return {
+        "model": os.getenv(f"{prefix}_MODEL", "") or OLLAMA_MODEL,
+        "deadline": float(os.getenv(f"{prefix}_DEADLINE", str(default_deadline))),
+        "fallback": os.getenv(f"{prefix}_FALLBACK_MODEL", "") or LLM_FALLBACK_MODEL,
+        "max_output": int(os.getenv(f"{prefix}_MAX_OUTPUT", str(default_max_output))),
+        "num_ctx": int(os.getenv(f"{prefix}_NUM_CTX", "0")) or OLLAMA_MAX_CTX,
+    }
+
+
+# Enrutado por tipo de llamada: modelo, deadline (s) del modelo principal, fallback,
+# tokens de salida por defecto y contexto que necesita (LLM_<TIPO>_NUM_CTX). La selección de enlaces es corta y admite un
+# modelo pequeño; el folleto es la generación larga.
+ROUTES: Dict[str, Dict[str, Any]] = {
+    "links": _env_route("links", 45, 700),
+    "brochure": _env_route("brochure", OLLAMA_TIMEOUT, 1200),
+    "summary": _env_route("summary", 60, 200),
+    "translate": _env_route("translate", OLLAMA_TIMEOUT, 1600),
+    "chat": _env_route("chat", OLLAMA_TIMEOUT, 512),
+}
+
+
+class LLMTimeoutError(TimeoutError):
+    """El backend no respondió dentro del deadline."""
+
+
+class LLMBackend(ABC):
+    """
+    Interfaz mínima de un backend LLM.
+    """
+    name = "base"
+    # False: sus respuestas no se guardan en las cachés persistentes
+    cacheable = True
+
+    @abstractmethod
+    def chat(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: str,
+        call_type: str = "chat",
+        timeout: Optional[float] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Respuesta del modelo; LLMTimeoutError si no llega dentro de timeout."""
+
+    def warmup(self, models: List[str]) -> List[threading.Thread]:
+        """Precarga los modelos si el backend lo soporta."""
+        return []
+
+    def release(self, models: List[str]) -> None:
+        """Descarga los modelos si el backend lo soporta."""
+
+
+class OllamaBackend(LLMBackend):
+    """
+    Ollama nativo (/api/generate) a través de llm_ollama.chat_ollama.
+    """
+    name = "ollama"
+
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = base_url or OLLAMA_URL
+
+    def chat(self, system_prompt, user_prompt, model, call_type="chat", timeout=None, options=None):
+        try:
+            return chat_ollama(
+                system_prompt,
+                user_prompt,
+                model=model,
+                call_type=call_type,
+                timeout=timeout,
+                base_url=self.base_url,
+                options=options,
+            )
+        except requests.Timeout as e:
+            raise LLMTimeoutError(str(e)) from e
+
+    def warmup(self, models):
+        # mismo num_ctx que las llamadas: si no, la primera recarga el runner
+        return [
+            start_warmup(m, base_url=self.base_url, options={"num_ctx": model_num_ctx(m)})
+            for m in models
+        ]
+
+    def release(self, models):
+        for m in models:
+            release_model(m, base_url=self.base_url)
+
+
+class OpenAICompatBackend(LLMBackend):
+    """
+    Endpoint local compatible con OpenAI (/v1/chat/completions): vLLM,
+    llama.cpp server, LM Studio, el propio Ollama en /v1...
+    """
+    name = "openai"
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        self.base_url = (base_url or OPENAI_BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else OPENAI_API_KEY
+
+    def chat(self, system_prompt, user_prompt, model, call_type="chat", timeout=None, options=None):
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": OPENAI_TEMPERATURE,
+            "stream": False,
+        }
+        if options and options.get("num_predict"):
+            payload["max_tokens"] = options["num_predict"]
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+        logger.info("OpenAI-compat: calling %s/chat/completions with model=%s", self.base_url, model)
+        start = time.perf_counter()
+        try:
+            resp = requests.post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                headers=headers,
+                timeout=timeout or OLLAMA_TIMEOUT,
+            )
+            resp.raise_for_status()
+        except requests.Timeout as e:
+            raise LLMTimeoutError(str(e)) from e
+
+        data = resp.json()
+        usage = data.get("usage") or {}
+        _record_stats(
+            call_type,
+            model,
+            {
+                "prompt_eval_count": usage.get("prompt_tokens"),
+                "eval_count": usage.get("completion_tokens"),
+            },
+            time.perf_counter() - start,
+        )
+        choices = data.get("choices") or [{}]
+        return ((choices[0].get("message") or {}).get("content") or "").strip()
+
+
+class MockBackend(LLMBackend):
+    """
+    Backend determinista sin red: misma entrada -> misma salida.
+    - responses: respuestas fijas por tipo de llamada (o por modelo)
+    - latency: segundos simulados por modelo, para probar deadlines y failover
+    """
+    name = "mock"
+    cacheable = False
+
+    def __init__(
+        self,
+        responses: Optional[Dict[str, str]] = None,
+        latency: Optional[Dict[str, float]] = None,
+    ):
+        self.responses = responses or {}
+        self.latency = latency or {}
+        self.calls: List[Dict[str, Any]] = []
+
+    def chat(self, system_prompt, user_prompt, model, call_type="chat", timeout=None, options=None):
+        self.calls.append({"model": model, "call_type": call_type, "options": options})
+        delay = self.latency.get(model, 0.0)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise LLMTimeoutError(f"mock model {model} exceeded {timeout}s")
+        if delay:
+            time.sleep(delay)
+
+        if model in self.responses:
+            return self.responses[model]
+        if call_type in self.responses:
+            return self.responses[call_type]
+        return self._default_response(user_prompt, call_type)
+
+    @staticmethod
+    def _default_response(user_prompt: str, call_type: str) -> str:
+        if call_type == "links":
+            # Devuelve los enlaces del último bloque "Enlaces encontrados"
+            block = user_prompt.rsplit("Enlaces encontrados:", 1)[-1]
+            urls = re.findall(r"https?://\S+", block)
+            return json.dumps({
+                "links": [
+                    {"type": "page", "url": u, "score": 50, "rationale": "mock"}
+                    for u in urls[:10]
+                ]
+            })
+        if call_type == "summary":
+            # Resumen de página: la primera frase de su contenido
+            body = user_prompt.split("\n\n", 2)[1] if user_prompt.count("\n\n") >= 2 else ""
+            return "- " + (body.strip().split(". ")[0][:200] or "Sin contenido")
+        if call_type == "translate":
+            # Traducción identidad: el bloque markdown (documento completo)
+            # o el fragmento que cierra el prompt (segmentos)
+            if "```markdown" in user_prompt:
+                return user_prompt.rsplit("```markdown", 1)[-1].strip().strip("`").strip()
+            return user_prompt.rsplit("\n\n", 1)[-1].strip()
+        return "# Folleto\n\n## Resumen Ejecutivo\n\nRespuesta generada por el backend mock."
+
+
+_BACKEND: Optional[LLMBackend] = None
+_BACKEND_LOCK = threading.Lock()
+_LLM_SLOTS = threading.BoundedSemaphore(max(1, LLM_MAX_CONCURRENCY))
+# call_type -> instante (monotonic) hasta el que se usa directamente el fallback
+_FAILOVER_UNTIL: Dict[str, float] = {}
+_FAILOVER_LOCK = threading.Lock()
+
+
+def _backend_from_env() -> LLMBackend:
+    if LLM_BACKEND == "openai":
+        return OpenAICompatBackend()
+    if LLM_BACKEND == "mock":
+        return MockBackend()
+    return OllamaBackend()
+
+
+def get_backend() -> LLMBackend:
+    global _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None:
+            _BACKEND = _backend_from_env()
+        return _BACKEND
+
+
+def set_backend(backend: Optional[LLMBackend]) -> None:
+    """
+    Sustituye el backend activo (tests, benchmarks). None vuelve al de entorno.
+    """
+    global _BACKEND
+    with _BACKEND_LOCK:
+        _BACKEND = backend
+    with _FAILOVER_LOCK:
+        _FAILOVER_UNTIL.clear()
+
+
+def get_route(call_type: str) -> Dict[str, Any]:
+    return ROUTES.get(call_type) or ROUTES["chat"]
+
+
+def _routed_models(with_fallback: bool = False) -> List[str]:
+    models: List[str] = []
+    for route in ROUTES.values():
+        for model in (route["model"], route["fallback"] if with_fallback else ""):
+            if model and model not in models:
+                models.append(model)
+    return models
+
+
+def warmup_models() -> List[threading.Thread]:
+    """
+    Precarga en segundo plano todos los modelos principales enrutados.
+    """
+    return get_backend().warmup(_routed_models())
+
+
+def release_models() -> None:
+    """
+    Descarga todos los modelos enrutados, también los de reserva que haya
+    cargado un failover. No hace nada si el backend no es Ollama.
+    """
+    get_backend().release(_routed_models(with_fallback=True))
+
+
+@contextmanager
+def keep_models_loaded(enabled: bool = True, release_on_exit: Optional[bool] = None):
+    """
+    Mantiene cargados los modelos enrutados durante un run, un batch o el servicio:
+    - al entrar, los precarga en segundo plano (warmup_models)
+    - al salir, los descarga si release_on_exit (u OLLAMA_RELEASE_ON_EXIT)
+    Con enabled=False (modo mock) no hace nada.
+    """
+    if not enabled:
+        yield []
+        return
+    if release_on_exit is None:
+        release_on_exit = OLLAMA_RELEASE_ON_EXIT
+    threads = warmup_models()
+    try:
+        yield threads
+    finally:
+        if release_on_exit:
+            for thread in threads:
+                thread.join(timeout=1)
+            release_models()
+
+
+def model_num_ctx(model: str) -> int:
+    """
+    num_ctx único del modelo para todo el run: el mayor de las rutas que lo
+    usan (como principal o como fallback). Ollama recarga el runner si cambia.
+    """
+    sizes = [r["num_ctx"] for r in ROUTES.values() if model in (r["model"], r["fallback"])]
+    return ctx_bucket(max(sizes, default=OLLAMA_MAX_CTX))
+
+
+def _options_for(system_prompt: str, user_prompt: str, model: str, max_output: int) -> Dict[str, Any]:
+    prompt_tokens = count_tokens(system_prompt, model) + count_tokens(user_prompt, model)
+    return context_options(prompt_tokens, max_output, model_num_ctx(model))
+
+
+def _failover_active(call_type: str) -> bool:
+    with _FAILOVER_LOCK:
+        return _FAILOVER_UNTIL.get(call_type, 0) > time.monotonic()
+
+
+def _start_failover(call_type: str) -> None:
+    with _FAILOVER_LOCK:
+        _FAILOVER_UNTIL[call_type] = time.monotonic() + LLM_FAILOVER_COOLDOWN
+
+
+def _call_timeout(deadline: Optional[Deadline]) -> Optional[float]:
+    # sin deadline del run el backend aplica su timeout (OLLAMA_TIMEOUT)
+    return None if deadline is None else deadline.timeout(OLLAMA_TIMEOUT)
+
+
+def chat(
+    system_prompt: str,
+    user_prompt: str,
+    call_type: str = "chat",
+    max_output_tokens: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+    served: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Punto de entrada único para las llamadas LLM del pipeline.
+    - Elige modelo y deadline según call_type (ROUTES).
+    - Pide el num_ctx más pequeño que cabe y limita num_predict.
+    - Si el modelo principal no responde a tiempo o falla, usa el fallback.
+    - Nunca hay más de LLM_MAX_CONCURRENCY llamadas en vuelo a la vez.
+    - Con deadline (del run) ni la espera por un hueco ni la llamada pasan
+      del tiempo que queda; al agotarse lanza DeadlineExceeded.
+    - served (opcional) se rellena con quién respondió: backend, modelo
+      (el de reserva si hubo failover) y si la respuesta es cacheable.
+    """
+    try:
+        if not _LLM_SLOTS.acquire(timeout=timeout_for(deadline)):
+            raise DeadlineExceeded(f"LLM {call_type}: no slot before the run deadline")
+    except DeadlineExceeded:
+        metrics.LLM_ERRORS.inc(call_type=call_type)
+        raise
+    start = time.perf_counter()
+    try:
+        with span(f"llm:{call_type}", cat="llm"):
+            backend = get_backend()
+            text, model = _chat_routed(
+                backend, system_prompt, user_prompt, call_type, max_output_tokens, deadline
+            )
+        if served is not None:
+            served.update(backend=backend.name, model=model, cacheable=backend.cacheable)
+        return text
+    except Exception as e:
+        metrics.LLM_ERRORS.inc(call_type=call_type)
+        if isinstance(e, (LLMTimeoutError, requests.RequestException)) and expired(deadline):
+            raise DeadlineExceeded(f"LLM {call_type}: run deadline exceeded ({e})") from e
+        raise
+    finally:
+        _LLM_SLOTS.release()
+        metrics.LLM_SECONDS.observe(time.perf_counter() - start, call_type=call_type)
+
+
+def _chat_routed(
+    backend: LLMBackend,
+    system_prompt: str,
+    user_prompt: str,
+    call_type: str,
+    max_output_tokens: Optional[int],
+    deadline: Optional[Deadline] = None,
+) -> Tuple[str, str]:
+    # devuelve (texto, modelo que respondió)
+    route = get_route(call_type)
+    model = route["model"]
+    fallback = route["fallback"]
+    max_output = max_output_tokens or route["max_output"]
+
+    if fallback and fallback != model and _failover_active(call_type):
+        logger.info("LLM %s: failover activo, usando %s", call_type, fallback)
+        return backend.chat(
+            system_prompt,
+            user_prompt,
+            model=fallback,
+            call_type=call_type,
+            timeout=_call_timeout(deadline),
+            options=_options_for(system_prompt, user_prompt, fallback, max_output),
+        ), fallback
+
+    options = _options_for(system_prompt, user_prompt, model, max_output)
+    if not fallback or fallback == model:
+        return backend.chat(
+            system_prompt, user_prompt, model=model, call_type=call_type,
+            timeout=_call_timeout(deadline), options=options,
+        ), model
+
+    try:
+        return backend.chat(
+            system_prompt,
+            user_prompt,
+            model=model,
+            call_type=call_type,
+            timeout=timeout_for(deadline, route["deadline"]),
+            options=options,
+        ), model
+    except (LLMTimeoutError, requests.RequestException) as e:
+        if expired(deadline):
+            raise
+        logger.warning(
+            "LLM %s: %s falló o superó %.0fs (%s). Failover a %s",
+            call_type,
+            model,
+            route["deadline"],
+            e,
+            fallback,
+        )
+        _start_failover(call_type)
+        metrics.LLM_FAILOVERS.inc(call_type=call_type)
+        return backend.chat(
+            system_prompt,
+            user_prompt,
+            model=fallback,
+            call_type=call_type,
+            timeout=_call_timeout(deadline),
+            options=_options_for(system_prompt, user_prompt, fallback, max_output),
+        ), fallback
@@ -1,7 +1,13 @@
 import os
+import time
 import logging
+import threading
+from typing import Any, Dict, List, Optional
+
 import requests
 
+from . import metrics
+
 logger = logging.getLogger(__name__)
 
 # Config básica
@@ -9,14 +15,119 @@ OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
 # Ajusta al modelo que tengas: mira el resultado de /api/tags
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:latest")
 OLLAMA_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", "120"))
+# Tiempo que Ollama mantiene el modelo en memoria tras cada llamada
+# (formato Ollama: "10m", "1h", "-1" = indefinido, "0" = descargar ya)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "10m")
+# Descarga el modelo al terminar el run/batch (libera VRAM en máquinas compartidas)
+OLLAMA_RELEASE_ON_EXIT = os.getenv("OLLAMA_RELEASE_ON_EXIT", "false").lower() == "true"
+
+# Ollama reporta las duraciones en nanosegundos
+_NS = 1_000_000_000
+
+# Llamadas de mantenimiento (precarga del modelo): se registran aparte y no
+# cuentan en las cifras por llamada de llm_stats_summary
+_BACKGROUND_CALLS = ("warmup",)
+
+_STATS_LOCK = threading.Lock()
+_LLM_STATS: List[Dict[str, Any]] = []
+
+
+def _record_stats(call_type: str, model: str, data: Dict[str, Any], wall_s: float) -> Dict[str, Any]:
+    """
+    Guarda las métricas de carga/evaluación que devuelve Ollama para una llamada.
+    """
+    entry = {
+        "call_type": call_type,
+        "model": model,
+        "wall_s": round(wall_s, 3),
+        "load_s": (data.get("load_duration") or 0) / _NS,
+        "prompt_eval_s": (data.get("prompt_eval_duration") or 0) / _NS,
+        "eval_s": (data.get("eval_duration") or 0) / _NS,
+        "total_s": (data.get("total_duration") or 0) / _NS,
+        "prompt_tokens": data.get("prompt_eval_count") or 0,
+        "completion_tokens": data.get("eval_count") or 0,
+    }
+    with _STATS_LOCK:
+        _LLM_STATS.append(entry)
+    metrics.LLM_PROMPT_TOKENS.inc(entry["prompt_tokens"], call_type=call_type, model=model)
+    metrics.LLM_COMPLETION_TOKENS.inc(entry["completion_tokens"], call_type=call_type, model=model)
+    gen_s = entry["eval_s"] or wall_s
+    if entry["completion_tokens"] and gen_s > 0:
+        metrics.LLM_TOKENS_PER_SECOND.observe(entry["completion_tokens"] / gen_s, call_type=call_type)
+    logger.info(
+        "Ollama %s (%s): load=%.2fs prompt_eval=%.2fs eval=%.2fs wall=%.2fs",
+        call_type,
+        model,
+        entry["load_s"],
+        entry["prompt_eval_s"],
+        entry["eval_s"],
+        wall_s,
+    )
+    return entry
 
 
-def chat_ollama(system_prompt: str, user_prompt: str) -> str:
+def get_llm_stats() -> List[Dict[str, Any]]:
+    """
+    Devuelve una copia de las métricas registradas en este proceso.
+    """
+    with _STATS_LOCK:
+        return [dict(e) for e in _LLM_STATS]
+
+
+def reset_llm_stats() -> None:
+    with _STATS_LOCK:
+        _LLM_STATS.clear()
+
+
+def llm_stats_summary() -> Dict[str, Any]:
+    """
+    Agrega las métricas por run:
+    - tiempo total de carga del modelo (cold start)
+    - tiempo de evaluación del prompt y de generación
+    - fracción del tiempo LLM que fue carga del modelo
+    Solo cuenta las llamadas del pipeline: el warm-up va aparte en "warmup".
+    """
+    all_stats = get_llm_stats()
+    stats = [e for e in all_stats if e["call_type"] not in _BACKGROUND_CALLS]
+    background = [e for e in all_stats if e["call_type"] in _BACKGROUND_CALLS]
+    load_s = sum(e["load_s"] for e in stats)
+    prompt_eval_s = sum(e["prompt_eval_s"] for e in stats)
+    eval_s = sum(e["eval_s"] for e in stats)
+    wall_s = sum(e["wall_s"] for e in stats)
+    return {
+        "calls": len(stats),
+        "load_s": round(load_s, 3),
+        "prompt_eval_s": round(prompt_eval_s, 3),
+        "eval_s": round(eval_s, 3),
+        "wall_s": round(wall_s, 3),
+        "cold_start_ratio": round(load_s / wall_s, 3) if wall_s else 0.0,
+        "warmup": {
+            "calls": len(background),
+            "load_s": round(sum(e["load_s"] for e in background), 3),
+            "wall_s": round(sum(e["wall_s"] for e in background), 3),
+        },
+    }
+
+
+def chat_ollama(
+    system_prompt: str,
+    user_prompt: str,
+    model: Optional[str] = None,
+    call_type: str = "chat",
+    keep_alive: Optional[str] = None,
+    timeout: Optional[float] = None,
+    base_url: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> str:
     """
     Wrapper mínimo para Ollama usando /api/generate.
     - No usamos /api/chat.
-    - No pasamos opciones raras.
+    - options solo lleva num_ctx / num_predict dimensionados por llamada.
+    - Envía keep_alive para que el modelo siga cargado entre pasos del pipeline.
+    - timeout permite al router aplicar un deadline más corto que OLLAMA_TIMEOUT.
     """
+    model = model or OLLAMA_MODEL
+    base_url = base_url or OLLAMA_URL
 
     # Prompt estilo instruct sencillo
     prompt = (
@@ -25,17 +136,21 @@ def chat_ollama(system_prompt: str, user_prompt: str) -> str:
     )
 
     payload = {
-        "model": OLLAMA_MODEL,
+        "model": model,
         "prompt": prompt,
         "stream": False,
+        "keep_alive": keep_alive or OLLAMA_KEEP_ALIVE,
     }
+    if options:
+        payload["options"] = options
 
-    logger.info("Ollama: calling /api/generate with model=%s", OLLAMA_MODEL)
+    logger.info("Ollama: calling /api/generate with model=%s", model)
+    start = time.perf_counter()
     try:
         resp = requests.post(
-            f"{OLLAMA_URL}/api/generate",
+            f"{base_url}/api/generate",
             json=payload,
-            timeout=OLLAMA_TIMEOUT,
+            timeout=timeout or OLLAMA_TIMEOUT,
         )
         if resp.status_code >= 400:
             logger.error("Ollama error %s: %s", resp.status_code, resp.text)
@@ -45,5 +160,71 @@ def chat_ollama(system_prompt: str, user_prompt: str) -> str:
         raise
 
     data = resp.json()
+    _record_stats(call_type, model, data, time.perf_counter() - start)
     # En Ollama, el texto va en 'response'
-    return (data.get("response") or "").strip()
\ No newline at end of file
+    return (data.get("response") or "").strip()
+
+
+def warmup_model(
+    model: Optional[str] = None,
+    keep_alive: Optional[str] = None,
+    base_url: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Precarga el modelo en Ollama con una petición vacía a /api/generate.
+    Ollama carga el modelo y responde sin generar tokens.
+    options (num_ctx) debe coincidir con el de las llamadas reales: con otro
+    num_ctx Ollama vuelve a cargar el runner en la primera llamada.
+    Nunca lanza: si falla, la primera llamada real pagará la carga.
+    """
+    model = model or OLLAMA_MODEL
+    base_url = base_url or OLLAMA_URL
+    payload = {"model": model, "keep_alive": keep_alive or OLLAMA_KEEP_ALIVE}
+    if options:
+        payload["options"] = options
+    start = time.perf_counter()
+    try:
+        resp = requests.post(f"{base_url}/api/generate", json=payload, timeout=OLLAMA_TIMEOUT)
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception as e:
+        logger.warning("Ollama warm-up of %s failed: %s", model, e)
+        return None
+    return _record_stats("warmup", model, data, time.perf_counter() - start)
+
+
+def start_warmup(
+    model: Optional[str] = None,
+    keep_alive: Optional[str] = None,
+    base_url: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> threading.Thread:
+    """
+    Lanza warmup_model en segundo plano (p. ej. mientras se hace el scraping).
+    """
+    thread = threading.Thread(
+        target=warmup_model,
+        args=(model, keep_alive, base_url, options),
+        name="ollama-warmup",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def release_model(model: Optional[str] = None, base_url: Optional[str] = None) -> None:
+    """
+    Pide a Ollama que descargue el modelo (keep_alive=0).
+    """
+    model = model or OLLAMA_MODEL
+    base_url = base_url or OLLAMA_URL
+    try:
+        requests.post(
+            f"{base_url}/api/generate",
+            json={"model": model, "keep_alive": 0},
+            timeout=OLLAMA_TIMEOUT,
+        ).raise_for_status()
+        logger.info("Ollama: model %s released", model)
+    except Exception as e:
+        logger.warning("Ollama: could not release model %s: %s", model, e)
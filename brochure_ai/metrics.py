@@ -0,0 +1,202 @@
+"""
+Métricas de proceso (contadores e histogramas con etiquetas) en formato Prometheus.
+
+- El servicio las expone en GET /metrics.
+- La CLI y el batch las vuelcan con --metrics-file al terminar, en el formato
+  del textfile collector de node_exporter (escritura atómica).
+
+Sin dependencias: un registro en memoria por proceso; los procesos del pool
+de parseo devuelven sus tiempos y se registran aquí. Las métricas se definen
+abajo y los módulos solo llaman a inc()/observe().
+"""
+import os
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Segundos (descargas, parseo, llamadas LLM, etapas)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Tamaños y recuentos (enlaces por página, tokens/s)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_LabelKey = Tuple[str, ...]
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> _LabelKey:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name}: expected labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[k]) for k in self.labels)
+
+    def _fmt(self, key: _LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labels, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """
+    Valor que solo crece (peticiones, bytes, tokens, errores).
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        if amount < 0:
+            raise ValueError(f"{self.name}: counters only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: object) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return super().render() + [f"{self.name}{self._fmt(k)} {_num(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """
+    Distribución en buckets acumulados más suma y recuento.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # por etiquetas: [recuento por bucket..., +Inf], suma
+        self._values: Dict[_LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            total[0] += value
+
+    def count(self, **labels: object) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return sum(entry[0]) if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._values.items())
+        lines = super().render()
+        for key, (counts, total) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                running += n
+                le = "+Inf" if bound == math.inf else _num(bound)
+                lines.append(f"{self.name}_bucket{self._fmt(key, ('le', le))} {running}")
+            lines.append(f"{self.name}_sum{self._fmt(key)} {_num(total)}")
+            lines.append(f"{self.name}_count{self._fmt(key)} {running}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+_REGISTRY: Dict[str, _Metric] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _register(metric: _Metric) -> _Metric:
+    with _REGISTRY_LOCK:
+        if metric.name in _REGISTRY:
+            raise ValueError(f"metric {metric.name} already registered")
+        _REGISTRY[metric.name] = metric
+    return metric
+
+
+def counter(name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+    return _register(Counter(name, help, labels))
+
+
+def histogram(name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help, labels, buckets))
+
+
+def render() -> str:
+    """
+    Todas las métricas con datos en formato de texto de Prometheus (0.0.4).
+    """
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY.values())
+    lines: List[str] = []
+    for metric in metrics:
+        body = metric.render()
+        if len(body) > 2:  # sin observaciones no se exporta
+            lines.extend(body)
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def write_textfile(path: str) -> str:
+    """
+    Vuelca render() en path de forma atómica (node_exporter no lee a medias).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp, path)
+    return path
+
+
+def reset() -> None:
+    """
+    Borra los valores registrados (tests, runs sucesivos en un proceso).
+    """
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY.values())
+    for metric in metrics:
+        with metric._lock:
+            metric._values.clear()
+
+
+# Métricas del pipeline
+FETCH_SECONDS = histogram("brochure_fetch_seconds", "Duración de las descargas HTTP", ["host"])
+FETCH_BYTES = counter("brochure_fetch_bytes_total", "Bytes de HTML descargados", ["host"])
+FETCH_ERRORS = counter("brochure_fetch_errors_total", "Descargas fallidas (red o HTTP >= 400)", ["host"])
+PARSE_SECONDS = histogram("brochure_parse_seconds", "Parseo HTML por página", ["where"])
+LINKS = histogram("brochure_links", "Enlaces por landing en cada paso del filtrado", ["step"], COUNT_BUCKETS)
+LLM_SECONDS = histogram("brochure_llm_seconds", "Duración de las llamadas LLM", ["call_type"])
+LLM_PROMPT_TOKENS = counter("brochure_llm_prompt_tokens_total", "Tokens de prompt", ["call_type", "model"])
+LLM_COMPLETION_TOKENS = counter("brochure_llm_completion_tokens_total", "Tokens generados", ["call_type", "model"])
+LLM_TOKENS_PER_SECOND = histogram(
+    "brochure_llm_tokens_per_second", "Velocidad de generación por llamada", ["call_type"], COUNT_BUCKETS
+)
+LLM_ERRORS = counter("brochure_llm_errors_total", "Llamadas LLM fallidas o fuera de tiempo", ["call_type"])
+LLM_FAILOVERS = counter("brochure_llm_failovers_total", "Reintentos con el modelo de reserva", ["call_type"])
+CACHE_REQUESTS = counter("brochure_cache_requests_total", "Consultas a las cachés", ["cache", "result"])
+STAGE_SECONDS = histogram("brochure_stage_seconds", "Duración de cada etapa del pipeline", ["stage"])
+STAGE_ERRORS = counter("brochure_stage_errors_total", "Etapas fallidas", ["stage"])
+DEGRADED = counter("brochure_degraded_total", "Pasos degradados por el deadline del run", ["step"])
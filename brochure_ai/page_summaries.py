@@ -0,0 +1,101 @@
+"""
+Paso "map" del modo map-reduce: un resumen corto por página generado por el LLM.
+
+- Cada página se resume en paralelo con una llamada de salida acotada
+  (ruta "summary", LLM_SUMMARY_MAX_OUTPUT).
+- Los resúmenes se guardan en la caché page_summaries con clave
+  (hash del contenido de la página, backend, modelo, versión del prompt): un
+  run posterior solo vuelve a resumir las páginas que han cambiado. La clave
+  lleva el modelo que respondió (el de reserva tras un failover) y las
+  respuestas del backend mock no se guardan.
+"""
+import os
+import logging
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import get_cache
+from .deadline import Deadline
+from .fingerprints import hash_text
+from .llm import chat, get_backend, get_route
+from .tokens import truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Subir al cambiar el prompt invalida los resúmenes cacheados
+SUMMARY_PROMPT_VERSION = 1
+PAGE_SUMMARY_WORKERS = int(os.getenv("PAGE_SUMMARY_WORKERS", "4"))
+# Tokens máximos de contenido de cada página en su prompt de resumen
+PAGE_SUMMARY_INPUT_TOKENS = int(os.getenv("PAGE_SUMMARY_INPUT_TOKENS", "2000"))
+
+
+def _summary_key(page: Dict[str, Any], backend: str, model: str) -> str:
+    digest = hash_text(f"{page.get('type', '')}\n{page.get('content', '')}")
+    return f"{backend}|{model}|v{SUMMARY_PROMPT_VERSION}|{digest}"
+
+
+def _summarize_page(
+    page: Dict[str, Any], model: str, deadline: Optional[Deadline] = None
+) -> Tuple[str, Dict[str, Any]]:
+    system_prompt = (
+        "Eres un analista que resume páginas web corporativas. "
+        "Usa SOLO la información de la página; no inventes datos."
+    )
+    content = truncate_to_tokens(page.get("content") or "", PAGE_SUMMARY_INPUT_TOKENS, model)
+    user_prompt = (
+        f"Página ({page.get('type') or 'page'}): {page.get('url', '')}\n"
+        f"Título: {page.get('title') or ''}\n\n"
+        f"{content}\n\n"
+        "Resume en 3–6 bullets breves los hechos útiles para un folleto corporativo: "
+        "misión, servicios o productos, clientes y sectores, cifras, casos, "
+        "comunidad y formas de contacto. Ignora menús, cookies y avisos legales."
+    )
+    served: Dict[str, Any] = {}
+    out = chat(system_prompt, user_prompt, call_type="summary", deadline=deadline, served=served)
+    return (out or "").strip(), served
+
+
+def summarize_pages(pages: List[Any], deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+    """
+    Devuelve [{type, url, summary}] en el orden de pages.
+    Si el LLM falla en una página (o se agota el deadline) se usa su resumen extractivo.
+    """
+    docs = [p for p in pages if isinstance(p, Mapping)]
+    model = get_route("summary")["model"]
+    backend = get_backend().name
+    cache = get_cache("page_summaries")
+
+    keys = [_summary_key(p, backend, model) for p in docs]
+    known = cache.get_many(keys)
+    pending = {k: p for k, p in zip(keys, docs) if k not in known and (p.get("content") or "").strip()}
+    logger.info("Page summaries: %d páginas, %d en caché, %d al LLM",
+                len(docs), len(docs) - len(pending), len(pending))
+
+    if pending:
+        workers = max(1, min(PAGE_SUMMARY_WORKERS, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summary") as pool:
+            futures = {k: pool.submit(_summarize_page, p, model, deadline) for k, p in pending.items()}
+            fresh = {}
+            to_store = {}
+            for k, fut in futures.items():
+                try:
+                    out, served = fut.result()
+                except Exception as e:
+                    logger.warning("Resumen LLM fallido para %s: %s", pending[k].get("url"), e)
+                    continue
+                if out:
+                    fresh[k] = out
+                    if served.get("cacheable"):
+                        to_store[_summary_key(pending[k], served["backend"], served["model"])] = out
+        cache.set_many(to_store.items())
+        known.update(fresh)
+
+    return [
+        {
+            "type": p.get("type") or "page",
+            "url": p.get("url", ""),
+            "summary": known.get(k) or p.get("summary") or "",
+        }
+        for k, p in zip(keys, docs)
+    ]
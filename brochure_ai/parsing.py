@@ -0,0 +1,120 @@
+"""
+Parseo HTML en un pool de procesos para el modo batch.
+
+BeautifulSoup es CPU puro y retiene el GIL: con hilos, el parseo de muchas
+empresas a la vez no pasa de un núcleo. Con el pool activo (start() o
+process_pool()), compile_pages envía el HTML en bytes de sus páginas a
+los procesos del pool, en lotes de PARSE_CHUNKSIZE páginas por mensaje, y
+recibe solo lo que se usa después (texto limpio y metadatos). Las páginas
+de menos de PARSE_INLINE_BYTES se parsean en el propio proceso: ahí el IPC
+cuesta más que el parseo. Sin pool (CLI, servicio) todo sigue en proceso.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import metrics
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Páginas por mensaje al pool
+PARSE_CHUNKSIZE = int(os.getenv("PARSE_CHUNKSIZE", "4"))
+# Por debajo de este tamaño de HTML se parsea en proceso
+PARSE_INLINE_BYTES = int(os.getenv("PARSE_INLINE_BYTES", "32768"))
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_LOCK = threading.Lock()
+
+
+def parse_html(raw: bytes, encoding: str, url: str, ptype: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    (texto limpio, metadatos) de una página. Corre en los procesos del pool.
+    """
+    from .compiler import extract_metadata
+    from .scraping import clean_text
+
+    html = raw.decode(encoding, errors="replace")
+    return clean_text(html), extract_metadata(html, url, ptype)
+
+
+def _parse_item(item: Tuple[bytes, str, str, str]) -> Tuple[str, Dict[str, Any], float]:
+    # el tiempo se mide en el proceso hijo y se registra en el padre
+    start = time.perf_counter()
+    content, meta = parse_html(*item)
+    return content, meta, time.perf_counter() - start
+
+
+def start(workers: int) -> int:
+    """
+    Arranca el pool (los procesos se crean con la primera página grande).
+    Devuelve el número de procesos; 0 deja el parseo en proceso.
+    """
+    global _POOL
+    if workers <= 0:
+        return 0
+    import multiprocessing
+
+    with _LOCK:
+        if _POOL is None:
+            # spawn: hacer fork de un proceso con hilos (batch) puede bloquearse
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return workers
+
+
+def shutdown() -> None:
+    global _POOL
+    with _LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def is_active() -> bool:
+    return _POOL is not None
+
+
+@contextmanager
+def process_pool(workers: int) -> Iterator[int]:
+    """
+    Pool de parseo activo durante el bloque (p. ej. un batch completo).
+    """
+    started = start(workers)
+    try:
+        yield started
+    finally:
+        if started:
+            shutdown()
+
+
+def parse_pages(pages: List[Any]) -> int:
+    """
+    Parsea en el pool las páginas (compiler.Page) aún sin parsear y de al
+    menos PARSE_INLINE_BYTES. Las demás se parsean en proceso al leerlas.
+    Devuelve cuántas se parsearon en el pool. Si el pool falla no pasa nada:
+    esas páginas también se parsean en proceso.
+    """
+    pool = _POOL
+    if pool is None:
+        return 0
+    big = [
+        p for p in pages
+        if hasattr(p, "raw_size") and not p.parsed and p.raw_size >= PARSE_INLINE_BYTES
+    ]
+    if not big:
+        return 0
+    items = [(*p.raw_html(), p.url, p.type) for p in big]
+    with span("parse:pool", cat="cpu", pages=len(big), bytes=sum(len(i[0]) for i in items)):
+        try:
+            results = list(pool.map(_parse_item, items, chunksize=max(1, PARSE_CHUNKSIZE)))
+        except Exception as e:
+            logger.warning("Parse pool failed (%s); parsing in process", e)
+            return 0
+    for page, (content, meta, seconds) in zip(big, results):
+        page.set_parsed(content, meta)
+        metrics.PARSE_SECONDS.observe(seconds, where="pool")
+    return len(big)
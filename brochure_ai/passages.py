@@ -0,0 +1,240 @@
+"""
+Selección de pasajes relevantes para el prompt del folleto.
+
+En lugar de concatenar páginas en orden hasta agotar el límite, se trocea el
+contenido en pasajes, se puntúan con BM25 contra los temas de cada sección del
+folleto (ponderando por tipo de página) y se empaquetan de forma voraz los de más
+valor que no sean redundantes hasta llenar el presupuesto de tokens.
+"""
+import heapq
+import math
+import re
+import logging
+import unicodedata
+from collections import Counter
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional
+
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Temas de cada sección del folleto (ES + EN, sin tildes)
+SECTION_TOPICS: Dict[str, str] = {
+    "resumen": "mision vision proposito empresa compania fundada historia valores quienes somos "
+               "mission vision purpose company about founded history values who we are",
+    "servicios": "servicios productos soluciones programas plataforma recursos capacidades consultoria "
+                 "services products solutions programs platform resources features consulting",
+    "comunidad": "comunidad ecosistema eventos sectores clientes socios partners voluntarios miembros "
+                 "community ecosystem events industries customers partners members open source",
+    "evidencias": "casos exito clientes testimonios premios cifras proyectos publicaciones noticias "
+                  "case studies success stories customers testimonials awards projects press news",
+    "siguientes": "contacto unete empleo carreras descarga participa contribuye demo "
+                  "contact join careers jobs download participate contribute get started",
+}
+
+# Peso por tipo de página (el tipo lo asigna el selector de enlaces)
+PAGE_TYPE_WEIGHTS: Dict[str, float] = {
+    "about": 1.3,
+    "home": 1.0,
+    "customers": 1.2,
+    "community": 1.15,
+    "partners": 1.1,
+    "careers": 0.9,
+    "press": 0.9,
+    "blog": 0.8,
+}
+
+_STOPWORDS = set(
+    "que los las del por con una para como mas sus les este esta son the and for with "
+    "our your you are from that this have has can will all not but".split()
+)
+
+# Parámetros BM25 estándar
+_K1 = 1.5
+_B = 0.75
+# Similitud de Jaccard a partir de la cual un pasaje se considera redundante
+REDUNDANCY_THRESHOLD = 0.6
+# Penalización de una sección ya cubierta (rendimientos decrecientes)
+COVERAGE_DECAY = 0.7
+# Valor base del resumen de la página (description + frases clave extraídas):
+# es fiable aunque no case con los temas
+SUMMARY_PRIOR = 0.15
+
+
+def _terms(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [w for w in re.findall(r"[a-z0-9]{3,}", text) if w not in _STOPWORDS]
+
+
+def split_passages(text: str, target_chars: int = 500) -> List[str]:
+    """
+    Agrupa líneas consecutivas del texto limpio en pasajes de ~target_chars.
+    Las líneas cortas (menús, botones) solo se conservan dentro de un pasaje
+    que tenga también texto corrido.
+    """
+    passages: List[str] = []
+    buf: List[str] = []
+    size = 0
+    prose = False
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        buf.append(line)
+        size += len(line) + 1
+        if len(line.split()) >= 6:
+            prose = True
+        if size >= target_chars:
+            if prose:
+                passages.append("\n".join(buf))
+            buf, size, prose = [], 0, False
+    if buf and prose:
+        passages.append("\n".join(buf))
+    return passages
+
+
+def _bm25_scores(docs: List[List[str]], query: List[str]) -> List[float]:
+    n = len(docs)
+    avgdl = (sum(len(d) for d in docs) / n) if n else 0.0
+    df: Counter = Counter()
+    for d in docs:
+        df.update(set(d))
+    scores = []
+    for d in docs:
+        tf = Counter(d)
+        dl = len(d) or 1
+        s = 0.0
+        for q in set(query):
+            if q not in tf:
+                continue
+            idf = math.log(1 + (n - df[q] + 0.5) / (df[q] + 0.5))
+            s += idf * tf[q] * (_K1 + 1) / (tf[q] + _K1 * (1 - _B + _B * dl / (avgdl or 1)))
+        scores.append(s)
+    return scores
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def select_passages(
+    pages: List[Any],
+    max_tokens: int,
+    model: Optional[str] = None,
+    topics: Optional[Dict[str, str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Devuelve los pasajes elegidos (dicts con page, url, text, score, section)
+    en el orden de las páginas de origen, sin superar max_tokens.
+    """
+    topics = topics or SECTION_TOPICS
+    candidates: List[Dict[str, Any]] = []
+    for page_idx, p in enumerate(pages):
+        if not isinstance(p, Mapping):
+            continue
+        ptype = str(p.get("type") or "page").lower()
+        texts = []
+        summary = p.get("summary") or p.get("description")
+        if summary:
+            texts.append((summary, SUMMARY_PRIOR))
+        texts.extend((t, 0.0) for t in split_passages(p.get("content") or ""))
+        for pos, (text, prior) in enumerate(texts):
+            candidates.append({
+                "page": page_idx,
+                "pos": pos,
+                "url": p.get("url", ""),
+                "type": ptype,
+                "text": text,
+                "terms": _terms(text),
+                "prior": prior,
+            })
+    if not candidates:
+        return []
+
+    docs = [c["terms"] for c in candidates]
+    per_section: Dict[str, List[float]] = {}
+    for section, query in topics.items():
+        scores = _bm25_scores(docs, _terms(query))
+        top = max(scores) or 1.0
+        per_section[section] = [s / top for s in scores]
+
+    section_weight = {s: 1.0 for s in topics}
+
+    def value(i: int):
+        section, rel = max(
+            ((s, per_section[s][i] * section_weight[s]) for s in topics),
+            key=lambda x: x[1],
+        )
+        c = candidates[i]
+        return (rel + c["prior"]) * PAGE_TYPE_WEIGHTS.get(c["type"], 1.0), section
+
+    # Greedy perezoso: los pesos de sección solo bajan, así que el valor de un
+    # candidato solo puede bajar y basta con re-evaluar el máximo del heap.
+    heap = [(-value(i)[0], i) for i in range(len(candidates))]
+    heapq.heapify(heap)
+
+    selected: List[Dict[str, Any]] = []
+    selected_terms: List[set] = []
+    pages_seen = set()
+    used = 0
+
+    while heap:
+        neg_val, i = heapq.heappop(heap)
+        val, section = value(i)
+        if val <= 0:
+            break
+        if heap and val < -heap[0][0] and val < -neg_val:
+            heapq.heappush(heap, (-val, i))
+            continue
+
+        c = candidates[i]
+        terms = set(c["terms"])
+        if any(_jaccard(terms, t) >= REDUNDANCY_THRESHOLD for t in selected_terms):
+            continue
+        cost = estimate_tokens(c["text"], model) + 2
+        if c["page"] not in pages_seen:
+            cost += estimate_tokens(f"[{c['type']}] {c['url']}", model) + 2
+        if used + cost > max_tokens:
+            continue
+
+        used += cost
+        pages_seen.add(c["page"])
+        section_weight[section] *= COVERAGE_DECAY
+        selected_terms.append(terms)
+        selected.append({
+            "page": c["page"],
+            "pos": c["pos"],
+            "url": c["url"],
+            "type": c["type"],
+            "text": c["text"],
+            "score": round(val, 4),
+            "section": section,
+        })
+
+    selected.sort(key=lambda x: (x["page"], x["pos"]))
+    logger.info(
+        "Passage selector: %d/%d pasajes, %d tokens (presupuesto %d)",
+        len(selected),
+        len(candidates),
+        used,
+        max_tokens,
+    )
+    return selected
+
+
+def format_passages(passages: List[Dict[str, Any]]) -> str:
+    """
+    Une los pasajes agrupados por página con una cabecera [tipo] url.
+    """
+    blocks: List[str] = []
+    current = None
+    for p in passages:
+        if p["url"] != current:
+            current = p["url"]
+            blocks.append(f"[{p['type']}] {current}")
+        blocks.append(p["text"])
+    return "\n\n".join(blocks)
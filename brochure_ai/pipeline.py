@@ -0,0 +1,560 @@
+"""
+Pipeline completo de un folleto: scraping -> selección -> compilación ->
+folleto -> traducciones. Lo usan la CLI y los modos batch/servicio.
+
+Con deadline (segundos por run, ver deadline.py) el run no se alarga: la
+selección y la compilación dejan libre RUN_DEADLINE_RESERVE del tiempo para
+generar y, si el tiempo se agota, el run degrada en vez de fallar
+(run["degraded"]): selección heurística, folleto con las páginas compiladas
+hasta entonces y, si ni el LLM llega, folleto sin LLM. Las traducciones que
+no llegan quedan en failed_languages.
+"""
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+
+from . import deadline as run_deadline, metrics
+from .deadline import RUN_DEADLINE_RESERVE, expired
+from .scraping import scrape_and_extract
+from .link_selector import MOCK_MODE, likely_links, select_relevant_links, select_relevant_links_mock
+from .compiler import (
+    PREFETCH_TOP,
+    cancel_prefetch,
+    compile_pages,
+    prefetch_pages,
+    release_pages,
+    summarize_content,
+)
+from .brochure import (
+    _facts_from_pages,
+    compile_budget,
+    generate_brochure,
+    generate_brochure_mock,
+    resolve_generation_modes,
+    translate_brochure,
+)
+from .llm import get_route
+from .checkpoint import load_manifest, restore, save_stage
+from .tracing import span
+from .fingerprints import (
+    changed_pages,
+    fingerprint_path,
+    hash_json,
+    hash_links,
+    hash_pages,
+    hash_text,
+    load_fingerprints,
+    save_fingerprints,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def slugify(text: str) -> str:
+    """
+    Convierte un nombre arbitrario a un slug de fichero sencillo
+    """
+    return "".join(c if c.isalnum() else "_" for c in text).lower()
+
+
+def save_markdown(content: str, filepath: str):
+    """
+    Persiste contenido MD en disco creando carpetas si hace falta
+    """
+    path = Path(filepath)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content,encoding="utf-8")
+    logger.info(f"Contenido MD guardadi en disco {path}")
+
+
+def export_html(markdown_content: str, filepath: str):
+    """
+    Exporta MD a HTML sencillo y legible
+    """
+    try:
+        import markdown
+    except ImportError:
+        logger.warning("markdown library not installed. Skipping HTML export.")
+        return
+
+    try:
+        html = markdown.markdown(markdown_content)
+        full_html = f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Corporate Brochure</title>
+<style>
+body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; color: #333; }}
+h1 {{ color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px; }}
+h2 {{ color: #34495e; margin-top: 30px; }}
+h3 {{ color: #555; }}
+ul {{ padding-left: 20px; }}
+li {{ margin: 8px 0; }}
+hr {{ margin: 30px 0; border: none; border-top: 1px solid #ddd; }}
+</style>
+</head>
+<body>
+{html}
+</body>
+</html>"""
+        path = Path(filepath)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(full_html, encoding="utf-8")
+        logger.info("HTML exported to: %s", path)
+    except Exception as e:
+        logger.error("Error exporting HTML: %s", e)
+
+def _autodetect_company_name(html_main:str, fallback:str)->str:
+    """
+    Intenta extraer un nombre de empresa razonable del HTML si el nombre pasado
+    es un placeholder como 'EJEMPLO SA'
+    """
+    lower_name= fallback.strip().lower()
+    if lower_name not in ("ejemplo sa","ejemplo","example","demo",""):
+        return fallback
+
+    try:
+        from bs4 import BeautifulSoup
+
+        soup=BeautifulSoup(html_main,"html.parser")
+        auto = None
+        og_site= soup.find("meta", attrs={"property":"og:site_name"})
+        if og_site and og_site.get("content"):
+            auto = og_site.get("content").strip()
+        elif soup.title and soup.title.string:
+            auto = soup.title.string.strip().split("_")[0].split("|")[0]
+
+        if auto:
+            logger.info(f"Autodetected company name: {auto}")
+            return auto
+    except Exception as e:
+        logger.error("Error autodetecting company name: %s", e)
+    return fallback
+
+
+def parse_languages(values: Optional[List[str]]) -> List[str]:
+    """
+    Acepta ["en", "fr"] y ["en,fr"] (sin duplicados).
+    """
+    langs: List[str] = []
+    for v in values or []:
+        for lang in v.split(","):
+            lang = lang.strip()
+            if lang and lang not in langs:
+                langs.append(lang)
+    return langs
+
+
+def translate_and_save(
+    brochure_md: str,
+    target: str,
+    out_dir: str,
+    slug: str,
+    with_html: bool,
+    deadline: Optional[run_deadline.Deadline] = None,
+) -> Tuple[str, List[str], float]:
+    """
+    Traduce a un idioma y escribe sus ficheros en cuanto termina.
+    Devuelve (idioma, rutas escritas, segundos).
+    """
+    start = time.perf_counter()
+    logger.info("Translating brochure to %s", target)
+    with span(f"translate:{target}", cat="lang"):
+        brochure_tr = translate_brochure(brochure_md, target_lang=target, deadline=deadline)
+    md_tr_path = os.path.join(out_dir, f"{slug}_brochure_{target}.md")
+    save_markdown(brochure_tr, md_tr_path)
+    paths = [md_tr_path]
+
+    if with_html:
+        html_tr_path = os.path.join(out_dir, f"{slug}_brochure_{target}.html")
+        export_html(brochure_tr, html_tr_path)
+        paths.append(html_tr_path)
+    return target, paths, time.perf_counter() - start
+
+
+def check_generation_modes(sectioned: Optional[bool], map_reduce: Optional[bool]) -> None:
+    """
+    Folleto por secciones y map-reduce son modos excluyentes: ValueError si
+    se piden los dos (antes ganaba sectioned sin avisar). Se comprueban los
+    modos resueltos, así que también cuenta BROCHURE_SECTIONED/BROCHURE_MAP_REDUCE.
+    """
+    sectioned, map_reduce = resolve_generation_modes(sectioned, map_reduce)
+    if sectioned and map_reduce:
+        raise ValueError("sectioned and map_reduce are mutually exclusive generation modes")
+
+
+def _generation_mode(mock: bool, sectioned: bool, map_reduce: bool) -> str:
+    if mock:
+        return "mock"
+    if sectioned:
+        return "sectioned"
+    return "map_reduce" if map_reduce else "single"
+
+
+def new_run(
+    company: str,
+    url: str,
+    tone: str = "formal",
+    output_dir: str = "outputs",
+    with_html: bool = False,
+    mock: bool = False,
+    sectioned: Optional[bool] = None,
+    map_reduce: Optional[bool] = None,
+    languages: Optional[List[str]] = None,
+    force: bool = False,
+    deadline: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Estado de un run: parámetros más lo que va produciendo cada etapa.
+    El deadline (segundos, por defecto RUN_DEADLINE) empieza a contar con
+    la primera etapa que se ejecuta (en batch, no en la cola).
+    Los modos de generación se resuelven aquí (argumento o variable de
+    entorno) y las etapas solo usan run["sectioned"], run["map_reduce"],
+    run["mode"] y el presupuesto de compilación de ese modo.
+    """
+    sectioned, map_reduce = resolve_generation_modes(sectioned, map_reduce)
+    check_generation_modes(sectioned, map_reduce)
+    mode = _generation_mode(mock or MOCK_MODE, sectioned, map_reduce)
+    return {
+        "company": company,
+        "url": url,
+        "tone": tone,
+        "output_dir": output_dir,
+        "with_html": with_html,
+        "mock": mock,
+        "sectioned": sectioned,
+        "map_reduce": map_reduce,
+        "mode": mode,
+        "compile_budget": compile_budget(mode),
+        "languages": parse_languages(languages),
+        "force": force,
+        "deadline_s": deadline,
+        "degraded": [],
+        "skipped": [],
+        "stage_seconds": {},
+    }
+
+
+def stage_scrape(run: Dict[str, Any]) -> None:
+    """
+    Descarga la landing, detecta el nombre de la empresa y carga las huellas
+    del run anterior.
+    """
+    logger.info("Step 1/4: Scraping %s", run["url"])
+    html_main, links = scrape_and_extract(run["url"], deadline=run.get("deadline"))
+    logger.info("Found %d links", len(links))
+
+    # Autodetectar nombre real si pasas 'Ejemplo SA' u otro placeholder
+    company_name = _autodetect_company_name(html_main, run["company"])
+    slug = slugify(company_name)
+    run.update(
+        html_main=html_main,
+        links=links,
+        company_name=company_name,
+        slug=slug,
+        fp_path=fingerprint_path(run["output_dir"], slug),
+    )
+    run["previous"] = {} if run["force"] else load_fingerprints(run["fp_path"])
+    run["current"] = {"company": company_name, "url": run["url"]}
+
+
+def stage_select(run: Dict[str, Any]) -> None:
+    """
+    Selección de enlaces con LLM o mock (reutilizada si los enlaces no cambian).
+    """
+    logger.info("Step 2/4: Selecting relevant links")
+    previous, current = run["previous"], run["current"]
+    current["links_hash"] = hash_links(run["links"])
+    current["selection_mode"] = "mock" if run["mock"] else get_route("links")["model"]
+    if (
+        previous.get("links_hash") == current["links_hash"]
+        and previous.get("selection_mode") == current["selection_mode"]
+        and isinstance(previous.get("selected"), dict)
+    ):
+        selected = previous["selected"]
+        run["skipped"].append("select")
+        logger.info("Link set unchanged: reusing previous selection")
+    else:
+        # mientras el LLM decide, se descargan los candidatos más probables
+        early = _early_deadline(run)
+        prefetch = {}
+        if not (run["mock"] or MOCK_MODE) and PREFETCH_TOP > 0:
+            prefetch = prefetch_pages(likely_links(run["url"], run["links"], PREFETCH_TOP), deadline=early)
+        try:
+            selected = select_relevant_links(run["url"], run["links"], mock=run["mock"], deadline=early)
+        except Exception as e:
+            if not expired(early):
+                cancel_prefetch(prefetch)
+                raise
+            logger.warning("Link selection hit the run deadline (%s): using heuristic selection", e)
+            selected = select_relevant_links_mock(run["url"], run["links"])
+            run["degraded"].append("select")
+            current["links_hash"] = None  # el próximo run vuelve a pedir la selección
+        except BaseException:
+            cancel_prefetch(prefetch)
+            raise
+        run["prefetch"] = prefetch
+    current["selected"] = selected
+    run["selected"] = selected
+    logger.info("Selected %d relevant links", len(selected.get("links", [])))
+
+
+def stage_compile(run: Dict[str, Any]) -> None:
+    """
+    Descarga y resume las páginas seleccionadas (reutilizando las que se
+    adelantaron durante la selección) hasta cubrir el contenido que usará
+    el modo de generación.
+    """
+    logger.info("Step 3/4: Compiling pages")
+    stats: Dict[str, Any] = {}
+    pages = compile_pages(
+        run["selected"], run["html_main"], base_url=run["url"], prefetched=run.pop("prefetch", None),
+        budget_tokens=run["compile_budget"], stats=stats, deadline=_early_deadline(run),
+    )
+    if stats.get("deadline_skipped"):
+        run["degraded"].append("compile")
+    pages = summarize_content(pages)
+    logger.info("Compiled %d pages", len(pages))
+    run["pages"] = pages
+    run["compile_stats"] = stats
+    run["current"]["pages"] = hash_pages(pages)
+    if run["previous"].get("pages"):
+        logger.info(
+            "Pages changed since last run: %d",
+            len(changed_pages(run["previous"]["pages"], run["current"]["pages"])),
+        )
+
+
+def stage_generate(run: Dict[str, Any]) -> None:
+    """
+    Genera el folleto (o reutiliza el anterior si sus entradas no cambian).
+    """
+    previous, current = run["previous"], run["current"]
+    pages, mock, mode = run["pages"], run["mock"], run["mode"]
+    output_dir, slug = run["output_dir"], run["slug"]
+
+    current["facts_hash"] = hash_json(_facts_from_pages(pages))
+    current["brochure_input"] = hash_json({
+        "pages": current["pages"],
+        "facts": current["facts_hash"],
+        "company": run["company_name"],
+        "tone": run["tone"],
+        "mode": mode,
+        "model": None if mock else get_route("brochure")["model"],
+        "summary_model": get_route("summary")["model"] if mode == "map_reduce" else None,
+    })
+    md_path = os.path.join(output_dir, f"{slug}_brochure.md")
+    html_path = os.path.join(output_dir, f"{slug}_brochure.html") if run["with_html"] else None
+
+    if previous.get("brochure_input") == current["brochure_input"] and os.path.exists(md_path):
+        logger.info("Step 4/4: Content unchanged, reusing %s", md_path)
+        brochure_md = Path(md_path).read_text(encoding="utf-8")
+        run["skipped"].append("generate")
+        if html_path and not os.path.exists(html_path):
+            export_html(brochure_md, html_path)
+    else:
+        logger.info("Step 4/4: Generating brochure")
+        try:
+            brochure_md = generate_brochure(
+                run["company_name"], pages, run["tone"],
+                mock=mock, sectioned=run["sectioned"], map_reduce=run["map_reduce"],
+                deadline=run.get("deadline"),
+            )
+        except Exception as e:
+            if not expired(run.get("deadline")):
+                raise
+            logger.warning("Brochure generation hit the run deadline (%s): generating without LLM", e)
+            brochure_md = generate_brochure_mock(run["company_name"], pages, run["tone"])
+            run["degraded"].append("generate")
+            current["brochure_input"] = None  # el próximo run lo regenera con el LLM
+        # Guardar folleto original
+        save_markdown(brochure_md, md_path)
+        if html_path:
+            export_html(brochure_md, html_path)
+    current["brochure_hash"] = hash_text(brochure_md)
+    run.update(brochure_md=brochure_md, md_path=md_path, html_path=html_path)
+    # con el folleto hecho solo quedan metadatos y resumen de cada página
+    release_pages(pages)
+
+
+def stage_translate(run: Dict[str, Any]) -> None:
+    """
+    Traducción opcional: un hilo por idioma; la concurrencia real contra el
+    LLM la limita LLM_MAX_CONCURRENCY. Los idiomas al día se saltan.
+    """
+    previous, current = run["previous"], run["current"]
+    output_dir, slug, with_html = run["output_dir"], run["slug"], run["with_html"]
+    brochure_md = run["brochure_md"]
+
+    translated_paths: List[str] = []
+    timings: Dict[str, float] = {}
+    failed: List[str] = []
+    previous_tr = previous.get("translations") or {}
+    current["translations"] = {}
+    pending: List[str] = []
+    for lang in run["languages"]:
+        tr_path = os.path.join(output_dir, f"{slug}_brochure_{lang}.md")
+        if previous_tr.get(lang) == current["brochure_hash"] and os.path.exists(tr_path):
+            logger.info("Translation %s up to date, skipping", lang)
+            current["translations"][lang] = current["brochure_hash"]
+            translated_paths.append(tr_path)
+            tr_html = os.path.join(output_dir, f"{slug}_brochure_{lang}.html")
+            if with_html and not os.path.exists(tr_html):
+                export_html(Path(tr_path).read_text(encoding="utf-8"), tr_html)
+            run["skipped"].append(f"translate:{lang}")
+        else:
+            pending.append(lang)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="lang") as pool:
+            futures = {
+                pool.submit(
+                    translate_and_save, brochure_md, lang, output_dir, slug, with_html, run.get("deadline")
+                ): lang
+                for lang in pending
+            }
+            for fut in as_completed(futures):
+                lang = futures[fut]
+                try:
+                    _, paths, seconds = fut.result()
+                except Exception as e:
+                    logger.error("Translation to %s failed: %s", lang, e)
+                    failed.append(lang)
+                    continue
+                translated_paths.extend(paths)
+                timings[lang] = seconds
+                current["translations"][lang] = current["brochure_hash"]
+
+    # conserva las traducciones de idiomas no pedidos en este run
+    for lang, h in previous_tr.items():
+        current["translations"].setdefault(lang, h if h == current["brochure_hash"] else None)
+    current["translations"] = {k: v for k, v in current["translations"].items() if v}
+    run.update(translated_paths=translated_paths, timings=timings, failed_languages=failed)
+
+
+# Etapas en orden; batch.py reparte cada una en su pool (descargas o LLM)
+STAGES = [
+    ("scrape", stage_scrape),
+    ("select", stage_select),
+    ("compile", stage_compile),
+    ("generate", stage_generate),
+    ("translate", stage_translate),
+]
+
+
+def _early_deadline(run: Dict[str, Any]) -> Optional[run_deadline.Deadline]:
+    """
+    Deadline de selección y compilación: deja tiempo para generar.
+    """
+    deadline = run.get("deadline")
+    return deadline.reserve(RUN_DEADLINE_RESERVE) if deadline is not None else None
+
+
+def run_stage(run: Dict[str, Any], name: str) -> None:
+    """
+    Ejecuta una etapa midiendo su duración en run["stage_seconds"].
+    """
+    if "deadline" not in run:
+        run["deadline"] = run_deadline.start(run.get("deadline_s"))
+    start = time.perf_counter()
+    try:
+        with span(name, cat="stage", url=run["url"]):
+            dict(STAGES)[name](run)
+    except Exception:
+        metrics.STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        run["stage_seconds"][name] = round(time.perf_counter() - start, 3)
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+
+def finish_run(run: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Guarda las huellas y devuelve el resumen del run.
+    """
+    save_fingerprints(run["fp_path"], run["current"])
+    for step in run.get("degraded", []):
+        metrics.DEGRADED.inc(step=step)
+    return {
+        "company": run["company_name"],
+        "slug": run["slug"],
+        "md_path": run["md_path"],
+        "html_path": run["html_path"],
+        "languages": run["languages"],
+        "translated_paths": run["translated_paths"],
+        "timings": run["timings"],
+        "failed_languages": run["failed_languages"],
+        "skipped": run["skipped"],
+        "resumed": run.get("resumed", []),
+        "compile_stats": run.get("compile_stats", {}),
+        "degraded": run.get("degraded", []),
+        "stage_seconds": run["stage_seconds"],
+    }
+
+
+def run_pipeline(
+    company: str,
+    url: str,
+    tone: str = "formal",
+    output_dir: str = "outputs",
+    with_html: bool = False,
+    mock: bool = False,
+    sectioned: Optional[bool] = None,
+    map_reduce: Optional[bool] = None,
+    languages: Optional[List[str]] = None,
+    force: bool = False,
+    run_dir: Optional[str] = None,
+    resume: bool = False,
+    deadline: Optional[float] = None,
+    output_lock: Optional[Callable[[str], ContextManager[Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Ejecuta el pipeline para una empresa y escribe los ficheros en output_dir.
+
+    Con las huellas del run anterior (<slug>_fingerprints.json) se salta cada
+    etapa cuyas entradas no han cambiado: selección de enlaces, generación del
+    folleto y cada traducción. force=True ignora las huellas.
+
+    Con run_dir cada etapa completa deja su checkpoint (ver checkpoint.py) y
+    resume=True continúa un run fallido desde la primera etapa incompleta.
+
+    deadline (segundos) limita la duración del run; al agotarse degrada en
+    vez de fallar (ver el docstring del módulo y result["degraded"]).
+
+    output_lock(slug), si se pasa, se mantiene desde que se conoce el slug
+    (tras el scraping) hasta guardar las huellas: dos runs concurrentes que
+    escriben los mismos ficheros no se pisan (modo servicio).
+
+    Devuelve un resumen con rutas, tiempos por idioma y etapas reutilizadas.
+    """
+    run = new_run(
+        company, url, tone, output_dir, with_html, mock,
+        sectioned, map_reduce, languages, force, deadline,
+    )
+    manifest = load_manifest(run_dir) if run_dir else {}
+    done = restore(run_dir, manifest, run) if run_dir and resume else []
+    if done:
+        logger.info("Resuming %s after: %s", url, ", ".join(done))
+        run["resumed"] = done
+        run["previous"] = {} if force else load_fingerprints(run["fp_path"])
+    elif run_dir:
+        manifest = {}
+
+    with ExitStack() as held:
+        for name, _ in STAGES:
+            if output_lock is not None and name == "select":
+                held.enter_context(output_lock(run["slug"]))
+                # las huellas pueden haber cambiado mientras se esperaba el lock
+                run["previous"] = {} if force else load_fingerprints(run["fp_path"])
+            if name in done:
+                continue
+            run_stage(run, name)
+            # con idiomas fallidos la traducción queda pendiente para el próximo --resume
+            if run_dir and not (name == "translate" and run["failed_languages"]):
+                save_stage(run_dir, manifest, name, run)
+        return finish_run(run)
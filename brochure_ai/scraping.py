@@ -1,16 +1,64 @@
+import os
+import time
+import socket
 import logging
+import threading
 import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+from . import archive, metrics
+from .deadline import Deadline, DeadlineExceeded, expired, timeout_for
+from .tracing import add_span, cpu_profile, is_enabled, span
 
 logger = logging.getLogger(__name__)
 
-def fetch_page(url: str, timeout: int = 15) -> str:
+# Bytes por lectura del cuerpo: entre lecturas se comprueba el deadline del run
+FETCH_CHUNK_BYTES = int(os.getenv("FETCH_CHUNK_BYTES", "65536"))
+
+_LOCAL = threading.local()
+
+
+def get_session() -> requests.Session:
+    """
+    Sesión HTTP del hilo actual: reutiliza conexiones keep-alive entre
+    descargas (batch, servicio). Una por hilo porque Session no es thread-safe.
+    """
+    session = getattr(_LOCAL, "session", None)
+    if session is None:
+        session = requests.Session()
+        _LOCAL.session = session
+    return session
+
+
+def _trace_dns(url: str) -> None:
+    """
+    Mide la resolución DNS del host (solo con trazas activas).
+    """
+    parsed = urlparse(url)
+    if not parsed.hostname:
+        return
+    start = time.perf_counter()
+    try:
+        socket.getaddrinfo(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
+    except OSError:
+        pass
+    add_span("dns", start, time.perf_counter(), cat="net", host=parsed.hostname)
+
+
+def fetch_page(url: str, timeout: int = 15, deadline: Optional[Deadline] = None) -> str:
     """
     Descarga la página HTML de una URL con headers realistas.
     Devuelve el HTML plano como string.
+    Con trazas activas apunta dns, connect+ttfb y download por URL.
+    Con un archivo activo (archive.py) graba la respuesta o la sirve desde él.
+    Con deadline el timeout no pasa de lo que le queda al run y el cuerpo se
+    lee por trozos: un servidor que lo manda muy despacio no alarga el run.
     """
+    reader = archive.player()
+    if reader is not None:
+        return _replay_page(reader, url)
+
     headers = {
         "User-Agent": (
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -19,13 +67,81 @@ def fetch_page(url: str, timeout: int = 15) -> str:
         )
     }
 
+    host = urlparse(url).hostname or ""
+    resp = None
+    with span("fetch", cat="net", url=url) as info:
+        try:
+            if is_enabled():
+                _trace_dns(url)
+            timeout = timeout_for(deadline, timeout)
+            start = time.perf_counter()
+            # stream=True: la petición vuelve con las cabeceras y el cuerpo se lee aparte
+            resp = get_session().get(url, headers=headers, timeout=timeout, stream=True)
+            # elapsed llega hasta las cabeceras e incluye la conexión si es nueva
+            headers_at = start + resp.elapsed.total_seconds()
+            body = _read_body(resp, deadline)
+            encoding = _body_encoding(resp, body)
+            metrics.FETCH_SECONDS.observe(time.perf_counter() - start, host=host)
+            metrics.FETCH_BYTES.inc(len(body), host=host)
+            add_span("connect+ttfb", start, headers_at, cat="net", url=url)
+            add_span("download", headers_at, time.perf_counter(), cat="net", url=url, bytes=len(body))
+            info.update(status=resp.status_code, bytes=len(body))
+            writer = archive.recorder()
+            if writer is not None:
+                # la misma codificación con la que se decodifica aquí (cabecera o
+                # detectada), para que la reproducción dé exactamente el mismo texto
+                writer.add(url, resp.status_code, resp.headers, body, encoding, resp.url)
+            resp.raise_for_status()
+            return _decode(body, encoding)
+        except Exception as e:
+            if resp is not None:
+                resp.close()
+            metrics.FETCH_ERRORS.inc(host=host)
+            logger.error("Error fetching %s: %s", url, e)
+            raise
+
+
+def _read_body(resp: requests.Response, deadline: Optional[Deadline]) -> bytes:
+    """
+    Lee el cuerpo por trozos; lanza DeadlineExceeded si el run se queda sin
+    tiempo a mitad (el timeout de la petición solo acota cada lectura).
+    """
+    chunks = []
+    for chunk in resp.iter_content(FETCH_CHUNK_BYTES):
+        chunks.append(chunk)
+        if expired(deadline):
+            raise DeadlineExceeded(f"fetch {resp.url}: run deadline exceeded while reading the body")
+    return b"".join(chunks)
+
+
+def _body_encoding(resp: requests.Response, body: bytes) -> str:
+    """
+    Codificación de la cabecera o, si no la hay, la detectada en el cuerpo
+    (lo mismo que resp.encoding or resp.apparent_encoding, que no se puede
+    usar: el cuerpo ya se ha leído por trozos).
+    """
+    return resp.encoding or requests.compat.chardet.detect(body)["encoding"] or "utf-8"
+
+
+def _decode(body: bytes, encoding: Optional[str]) -> str:
+    # como resp.text: errores reemplazados y, si la codificación no existe, la por defecto
     try:
-        resp = requests.get(url, headers=headers, timeout=timeout)
-        resp.raise_for_status()
-        return resp.text
-    except Exception as e:
-        logger.error("Error fetching %s: %s", url, e)
-        raise
+        return body.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+def _replay_page(reader: "archive.ArchiveReader", url: str) -> str:
+    with span("fetch", cat="net", url=url, replay=True) as info:
+        try:
+            rec = reader.get(url)
+        except Exception as e:
+            logger.error("Error fetching %s from archive: %s", url, e)
+            raise
+        info.update(status=rec["status"], bytes=len(rec["body"]))
+        if rec["status"] >= 400:
+            raise requests.HTTPError(f"{rec['status']} Error (archived) for url: {url}")
+        return _decode(rec["body"], rec["encoding"])
 
 
 def _normalize_url(href: str, base_url: str) -> str:
@@ -50,6 +166,8 @@ def extract_links(html: str, base_url: str) -> List[str]:
     Extrae TODOS los <a href="..."> del HTML, normalizados a URLs absolutas.
     No filtra por dominio aquí; eso se hace en link_selector.
     """
+    from bs4 import BeautifulSoup  # import diferido: bs4 tarda en cargar
+
     soup = BeautifulSoup(html, "html.parser")
     raw_links = [a.get("href") for a in soup.find_all("a") if a.get("href")]
 
@@ -76,6 +194,8 @@ def clean_text(html: str) -> str:
     """
     Limpia scripts, styles, iframes, SVG, etc. y devuelve texto plano.
     """
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
 
     # eliminar ruido
@@ -91,7 +211,7 @@ def clean_text(html: str) -> str:
     return clean
 
 
-def scrape_and_extract(url: str) -> Tuple[str, List[str]]:
+def scrape_and_extract(url: str, deadline: Optional[Deadline] = None) -> Tuple[str, List[str]]:
     """
     Función principal usada por la CLI.
     - Descarga la página principal
@@ -101,8 +221,11 @@ def scrape_and_extract(url: str) -> Tuple[str, List[str]]:
     """
     logger.info("Fetching main page: %s", url)
 
-    html_main = fetch_page(url)
-    links = extract_links(html_main, url)
+    html_main = fetch_page(url, deadline=deadline)
+    start = time.perf_counter()
+    with span("parse", cat="cpu", url=url), cpu_profile():
+        links = extract_links(html_main, url)
+    metrics.PARSE_SECONDS.observe(time.perf_counter() - start, where="links")
 
     logger.info("Main page scraped: %d raw links", len(links))
 
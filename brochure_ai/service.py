@@ -0,0 +1,385 @@
+"""
+Modo servicio: servidor HTTP local con una cola de trabajos de folletos.
+
+El proceso arranca una vez (imports, warm-up del modelo, cachés SQLite y
+sesiones HTTP por hilo) y atiende muchos folletos:
+
+    POST /jobs              {"company", "url", "tone", "languages", "priority", "deadline", ...}
+                            -> 202 {"id", "status"}
+    GET  /jobs/<id>         estado del trabajo
+    GET  /jobs/<id>/result  folleto y traducciones (409 si aún no ha terminado)
+    GET  /health            estado de la cola, llamadas LLM y aciertos de caché
+    GET  /metrics           métricas en formato Prometheus (ver metrics.py)
+
+Los trabajos se ordenan por priority (menor primero, luego por llegada) y se
+ejecutan en SERVICE_WORKERS hilos; LLM_MAX_CONCURRENCY sigue acotando las
+llamadas simultáneas al LLM.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import metrics
+from .cache import _CACHES
+from .llm import keep_models_loaded
+from .llm_ollama import llm_stats_summary
+from .pipeline import check_generation_modes, parse_languages, run_pipeline
+
+logger = logging.getLogger(__name__)
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8080"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "2"))
+# Trabajos terminados que se conservan en memoria (los más antiguos se olvidan)
+SERVICE_MAX_JOBS = int(os.getenv("SERVICE_MAX_JOBS", "1000"))
+DEFAULT_PRIORITY = 5
+# Códigos de idioma admitidos (en, pt-BR, zh_Hant...): acaban en nombres de fichero
+_LANG_RE = re.compile(r"^[A-Za-z]{2,3}([-_][A-Za-z0-9]{2,8})?$")
+# Tonos admitidos (los mismos que --tone de la CLI)
+TONES = ("formal", "humorístico")
+
+
+class JobQueue:
+    """
+    Cola de prioridad en memoria con un número fijo de hilos trabajadores.
+    Dos trabajos con el mismo slug de salida no escriben a la vez (serían los
+    mismos ficheros aunque las URLs sean distintas).
+    """
+
+    def __init__(
+        self,
+        workers: int = SERVICE_WORKERS,
+        output_dir: str = "outputs",
+        mock: bool = False,
+        max_jobs: int = SERVICE_MAX_JOBS,
+    ):
+        self.workers = max(1, workers)
+        self.output_dir = output_dir
+        self.mock = mock
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        # slug -> [lock, trabajos que lo usan o esperan]; se borra al quedar libre
+        self._slug_locks: Dict[str, List[Any]] = {}
+        self._threads = []
+        self.started_at = time.time()
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put((float("inf"), next(self._seq), None))
+        for t in self._threads:
+            t.join(timeout=5)
+
+    def submit(self, params: Dict[str, Any], priority: int = DEFAULT_PRIORITY) -> Dict[str, Any]:
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "status": "queued",
+            "priority": priority,
+            "params": params,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            self.jobs[job["id"]] = job
+            self._prune()
+            snapshot = dict(job)
+        self._queue.put((priority, next(self._seq), job["id"]))
+        logger.info("Job %s queued (priority %d): %s", job["id"], priority, params["url"])
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Copia del trabajo: los hilos trabajadores lo actualizan bajo el lock.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {s: 0 for s in ("queued", "running", "done", "failed")}
+            for job in self.jobs.values():
+                counts[job["status"]] += 1
+            durations = [
+                j["finished_at"] - j["started_at"]
+                for j in self.jobs.values()
+                if j["status"] == "done"
+            ]
+        return {
+            **counts,
+            "workers": self.workers,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "avg_job_s": round(sum(durations) / len(durations), 2) if durations else None,
+        }
+
+    def _prune(self) -> None:
+        finished = [j for j in self.jobs.values() if j["status"] in ("done", "failed")]
+        for job in sorted(finished, key=lambda j: j["finished_at"])[: max(0, len(self.jobs) - self.max_jobs)]:
+            del self.jobs[job["id"]]
+
+    @contextmanager
+    def _slug_lock(self, slug: str) -> Iterator[None]:
+        with self._lock:
+            entry = self._slug_locks.setdefault(slug, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._slug_locks[slug]
+
+    def _worker(self) -> None:
+        while True:
+            _, _, job_id = self._queue.get()
+            if job_id is None:
+                return
+            job = self.get(job_id)
+            if job is None:
+                continue
+            params = job["params"]
+            self._update(job_id, status="running", started_at=time.time())
+            try:
+                result = run_pipeline(
+                    params["company"],
+                    params["url"],
+                    tone=params["tone"],
+                    output_dir=self.output_dir,
+                    with_html=params["export_html"],
+                    mock=self.mock or params["mock"],
+                    sectioned=params["sectioned"],
+                    map_reduce=params["map_reduce"],
+                    languages=params["languages"],
+                    force=params["force"],
+                    deadline=params.get("deadline"),
+                    output_lock=self._slug_lock,
+                )
+                self._update(job_id, status="done", result=result, finished_at=time.time())
+            except Exception as e:
+                logger.error("Job %s failed: %s", job_id, e)
+                self._update(job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+
+
+def parse_job_request(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Valida el cuerpo de POST /jobs. Lanza ValueError si falta algo.
+    """
+    url = str(body.get("url") or "").strip()
+    if not url.startswith(("http://", "https://")):
+        raise ValueError("url must be an absolute http(s) URL")
+    langs = body.get("languages") or []
+    if isinstance(langs, str):
+        langs = [langs]
+    if not isinstance(langs, list) or not all(isinstance(v, str) for v in langs):
+        raise ValueError("languages must be a list of language codes")
+    languages = parse_languages(langs)
+    for lang in languages:
+        if not _LANG_RE.match(lang):
+            raise ValueError(f"invalid language code: {lang!r}")
+    sectioned = bool(body.get("sectioned")) or None
+    map_reduce = bool(body.get("map_reduce")) or None
+    check_generation_modes(sectioned, map_reduce)
+    deadline = body.get("deadline")
+    if deadline is not None:
+        try:
+            deadline = float(deadline)
+        except (TypeError, ValueError):
+            raise ValueError("deadline must be a number of seconds") from None
+        if deadline <= 0:
+            raise ValueError("deadline must be positive")
+    tone = body.get("tone") or "formal"
+    if tone not in TONES:
+        raise ValueError(f"tone must be one of: {', '.join(TONES)}")
+    return {
+        "company": str(body.get("company") or "Ejemplo SA"),
+        "url": url,
+        "tone": tone,
+        "languages": languages,
+        "export_html": bool(body.get("export_html")),
+        "mock": bool(body.get("mock")),
+        "sectioned": sectioned,
+        "map_reduce": map_reduce,
+        "force": bool(body.get("force")),
+        "deadline": deadline,
+    }
+
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "url": job["params"]["url"],
+        "company": job["params"]["company"],
+        "submitted_at": job["submitted_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+        "skipped": (job["result"] or {}).get("skipped"),
+        "degraded": (job["result"] or {}).get("degraded"),
+    }
+
+
+def _job_output(job: Dict[str, Any]) -> Dict[str, Any]:
+    result = job["result"]
+    # mismo nombre que escribe pipeline.translate_and_save (el idioma puede llevar "_")
+    stem = result["md_path"][: -len(".md")]
+    translations = {
+        lang: Path(f"{stem}_{lang}.md").read_text(encoding="utf-8")
+        for lang in result["languages"]
+        if f"{stem}_{lang}.md" in result["translated_paths"]
+    }
+    return {
+        "id": job["id"],
+        "result": result,
+        "brochure": Path(result["md_path"]).read_text(encoding="utf-8"),
+        "translations": translations,
+    }
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "BrochureService/1.0"
+
+    def log_message(self, fmt, *args):
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    def _send(self, status: int, data: Dict[str, Any]) -> None:
+        raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._send_raw(status, raw, "application/json; charset=utf-8")
+
+    def _send_raw(self, status: int, raw: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    @property
+    def jobs(self) -> JobQueue:
+        return self.server.jobs
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("body must be a JSON object")
+            params = parse_job_request(body)
+            priority = int(body.get("priority", DEFAULT_PRIORITY))
+        except (ValueError, TypeError) as e:
+            return self._send(400, {"error": str(e)})
+        job = self.jobs.submit(params, priority)
+        self._send(202, {"id": job["id"], "status": job["status"]})
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+        if parts == ["metrics"]:
+            return self._send_raw(200, metrics.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        if parts == ["health"]:
+            return self._send(200, {
+                "status": "ok",
+                "jobs": self.jobs.stats(),
+                "llm": llm_stats_summary(),
+                "caches": {name: {"hits": c.hits, "misses": c.misses} for name, c in list(_CACHES.items())},
+            })
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return self._send(404, {"error": "unknown job"})
+            if len(parts) == 2:
+                return self._send(200, _public(job))
+            if parts[2] == "result":
+                if job["status"] == "failed":
+                    return self._send(500, _public(job))
+                if job["status"] != "done":
+                    return self._send(409, _public(job))
+                try:
+                    return self._send(200, _job_output(job))
+                except OSError as e:
+                    return self._send(410, {"error": f"output no longer available: {e}"})
+        self._send(404, {"error": "not found"})
+
+
+def make_server(
+    host: str = SERVICE_HOST,
+    port: int = SERVICE_PORT,
+    jobs: Optional[JobQueue] = None,
+) -> ThreadingHTTPServer:
+    """
+    Crea el servidor HTTP con su cola (arrancada). port=0 elige uno libre.
+    """
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.jobs = jobs or JobQueue()
+    server.jobs.start()
+    return server
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Servicio local de generación de folletos")
+    parser.add_argument("--host", default=SERVICE_HOST, help="Interfaz de escucha (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="Puerto (default 8080)")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Trabajos simultáneos")
+    parser.add_argument("--output-dir", default="outputs", help="Directorio de salida")
+    parser.add_argument("--mock", action="store_true", help="Usar modo mock (sin LLM)")
+    args = parser.parse_args()
+
+    mock_mode = args.mock or os.getenv("MOCK_MODE", "false").lower() == "true"
+    if mock_mode:
+        os.environ["MOCK_MODE"] = "true"
+
+    server = make_server(
+        args.host,
+        args.port,
+        JobQueue(workers=args.workers, output_dir=args.output_dir, mock=mock_mode),
+    )
+    # Los modelos quedan cargados para todas las peticiones
+    with keep_models_loaded(enabled=not mock_mode):
+        logger.info("Brochure service listening on http://%s:%d", *server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Shutting down")
+        finally:
+            server.server_close()
+            server.jobs.stop()
+
+
+if __name__ == "__main__":
+    main()
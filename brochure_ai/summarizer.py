@@ -0,0 +1,180 @@
+"""
+Resumen extractivo de páginas (sin servicios externos).
+
+Puntúa cada frase combinando TextRank (PageRank sobre la matriz de similitud
+coseno TF-IDF entre frases) y cercanía al centroide del documento, y elige las
+mejores frases no redundantes hasta un máximo de caracteres. Con NumPy la matriz
+de similitud se calcula vectorizada; sin NumPy se usa una versión en Python puro.
+"""
+import os
+import re
+import math
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from .passages import _terms
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "600"))
+# Frases candidatas por página (la similitud es O(n²))
+MAX_SENTENCES = 200
+_DAMPING = 0.85
+_ITERATIONS = 30
+# Frases con similitud mayor se consideran repetidas
+_REDUNDANCY = 0.8
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?…])\s+")
+
+# NumPy (opcional) se importa en el primer resumen: False = aún sin resolver
+_NUMPY: Any = False
+
+
+def _numpy() -> Any:
+    """
+    Módulo numpy o None si no está instalado.
+    """
+    global _NUMPY
+    if _NUMPY is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _NUMPY = numpy
+    return _NUMPY
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Frases del texto limpio. Se descartan líneas de menú y botones
+    (menos de 6 palabras) y bloques larguísimos sin puntuación.
+    """
+    sentences: List[str] = []
+    for line in (text or "").splitlines():
+        for s in _SENTENCE_SPLIT.split(line.strip()):
+            words = len(s.split())
+            if 6 <= words <= 80:
+                sentences.append(s.strip())
+    return sentences
+
+
+def _tfidf(docs: List[List[str]]) -> List[Dict[str, float]]:
+    n = len(docs)
+    df: Counter = Counter()
+    for d in docs:
+        df.update(set(d))
+    vectors = []
+    for d in docs:
+        tf = Counter(d)
+        vec = {t: c * math.log(1 + n / df[t]) for t, c in tf.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        vectors.append({t: v / norm for t, v in vec.items()})
+    return vectors
+
+
+def _scores_numpy(vectors: List[Dict[str, float]]) -> Tuple[List[float], List[List[float]]]:
+    np = _numpy()
+    vocab = {t: i for i, t in enumerate(sorted({t for v in vectors for t in v}))}
+    X = np.zeros((len(vectors), len(vocab)))
+    for i, vec in enumerate(vectors):
+        for t, w in vec.items():
+            X[i, vocab[t]] = w
+    sim = X @ X.T
+    np.fill_diagonal(sim, 0.0)
+
+    # TextRank: PageRank sobre el grafo de similitudes
+    out = sim.sum(axis=1, keepdims=True)
+    out[out == 0] = 1.0
+    transition = sim / out
+    n = len(vectors)
+    rank = np.full(n, 1.0 / n)
+    for _ in range(_ITERATIONS):
+        rank = (1 - _DAMPING) / n + _DAMPING * transition.T @ rank
+
+    centroid = X.mean(axis=0)
+    cnorm = np.linalg.norm(centroid) or 1.0
+    central = X @ centroid / cnorm
+
+    score = 0.5 * rank / (rank.max() or 1.0) + 0.5 * central / (central.max() or 1.0)
+    return score.tolist(), sim.tolist()
+
+
+def _scores_python(vectors: List[Dict[str, float]]) -> Tuple[List[float], List[List[float]]]:
+    n = len(vectors)
+    sim = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            a, b = vectors[i], vectors[j]
+            if len(a) > len(b):
+                a, b = b, a
+            s = sum(w * b.get(t, 0.0) for t, w in a.items())
+            sim[i][j] = sim[j][i] = s
+
+    out = [sum(row) or 1.0 for row in sim]
+    rank = [1.0 / n] * n
+    for _ in range(_ITERATIONS):
+        rank = [
+            (1 - _DAMPING) / n + _DAMPING * sum(sim[j][i] / out[j] * rank[j] for j in range(n))
+            for i in range(n)
+        ]
+
+    centroid: Dict[str, float] = Counter()
+    for vec in vectors:
+        centroid.update(vec)
+    cnorm = math.sqrt(sum(v * v for v in centroid.values())) or 1.0
+    central = [sum(w * centroid[t] for t, w in vec.items()) / cnorm for vec in vectors]
+
+    rmax = max(rank) or 1.0
+    cmax = max(central) or 1.0
+    score = [0.5 * r / rmax + 0.5 * c / cmax for r, c in zip(rank, central)]
+    return score, sim
+
+
+def summarize_text(text: str, max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """
+    Resumen extractivo de text de como mucho max_chars, con las frases
+    elegidas en su orden original.
+    """
+    sentences = split_sentences(text)[:MAX_SENTENCES]
+    if not sentences:
+        return ""
+    if len(sentences) == 1:
+        return sentences[0][:max_chars]
+
+    docs = [_terms(s) for s in sentences]
+    keep = [i for i, d in enumerate(docs) if d]
+    if not keep:
+        return sentences[0][:max_chars]
+    vectors = _tfidf([docs[i] for i in keep])
+    score, sim = (_scores_numpy if _numpy() is not None else _scores_python)(vectors)
+
+    chosen: List[int] = []
+    used = 0
+    # redondeo: NumPy y Python puro difieren en el último decimal; a igualdad, la frase anterior
+    for k in sorted(range(len(keep)), key=lambda k: (-round(score[k], 9), k)):
+        sentence = sentences[keep[k]]
+        if used + len(sentence) + 1 > max_chars:
+            continue
+        if any(sim[k][c] >= _REDUNDANCY for c in chosen):
+            continue
+        chosen.append(k)
+        used += len(sentence) + 1
+
+    if not chosen:
+        return sentences[keep[0]][:max_chars]
+    return " ".join(sentences[keep[k]] for k in sorted(chosen))
+
+
+def page_summary(description: str, content: str, max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """
+    Resumen acotado de una página: la meta description (si hay) seguida de
+    las frases más representativas del contenido hasta max_chars.
+    Sin frases aprovechables se recurre al inicio del contenido.
+    """
+    desc = (description or "").strip()[: max_chars // 2]
+    room = max_chars - len(desc) - 1 if desc else max_chars
+    extract = summarize_text(content, room) if room > 0 else ""
+    if not extract and not desc:
+        return (content or "")[:max_chars]
+    return " ".join(t for t in (desc, extract) if t)
@@ -0,0 +1,81 @@
+"""
+conftest.py - Fixtures compartidas: sitio local, entorno sin red y servicio de trabajos
+
+Los módulos que necesitan el entorno sin red lo piden de forma explícita:
+
+    pytestmark = pytest.mark.usefixtures("offline")
+"""
+import functools
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from .. import cache, llm, tokens
+from ..service import JobQueue, make_server
+
+PAGE = """<html><head><title>ACME | Inicio</title>
+<meta name="description" content="ACME ayuda a pymes a digitalizarse"></head>
+<body><h1>ACME</h1>
+<a href="/about/">Sobre nosotros</a> <a href="/careers/">Empleo</a>
+<p>{text}</p></body></html>"""
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    """Sirve un sitio corporativo mínimo desde tmp_path/site."""
+    root = tmp_path / "site"
+    for sub in ("", "about", "careers"):
+        (root / sub).mkdir(parents=True, exist_ok=True)
+        (root / sub / "index.html").write_text(
+            PAGE.format(text=f"Somos una empresa fundada en 1998 ({sub or 'home'})."),
+            encoding="utf-8",
+        )
+    handler = functools.partial(_QuietHandler, directory=str(root))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield root, f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+
+
+@pytest.fixture
+def offline(monkeypatch, tmp_path):
+    """Backend mock, estimación local de tokens y cachés en tmp_path."""
+    monkeypatch.setattr(tokens, "_tokenize_available", False)
+    monkeypatch.setattr(cache, "BROCHURE_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(cache, "_CACHES", {})
+    llm.set_backend(llm.MockBackend())
+    yield
+    llm.set_backend(None)
+
+
+@pytest.fixture
+def service(tmp_path):
+    """Servicio de trabajos (modo mock) en un puerto libre; devuelve su URL base."""
+    server = make_server("127.0.0.1", 0, JobQueue(workers=2, output_dir=str(tmp_path / "out"), mock=True))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.jobs.stop()
+
+
+@pytest.fixture
+def wait_job():
+    """Función que espera a que un trabajo del servicio termine y devuelve su estado."""
+    def wait(base, job_id, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = requests.get(f"{base}/jobs/{job_id}").json()
+            if status["status"] in ("done", "failed"):
+                return status
+            time.sleep(0.05)
+        raise AssertionError("job did not finish")
+
+    return wait
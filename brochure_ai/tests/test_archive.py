@@ -0,0 +1,79 @@
+"""
+test_archive.py - Tests del archivo de snapshots (grabar y reproducir descargas)
+"""
+import pytest
+
+from .. import archive
+from ..archive import ArchiveError, ArchiveMiss, ArchiveReader, ArchiveWriter
+from ..pipeline import run_pipeline
+from ..scraping import fetch_page
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+@pytest.fixture(autouse=True)
+def no_archive():
+    yield
+    archive.close()
+
+
+def test_records_are_read_back_by_url(tmp_path):
+    """Test que cada registro se lee por URL con su estado, cabeceras y cuerpo (gana el último)."""
+    path = str(tmp_path / "site.arc.gz")
+    writer = ArchiveWriter(path)
+    writer.add("https://acme.example/", 200, {"Content-Type": "text/html"}, "<p>ñandú v1</p>".encode("utf-8"), "utf-8")
+    writer.add("https://acme.example/missing", 404, {}, b"not found")
+    writer.add("https://acme.example/", 200, {"Content-Type": "text/html"}, "<p>ñandú v2</p>".encode("utf-8"), "utf-8")
+    writer.close()
+
+    reader = ArchiveReader(path)
+    assert sorted(reader.urls()) == ["https://acme.example/", "https://acme.example/missing"]
+    home = reader.get("https://acme.example/")
+    assert home["body"].decode("utf-8") == "<p>ñandú v2</p>"
+    assert home["headers"]["Content-Type"] == "text/html"
+    assert reader.get("https://acme.example/missing")["status"] == 404
+    with pytest.raises(ArchiveMiss):
+        reader.get("https://acme.example/other")
+    reader.close()
+
+
+def test_unclosed_archive_is_rejected(tmp_path):
+    """Test que un archivo sin índice (run interrumpido) da un error claro."""
+    path = tmp_path / "broken.arc.gz"
+    writer = ArchiveWriter(str(path))
+    writer.add("https://acme.example/", 200, {}, b"<p>hola</p>")
+    writer._f.flush()
+    with pytest.raises(ArchiveError):
+        ArchiveReader(str(path))
+    writer.close()
+
+
+def test_replay_regenerates_without_network(site, tmp_path):
+    """Test que un run grabado se regenera igual con el sitio apagado."""
+    root, url = site
+    path = str(tmp_path / "acme.arc.gz")
+    archive.record(path)
+    first = run_pipeline("ACME", url, output_dir=str(tmp_path / "a"), mock=True, languages=[])
+    archive.close()
+
+    (root / "about" / "index.html").unlink()  # el sitio ya no sirve la página
+    archive.replay(path)
+    second = run_pipeline("ACME", url, output_dir=str(tmp_path / "b"), mock=True, languages=[])
+    with pytest.raises(ArchiveMiss):
+        fetch_page(url + "missing/")  # no grabada: no se va a la red
+    with open(first["md_path"], encoding="utf-8") as a, open(second["md_path"], encoding="utf-8") as b:
+        assert a.read() == b.read()
+
+
+def test_replay_decodes_like_the_live_fetch(site, tmp_path):
+    """Test que sin charset en la cabecera la reproducción decodifica como resp.text (codificación detectada)."""
+    root, url = site
+    text = "<html><body><p>La compañía diseña señalética y rótulos para pequeñas empresas de la región.</p></body></html>"
+    (root / "latin.xhtml").write_bytes(text.encode("latin-1") * 5)  # application/xhtml+xml, sin charset
+    path = str(tmp_path / "acme.arc.gz")
+    archive.record(path)
+    live = fetch_page(url + "latin.xhtml")
+    archive.close()
+
+    archive.replay(path)
+    assert fetch_page(url + "latin.xhtml") == live
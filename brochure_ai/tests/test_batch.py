@@ -0,0 +1,48 @@
+"""
+test_batch.py - Tests del modo batch contra un sitio local (modo mock)
+"""
+import json
+
+import pytest
+
+from ..batch import read_jobs, run_batch
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+def test_read_jobs_csv_and_jsonl(tmp_path):
+    """Test que CSV y JSONL se normalizan igual y las filas sin url llevan error."""
+    csv_path = tmp_path / "jobs.csv"
+    csv_path.write_text(
+        "company,url,tone,languages\nACME,http://a.test/,formal,en;fr\nSin url,,,\n",
+        encoding="utf-8",
+    )
+    jsonl_path = tmp_path / "jobs.jsonl"
+    jsonl_path.write_text(
+        json.dumps({"company": "ACME", "url": "http://a.test/", "languages": ["en", "fr"]}) + "\n{roto\n",
+        encoding="utf-8",
+    )
+
+    from_csv = read_jobs(str(csv_path))
+    from_jsonl = read_jobs(str(jsonl_path))
+    assert from_csv[0]["languages"] == from_jsonl[0]["languages"] == ["en", "fr"]
+    assert from_csv[1]["error"] == "missing url"
+    assert "error" in from_jsonl[1]
+
+
+def test_failing_item_does_not_stop_batch(site, tmp_path):
+    """Test que un trabajo que falla queda aislado y todos salen en el JSONL."""
+    _, url = site
+    jobs = [
+        {"index": 0, "company": "ACME", "url": url, "tone": "formal", "languages": ["en"]},
+        {"index": 1, "company": "Caida", "url": "http://127.0.0.1:9/", "tone": "formal", "languages": []},
+        {"index": 2, "company": "ACME2", "url": url, "tone": "formal", "languages": []},
+    ]
+    results = tmp_path / "out" / "results.jsonl"
+    records = run_batch(jobs, output_dir=str(tmp_path / "out"), results_path=str(results), mock=True)
+
+    assert [r["status"] for r in records] == ["ok", "error", "ok"]
+    assert records[1]["failed_stage"] == "scrape"
+    assert set(records[0]["stage_seconds"]) == {"scrape", "select", "compile", "generate", "translate"}
+    assert (tmp_path / "out" / "acme_brochure_en.md").exists()
+    assert len(results.read_text(encoding="utf-8").splitlines()) == 3
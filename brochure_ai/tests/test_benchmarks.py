@@ -0,0 +1,58 @@
+"""
+test_benchmarks.py - Tests del harness de benchmarks (sitios sintéticos y e2e)
+"""
+import pytest
+import requests
+
+from ..benchmarks.e2e import compare, percentile, run_mode
+from ..benchmarks.sites import generate_site, serve_sites
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+SPEC = {"pages": 8, "page_kb": 4, "links": 20, "slow": 1, "slow_delay": 0.01, "failing": 1}
+
+
+def test_generated_site_is_deterministic():
+    """Test que el mismo spec genera el mismo sitio con las páginas lentas/caídas pedidas."""
+    site = generate_site("ACME", SPEC)
+    assert site == generate_site("ACME", SPEC)
+    assert len(site) == 9
+    assert sum(p["slow"] for p in site.values()) == 1
+    assert sum(p["failing"] for p in site.values()) == 1
+    assert all(len(p["html"]) >= 4 * 1024 for p in site.values())
+
+
+def test_served_site_injects_failures():
+    """Test que las páginas marcadas como caídas devuelven 500."""
+    with serve_sites(1, SPEC) as urls:
+        assert requests.get(urls[0], timeout=5).status_code == 200
+        failing = [p for p, page in generate_site("Empresa0", dict(SPEC, seed=0)).items() if page["failing"]]
+        assert requests.get(urls[0] + failing[0], timeout=5).status_code == 500
+
+
+def test_run_mode_reports_stage_percentiles(tmp_path):
+    """Test que un modo produce folletos/hora y p50/p95 por etapa."""
+    with serve_sites(2, SPEC) as urls:
+        report = run_mode("batch", urls, str(tmp_path / "out"), ["en"])
+    assert report["ok"] == 2
+    assert report["brochures_per_hour"] > 0
+    assert set(report["stages"]) == {"scrape", "select", "compile", "generate", "translate"}
+
+    baseline = {"modes": {"batch": report}}
+    assert any("+0.0%" in line for line in compare(baseline, baseline))
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([1, 2, 3, 4], 100) == 4
+
+
+def test_memory_benchmark_releases_page_text():
+    """Test que la variante Page retiene mucho menos texto que la de dicts."""
+    from ..benchmarks.memory import run_variant
+
+    old = run_variant("dict", runs=2, pages=2, page_kb=8)
+    new = run_variant("page", runs=2, pages=2, page_kb=8)
+    assert old["pages"] == new["pages"] == 4
+    assert new["retained_text_mb"] < old["retained_text_mb"]
@@ -0,0 +1,101 @@
+"""
+test_brochure.py - Tests de generación del folleto con el backend mock
+"""
+import threading
+import time
+
+import pytest
+
+from .. import brochure, cache, llm, tokens
+
+PAGES = [
+    {
+        "type": "about",
+        "url": "https://x.com/about",
+        "title": "Sobre X",
+        "headings": ["Nuestra mision"],
+        "description": "X ayuda a pymes a digitalizarse.",
+        "content": "Somos una empresa fundada en 1998 con la mision de ayudar a pymes y clientes.",
+    },
+]
+
+
+@pytest.fixture(autouse=True)
+def local_only(monkeypatch):
+    monkeypatch.setattr(tokens, "_tokenize_available", False)
+    yield
+    llm.set_backend(None)
+
+
+class _SlowSectionBackend(llm.MockBackend):
+    """Tarda 0.2 s por llamada y registra cuántas van en paralelo."""
+
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def chat(self, system_prompt, user_prompt, model, call_type="chat", timeout=None, options=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.2)
+        with self.lock:
+            self.active -= 1
+        title = user_prompt.split("## ", 1)[1].splitlines()[0]
+        return f"## Otro titulo\n\n- contenido de {title}"
+
+
+def test_sectioned_generation_runs_in_parallel_and_keeps_order():
+    """Test que las secciones se generan a la vez y se unen en orden."""
+    backend = _SlowSectionBackend()
+    llm.set_backend(backend)
+
+    md = brochure.generate_brochure("X", PAGES, sectioned=True)
+
+    assert backend.peak > 1
+    titles = [line[3:] for line in md.splitlines() if line.startswith("## ")]
+    assert titles == [s["title"] for s in brochure.SECTIONS]
+    assert md.startswith("# X – Folleto Corporativo")
+
+
+def test_facts_include_dict_pages():
+    """Test que los FACTS se construyen a partir de páginas dict."""
+    facts = brochure._facts_from_pages(PAGES)
+    assert facts[0]["title"] == "Sobre X"
+
+
+def test_map_reduce_uses_cached_page_summaries(monkeypatch, tmp_path):
+    """Test que el folleto map-reduce usa solo resúmenes y los reutiliza en el siguiente run."""
+    monkeypatch.setattr(cache, "BROCHURE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache, "_CACHES", {})
+    backend = llm.MockBackend(responses={"summary": "- X digitaliza pymes desde 1998"})
+    backend.cacheable = True
+    llm.set_backend(backend)
+    pages = PAGES + [dict(PAGES[0], url="https://x.com/casos", content="Casos de exito con 200 clientes.")]
+
+    brochure.generate_brochure("X", pages, map_reduce=True)
+    types = [c["call_type"] for c in backend.calls]
+    assert types.count("summary") == 2 and types[-1] == "brochure"
+
+    backend.calls.clear()
+    brochure.generate_brochure("X", pages, map_reduce=True)
+    assert [c["call_type"] for c in backend.calls] == ["brochure"]
+
+
+def test_map_reduce_prompt_has_summaries_not_raw_content(monkeypatch, tmp_path):
+    """Test que el prompt final lleva los resúmenes en lugar del texto de las páginas."""
+    monkeypatch.setattr(cache, "BROCHURE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache, "_CACHES", {})
+    prompts = []
+    monkeypatch.setattr(brochure, "chat", lambda s, u, **kw: prompts.append(u) or "# X")
+    monkeypatch.setattr(
+        brochure,
+        "summarize_pages",
+        lambda pages, **kw: [{"type": "about", "url": "https://x.com/about", "summary": "- RESUMEN"}],
+    )
+
+    brochure.generate_brochure_map_reduce("X", PAGES)
+    assert "- RESUMEN" in prompts[0]
+    assert "fundada en 1998" not in prompts[0]
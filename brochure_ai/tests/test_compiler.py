@@ -0,0 +1,48 @@
+"""
+test_compiler.py - Tests de las páginas compiladas (Page perezosa y compacta)
+"""
+import json
+
+from .. import compiler
+from ..checkpoint import _jsonable
+from ..compiler import Page
+
+HTML = """<html><head><title>ACME | Sobre nosotros</title>
+<meta name="description" content="ACME ayuda a pymes a digitalizarse."></head>
+<body><h1>Quiénes somos</h1><script>track()</script>
+<p>Somos una empresa fundada en 1998 que ayuda a pymes con su transformación digital.</p></body></html>"""
+
+
+def test_page_parses_lazily_once(monkeypatch):
+    """Test que el HTML se parsea solo al leer un campo, una vez, y después se suelta."""
+    calls = []
+    real = compiler.clean_text
+    monkeypatch.setattr(compiler, "clean_text", lambda html: calls.append(1) or real(html))
+
+    page = Page.from_html(HTML, "https://acme.example/about", "about")
+    assert calls == [] and page.raw_size > 0
+    assert page["title"] == "ACME | Sobre nosotros"
+    assert "fundada en 1998" in page["content"]
+    assert "track" not in page["content"]
+    assert page.get("summary").startswith("ACME ayuda a pymes")
+    assert calls == [1]
+    assert page.raw_size == 0
+
+
+def test_page_reads_like_the_old_dict():
+    """Test que Page se serializa y compara como el dict de página de antes."""
+    page = Page.from_html(HTML, "https://acme.example/about", "about")
+    data = json.loads(json.dumps(page, default=_jsonable))
+    assert set(data) == set(Page.FIELDS)
+    assert page == data
+    assert dict(page)["headings"] == ["Quiénes somos"]
+
+
+def test_release_keeps_metadata_and_summary():
+    """Test que release() suelta el texto pero conserva metadatos y resumen ya calculados."""
+    page = Page.from_html(HTML, "https://acme.example/about", "about").parse()
+    summary = page["summary"]
+    page.release()
+    assert page["content"] == ""
+    assert page["summary"] == summary
+    assert page["description"] == "ACME ayuda a pymes a digitalizarse."
@@ -0,0 +1,112 @@
+"""
+test_deadline.py - Tests del deadline global del run (timeouts y degradación)
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from .. import llm, scraping
+from ..deadline import Deadline, DeadlineExceeded, start, timeout_for
+from ..pipeline import run_pipeline
+from ..scraping import fetch_page
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+def test_deadline_bounds_timeouts():
+    """Test que el timeout de cada operación no pasa de lo que queda y que al agotarse se lanza."""
+    deadline = Deadline(10)
+    assert timeout_for(deadline, 15) <= 10
+    assert timeout_for(deadline, 2) == 2
+    assert timeout_for(None, 15) == 15
+    assert deadline.reserve(0.4).remaining() == pytest.approx(6, abs=0.1)
+    assert start(0) is None
+
+    with pytest.raises(DeadlineExceeded):
+        Deadline(0).timeout(15)
+
+
+def test_chat_fails_fast_when_deadline_is_spent():
+    """Test que con el deadline agotado no se llama al backend."""
+    backend = llm.MockBackend()
+    llm.set_backend(backend)
+    with pytest.raises(DeadlineExceeded):
+        llm.chat("s", "u", call_type="brochure", deadline=Deadline(0))
+    assert backend.calls == []
+
+
+def test_slow_llm_degrades_instead_of_hanging(site, tmp_path):
+    """Test que con un LLM lento el run acaba a tiempo con selección heurística y folleto sin LLM."""
+    _, url = site
+    llm.set_backend(llm.MockBackend(latency={llm.get_route("brochure")["model"]: 30}))
+
+    start_at = time.monotonic()
+    result = run_pipeline(
+        "ACME", url, output_dir=str(tmp_path / "out"), languages=["en"], force=True, deadline=1.0,
+    )
+    assert time.monotonic() - start_at < 5
+    assert "select" in result["degraded"] and "generate" in result["degraded"]
+    assert result["failed_languages"] == ["en"]
+    with open(result["md_path"], encoding="utf-8") as f:
+        assert "ACME" in f.read()
+
+
+class _TrickleHandler(BaseHTTPRequestHandler):
+    """Manda el cuerpo en 20 trozos de 8 bytes, uno cada 0.2 s."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(20 * 8))
+        self.end_headers()
+        for _ in range(20):
+            self.wfile.write(b"<p>abc</p>"[:8])
+            self.wfile.flush()
+            time.sleep(0.2)
+
+
+def test_trickling_body_stops_at_the_deadline(monkeypatch):
+    """Test que un servidor que manda el cuerpo muy despacio no alarga la descarga más allá del deadline."""
+    monkeypatch.setattr(scraping, "FETCH_CHUNK_BYTES", 8)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TrickleHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        start_at = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            fetch_page(f"http://127.0.0.1:{server.server_address[1]}/", deadline=Deadline(0.6))
+        assert time.monotonic() - start_at < 2
+    finally:
+        server.shutdown()
+
+
+class _CharsetHandler(BaseHTTPRequestHandler):
+    """Página en latin-1 declarada en la cabecera."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = "<p>Compañía fundada en Córdoba</p>".encode("latin-1")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=iso-8859-1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def test_chunked_body_is_decoded_with_the_response_encoding(monkeypatch):
+    """Test que el cuerpo leído por trozos se decodifica con la codificación de la respuesta."""
+    monkeypatch.setattr(scraping, "FETCH_CHUNK_BYTES", 8)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CharsetHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        html = fetch_page(f"http://127.0.0.1:{server.server_address[1]}/")
+        assert html == "<p>Compañía fundada en Córdoba</p>"
+    finally:
+        server.shutdown()
@@ -0,0 +1,147 @@
+"""
+test_llm.py - Tests del router de backends LLM contra un servidor stub local
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from .. import llm
+from ..llm_ollama import reset_llm_stats
+
+# Latencia simulada por modelo (s)
+SLOW = {"big": 2.0}
+# Cuerpos recibidos por el stub
+BODIES = []
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        BODIES.append(body)
+        model = body.get("model")
+        time.sleep(SLOW.get(model, 0))
+        if self.path == "/api/generate":
+            data = {"response": f"ollama:{model}", "eval_count": 3}
+        elif self.path == "/v1/chat/completions":
+            data = {
+                "choices": [{"message": {"content": f"openai:{model}"}}],
+                "usage": {"prompt_tokens": 5, "completion_tokens": 2},
+            }
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        raw = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    monkeypatch.setitem(llm.ROUTES, "links", {
+        "model": "small", "deadline": 5, "fallback": "", "max_output": 64, "num_ctx": 2048,
+    })
+    monkeypatch.setitem(llm.ROUTES, "brochure", {
+        "model": "big", "deadline": 0.3, "fallback": "small", "max_output": 64, "num_ctx": 8192,
+    })
+    reset_llm_stats()
+    BODIES.clear()
+    yield llm.ROUTES
+    llm.set_backend(None)
+
+
+def test_routes_model_per_call_type(stub_url, routes):
+    """Test que cada tipo de llamada usa su modelo."""
+    llm.set_backend(llm.OllamaBackend(base_url=stub_url))
+    assert llm.chat("s", "u", call_type="links") == "ollama:small"
+
+
+def test_failover_when_primary_exceeds_deadline(stub_url, routes):
+    """Test que un modelo lento se sustituye por el fallback y queda en cooldown."""
+    llm.set_backend(llm.OllamaBackend(base_url=stub_url))
+    assert llm.chat("s", "u", call_type="brochure") == "ollama:small"
+
+    start = time.monotonic()
+    assert llm.chat("s", "u", call_type="brochure") == "ollama:small"
+    assert time.monotonic() - start < 0.3
+
+
+def test_one_num_ctx_per_model_including_warmup(stub_url, routes):
+    """Test que un modelo usa el mismo num_ctx en todas sus rutas y en el warm-up."""
+    assert llm.model_num_ctx("small") == 8192  # links (2048) y fallback del folleto (8192)
+    backend = llm.OllamaBackend(base_url=stub_url)
+    llm.set_backend(backend)
+    for thread in backend.warmup(["small"]):
+        thread.join(timeout=5)
+    llm.chat("s", "u", call_type="links")
+    llm.chat("s", "u " * 3000, call_type="links")
+    assert {b["options"]["num_ctx"] for b in BODIES} == {8192}
+
+
+def test_openai_compatible_backend(stub_url, routes):
+    """Test del backend compatible con OpenAI."""
+    llm.set_backend(llm.OpenAICompatBackend(base_url=f"{stub_url}/v1"))
+    assert llm.chat("s", "u", call_type="links") == "openai:small"
+
+
+def test_release_models_unloads_every_routed_model(stub_url, routes):
+    """Test que al salir se descargan todos los modelos enrutados y solo en Ollama."""
+    llm.set_backend(llm.OpenAICompatBackend(base_url=f"{stub_url}/v1"))
+    llm.release_models()
+    assert BODIES == []
+
+    llm.set_backend(llm.OllamaBackend(base_url=stub_url))
+    llm.release_models()
+    released = {b["model"] for b in BODIES if b.get("keep_alive") == 0}
+    assert released == {r["model"] for r in routes.values()} | {"small"}
+
+
+def test_keep_models_loaded_warms_up_and_releases(stub_url, routes):
+    """Test que keep_models_loaded precarga los modelos enrutados y los descarga al salir si se pide."""
+    llm.set_backend(llm.OllamaBackend(base_url=stub_url))
+    with llm.keep_models_loaded(release_on_exit=True) as threads:
+        for thread in threads:
+            thread.join(timeout=5)
+        assert {b["model"] for b in BODIES} == {r["model"] for r in routes.values()}
+    assert {b["model"] for b in BODIES if b.get("keep_alive") == 0} >= {"big", "small"}
+
+    BODIES.clear()
+    with llm.keep_models_loaded(enabled=False):
+        pass
+    assert BODIES == []
+
+
+def test_mock_backend_is_deterministic(routes):
+    """Test que el mock devuelve lo mismo para la misma entrada."""
+    llm.set_backend(llm.MockBackend())
+    prompt = "Enlaces encontrados:\nhttps://example.com/about\n"
+    first = llm.chat("s", prompt, call_type="links")
+    assert first == llm.chat("s", prompt, call_type="links")
+    assert json.loads(first)["links"][0]["url"] == "https://example.com/about"
+
+
+def test_backend_interface_requires_chat():
+    """Test que un backend sin chat() no se puede instanciar."""
+    class Incomplete(llm.LLMBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
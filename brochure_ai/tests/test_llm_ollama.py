@@ -0,0 +1,72 @@
+"""
+test_llm_ollama.py - Tests para warm-up, keep_alive y métricas de Ollama
+"""
+import pytest
+
+from .. import llm_ollama
+
+
+class _FakeResponse:
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+@pytest.fixture
+def posts(monkeypatch):
+    """Captura los payloads enviados a Ollama y devuelve una respuesta fija."""
+    calls = []
+
+    def fake_post(url, json=None, timeout=None):
+        calls.append((url, json))
+        return _FakeResponse({
+            "response": " hola ",
+            "load_duration": 2_000_000_000,
+            "prompt_eval_duration": 500_000_000,
+            "eval_duration": 1_500_000_000,
+            "prompt_eval_count": 42,
+            "eval_count": 7,
+        })
+
+    monkeypatch.setattr(llm_ollama.requests, "post", fake_post)
+    llm_ollama.reset_llm_stats()
+    yield calls
+    llm_ollama.reset_llm_stats()
+
+
+def test_chat_sends_keep_alive_and_records_durations(posts):
+    """Test que chat_ollama envía keep_alive y registra load/prompt_eval/eval."""
+    out = llm_ollama.chat_ollama("sys", "user", call_type="brochure")
+
+    assert out == "hola"
+    url, payload = posts[0]
+    assert url.endswith("/api/generate")
+    assert payload["keep_alive"] == llm_ollama.OLLAMA_KEEP_ALIVE
+
+    stats = llm_ollama.get_llm_stats()
+    assert stats[0]["call_type"] == "brochure"
+    assert stats[0]["load_s"] == 2.0
+    assert stats[0]["prompt_eval_s"] == 0.5
+    assert stats[0]["eval_s"] == 1.5
+    assert stats[0]["completion_tokens"] == 7
+
+
+def test_warmup_runs_in_background_without_prompt(posts):
+    """Test que el warm-up precarga el modelo sin enviar prompt."""
+    llm_ollama.start_warmup(model="tiny").join(timeout=5)
+
+    _, payload = posts[0]
+    assert payload["model"] == "tiny"
+    assert "prompt" not in payload
+    summary = llm_ollama.llm_stats_summary()
+    assert summary["calls"] == 0  # el warm-up no cuenta como llamada del pipeline
+    assert summary["warmup"]["calls"] == 1
+
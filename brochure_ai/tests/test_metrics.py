@@ -0,0 +1,70 @@
+"""
+test_metrics.py - Tests del registro de métricas y de su exposición (Prometheus)
+"""
+import pytest
+import requests
+
+from .. import metrics
+from ..benchmarks.ollama_emulator import serve_emulator
+from ..llm_ollama import chat_ollama
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_render_prometheus_text():
+    """Test que contadores e histogramas se exportan con etiquetas, buckets acumulados, suma y recuento."""
+    hits = metrics.Counter("t_hits_total", "Aciertos", ["cache"])
+    hits.inc(cache='a"b')
+    hits.inc(2, cache='a"b')
+    latency = metrics.Histogram("t_seconds", "Latencia", ["host"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 3):
+        latency.observe(value, host="x")
+
+    text = "\n".join(hits.render() + latency.render())
+    assert '# TYPE t_hits_total counter' in text
+    assert 't_hits_total{cache="a\\"b"} 3' in text
+    assert 't_seconds_bucket{host="x",le="0.1"} 1' in text
+    assert 't_seconds_bucket{host="x",le="1"} 2' in text
+    assert 't_seconds_bucket{host="x",le="+Inf"} 3' in text
+    assert 't_seconds_sum{host="x"} 3.55' in text
+    assert 't_seconds_count{host="x"} 3' in text
+    with pytest.raises(ValueError):
+        hits.inc(host="x")
+
+
+def test_pipeline_run_is_instrumented(service, site, wait_job, tmp_path):
+    """Test que un run deja descargas, parseo, enlaces, cachés y etapas en /metrics y en el textfile."""
+    _, url = site
+    job_id = requests.post(f"{service}/jobs", json={"company": "ACME", "url": url, "languages": ["en"]}).json()["id"]
+    assert wait_job(service, job_id)["status"] == "done"
+
+    resp = requests.get(f"{service}/metrics")
+    assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    host = "127.0.0.1"
+    assert metrics.FETCH_SECONDS.count(host=host) >= 3  # landing, about, careers
+    assert metrics.FETCH_BYTES.value(host=host) > 0
+    assert metrics.PARSE_SECONDS.count(where="inline") >= 1
+    assert metrics.LINKS.count(step="raw") == metrics.LINKS.count(step="selected") == 1
+    assert metrics.STAGE_SECONDS.count(stage="generate") == 1
+    assert metrics.CACHE_REQUESTS.value(cache="translation_memory", result="miss") >= 1
+    assert f'brochure_fetch_bytes_total{{host="{host}"}}' in resp.text
+
+    path = metrics.write_textfile(str(tmp_path / "prom" / "brochure.prom"))
+    with open(path, encoding="utf-8") as f:
+        assert "brochure_stage_seconds_count" in f.read()
+
+
+def test_llm_tokens_per_call_type():
+    """Test que cada llamada LLM suma tokens de prompt y salida y su velocidad por tipo."""
+    with serve_emulator({"responses": {"m": "uno dos tres cuatro"}, "tokens_per_s": 200}) as server:
+        chat_ollama("s", "hola", model="m", call_type="links", base_url=server.url)
+    assert metrics.LLM_COMPLETION_TOKENS.value(call_type="links", model="m") == 4
+    assert metrics.LLM_PROMPT_TOKENS.value(call_type="links", model="m") > 0
+    assert metrics.LLM_TOKENS_PER_SECOND.count(call_type="links") == 1
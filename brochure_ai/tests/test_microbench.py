@@ -0,0 +1,64 @@
+"""
+test_microbench.py - Lógica de regresión de los microbenchmarks y gate
+
+El gate corre siempre contra la referencia del repositorio
+(benchmarks/baseline_micro.json, comparada en unidades de calibración) con
+un umbral amplio: detecta regresiones gordas en cualquier máquina. Para un
+umbral fino, una referencia propia grabada con --save en la misma máquina:
+    BROCHURE_MICROBENCH_BASELINE=baseline_micro.json pytest -q -k microbench
+"""
+import json
+import os
+
+import pytest
+
+from ..benchmarks import micro
+
+BASELINE = os.getenv("BROCHURE_MICROBENCH_BASELINE")
+# regresión tolerada frente a la referencia del repositorio (grabada en otra máquina)
+REPO_BASELINE_THRESHOLD = 1.0
+
+
+def test_find_regressions_uses_threshold_and_noise():
+    """Test que solo se marca regresión por encima del umbral y del ruido (IQR)."""
+    baseline = {"a": {"median_s": 1.0, "iqr_s": 0.01}, "b": {"median_s": 1.0, "iqr_s": 0.5}}
+    current = {
+        "a": {"median_s": 1.3, "iqr_s": 0.01},
+        "b": {"median_s": 1.3, "iqr_s": 0.5},
+        "nuevo": {"median_s": 9.0, "iqr_s": 0.0},
+    }
+    assert [r.split(":")[0] for r in micro.find_regressions(current, baseline, 0.25)] == ["a"]
+    assert micro.find_regressions(current, baseline, 0.5) == []
+
+
+def test_find_regressions_prefers_relative_to_calibration():
+    """Test que con relative una máquina el doble de lenta no cuenta como regresión."""
+    baseline = {"a": {"median_s": 1.0, "iqr_s": 0.0, "relative": 4.0, "relative_iqr": 0.1}}
+    slower_machine = {"a": {"median_s": 2.0, "iqr_s": 0.0, "relative": 4.1, "relative_iqr": 0.1}}
+    regressed = {"a": {"median_s": 2.0, "iqr_s": 0.0, "relative": 8.0, "relative_iqr": 0.1}}
+    assert micro.find_regressions(slower_machine, baseline, 0.25) == []
+    assert [r.split(":")[0] for r in micro.find_regressions(regressed, baseline, 0.25)] == ["a"]
+
+
+def test_measure_reports_stable_stats():
+    """Test que measure calibra el número de llamadas y da mediana/IQR."""
+    stats = micro.measure(lambda: sum(range(100)), repeats=3, min_round_s=0.001)
+    assert stats["loops"] >= 1 and stats["repeats"] == 3
+    assert 0 < stats["min_s"] <= stats["median_s"]
+    assert micro.measure(lambda: None, repeats=3, min_round_s=0.001, reference=lambda: None)["relative"] > 0
+
+
+def test_fixtures_have_requested_sizes():
+    html = micro.make_html(50_000, 100)
+    assert len(html) >= 50_000 and html.count("<a ") >= 100
+
+
+def test_no_regression_against_baseline():
+    """Gate: los casos small y de parseo LLM no empeoran más del umbral."""
+    with open(BASELINE or micro.DEFAULT_BASELINE, encoding="utf-8") as f:
+        baseline = json.load(f)
+    default = micro.DEFAULT_THRESHOLD if BASELINE else REPO_BASELINE_THRESHOLD
+    threshold = float(os.getenv("BROCHURE_MICROBENCH_THRESHOLD", str(default)))
+    sizes = os.getenv("BROCHURE_MICROBENCH_SIZES", "small").split(",")
+    regressions = micro.find_regressions(micro.run(sizes, repeats=5), baseline, threshold)
+    assert not regressions, "\n".join(regressions)
@@ -0,0 +1,103 @@
+"""
+test_ollama_emulator.py - Tests del emulador local de Ollama (latencia, cola y fallos)
+"""
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from .. import llm
+from ..benchmarks.ollama_emulator import serve_emulator, split_tokens
+from ..llm_ollama import chat_ollama, get_llm_stats, reset_llm_stats
+from ..pipeline import run_pipeline
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    monkeypatch.setitem(llm.ROUTES, "brochure", {
+        "model": "big", "deadline": 0.3, "fallback": "small", "max_output": 64, "num_ctx": 8192,
+    })
+    reset_llm_stats()
+    yield llm.ROUTES
+    llm.set_backend(None)
+
+
+def test_generate_returns_scripted_response_with_durations():
+    """Test que /api/generate devuelve la respuesta del guion y las métricas de Ollama."""
+    with serve_emulator({"responses": {"big": "hola mundo"}, "tokens_per_s": 100, "load_s": 0.05}) as server:
+        reset_llm_stats()
+        assert chat_ollama("s", "u", model="big", base_url=server.url) == "hola mundo"
+        assert chat_ollama("s", "u", model="big", base_url=server.url) == "hola mundo"
+        tags = requests.get(f"{server.url}/api/tags", timeout=5).json()
+    stats = get_llm_stats()
+    assert stats[0]["completion_tokens"] == 2
+    assert stats[0]["load_s"] == pytest.approx(0.05)
+    assert stats[1]["load_s"] == 0  # segunda llamada: modelo ya cargado
+    assert [m["name"] for m in tags["models"]] == ["big"]
+
+
+def test_chat_streams_tokens_after_ttft():
+    """Test que /api/chat en streaming envía un chunk por token y respeta el TTFT."""
+    with serve_emulator({"responses": {"m": "uno dos tres"}, "ttft_s": 0.2, "tokens_per_s": 50}) as server:
+        start = time.monotonic()
+        resp = requests.post(
+            f"{server.url}/api/chat",
+            json={"model": "m", "messages": [{"role": "user", "content": "hola"}]},
+            stream=True,
+            timeout=5,
+        )
+        chunks = []
+        for line in resp.iter_lines():
+            chunks.append(json.loads(line))
+            if len(chunks) == 1:
+                ttft = time.monotonic() - start
+    assert ttft >= 0.2
+    assert "".join(c["message"]["content"] for c in chunks) == "uno dos tres"
+    assert chunks[-1]["done"] and chunks[-1]["eval_count"] == 3
+
+
+def test_tokenize_is_deterministic():
+    """Test que /api/tokenize cuenta los mismos tokens que el emulador genera."""
+    text = "Somos una empresa fundada en 1998."
+    with serve_emulator() as server:
+        first = requests.post(f"{server.url}/api/tokenize", json={"model": "m", "content": text}, timeout=5).json()
+        second = requests.post(f"{server.url}/api/tokenize", json={"model": "m", "content": text}, timeout=5).json()
+    assert first == second
+    assert len(first["tokens"]) == len(split_tokens(text))
+
+
+def test_parallel_limit_queues_and_rejects():
+    """Test que por encima de parallel se encola y por encima de max_queue se responde 503."""
+    with serve_emulator({"parallel": 1, "max_queue": 0, "ttft_s": 0.3}) as server:
+        first = threading.Thread(target=chat_ollama, args=("s", "u"), kwargs={"model": "m", "base_url": server.url})
+        first.start()
+        while server.stats["in_flight"] == 0:
+            time.sleep(0.01)
+        with pytest.raises(requests.HTTPError):
+            chat_ollama("s", "u", model="m", base_url=server.url)
+        first.join()
+    assert server.stats["rejected"] == 1
+    assert server.stats["max_in_flight"] == 1
+
+
+@pytest.mark.parametrize("fault", ["error", "malformed", "timeout"])
+def test_injected_faults_trigger_failover(routes, fault):
+    """Test que un 5xx, un JSON roto o un cuelgue del modelo principal pasan al fallback."""
+    with serve_emulator({"script": [fault], "responses": {"small": "respuesta del fallback"}, "hang_s": 2}) as server:
+        llm.set_backend(llm.OllamaBackend(base_url=server.url))
+        assert llm.chat("s", "u", call_type="brochure") == "respuesta del fallback"
+    assert server.stats[fault] == 1
+
+
+def test_pipeline_runs_against_emulator(site, tmp_path):
+    """Test que las respuestas por defecto del emulador bastan para un run completo."""
+    _, url = site
+    with serve_emulator({"tokens_per_s": 2000}) as server:
+        llm.set_backend(llm.OllamaBackend(base_url=server.url))
+        result = run_pipeline("ACME", url, output_dir=str(tmp_path / "out"), languages=["en"], force=True)
+    assert result["failed_languages"] == []
+    assert server.stats["requests"] >= 3  # enlaces, folleto y traducción
@@ -0,0 +1,61 @@
+"""
+test_parsing.py - Tests del pool de procesos de parseo HTML (modo batch)
+"""
+import pytest
+
+from .. import compiler, parsing
+from ..benchmarks.micro import make_html
+from ..compiler import Page
+
+
+@pytest.fixture
+def pool():
+    with parsing.process_pool(2) as workers:
+        yield workers
+
+
+def test_large_pages_are_parsed_in_worker_processes(pool, monkeypatch):
+    """Test que las páginas grandes se parsean en el pool con el mismo resultado que en proceso."""
+    htmls = [make_html(parsing.PARSE_INLINE_BYTES * 2, 40, seed=i) for i in range(5)]
+    expected = [Page.from_html(h, f"https://acme.example/p{i}").parse().to_dict() for i, h in enumerate(htmls)]
+    pages = [Page.from_html(h, f"https://acme.example/p{i}") for i, h in enumerate(htmls)]
+
+    def fail(html):
+        raise AssertionError("parsed in process")
+
+    # los procesos del pool no ven este parche: si se parseara aquí fallaría
+    monkeypatch.setattr(compiler, "clean_text", fail)
+    assert parsing.parse_pages(pages) == 5
+    assert all(p.parsed and p.raw_size == 0 for p in pages)
+    assert [p.to_dict() for p in pages] == expected
+
+
+def test_small_pages_stay_in_process(pool):
+    """Test que las páginas pequeñas no pasan por el pool y se parsean al leerlas."""
+    page = Page.from_html("<html><title>ACME</title><p>Hola</p></html>", "https://acme.example/")
+    assert parsing.parse_pages([page]) == 0
+    assert not page.parsed
+    assert page["title"] == "ACME"
+
+
+def test_parse_pages_without_pool_is_a_noop():
+    """Test que sin pool activo (CLI, servicio) el parseo sigue siendo perezoso en proceso."""
+    assert not parsing.is_active()
+    page = Page.from_html(make_html(parsing.PARSE_INLINE_BYTES * 2, 10), "https://acme.example/")
+    assert parsing.parse_pages([page]) == 0
+    assert page.raw_size > 0
+
+
+def test_budgeted_compile_sends_pages_to_the_pool_in_batches(pool, monkeypatch):
+    """Test que con presupuesto y pool activo las páginas descargadas van al pool en lotes, no de una en una."""
+    sent = []
+    monkeypatch.setattr(compiler, "parse_pages", lambda pages: sent.append(len(pages)) or parsing.parse_pages(pages))
+    monkeypatch.setattr(compiler, "fetch_page", lambda url, deadline=None: make_html(4096, 20, seed=len(url)))
+    links = {"links": [{"url": f"https://acme.example/p{i}", "score": 10 - i} for i in range(10)]}
+
+    stats = {}
+    pages = compiler.compile_pages(links, make_html(4096, 20), "https://acme.example/", budget_tokens=1, stats=stats)
+    assert sent[0] == compiler.COMPILE_MIN_PAGES + 1  # landing + mínimo de páginas en un envío
+    assert stats["skipped"] > 0
+    assert all(n > 1 for n in sent if n)
+    assert len(pages) == stats["compiled"] + 1
@@ -0,0 +1,54 @@
+"""
+test_passages.py - Tests para la selección de pasajes del prompt
+"""
+import pytest
+
+from .. import tokens
+from ..passages import select_passages, split_passages
+
+
+@pytest.fixture(autouse=True)
+def local_only(monkeypatch):
+    monkeypatch.setattr(tokens, "_tokenize_available", False)
+
+
+NAV = "\n".join(["Inicio", "Productos", "Blog", "Contacto", "Login"] * 20)
+ABOUT = (
+    "Somos una empresa fundada en 1998 cuya mision es ayudar a las pymes a digitalizarse.\n"
+    "Nuestra vision y valores guian cada proyecto que hacemos con clientes de todo el pais."
+)
+CASES = (
+    "Casos de exito: mas de 200 clientes confian en nosotros y hemos recibido varios premios.\n"
+    "Testimonios de clientes del sector retail y proyectos publicados en prensa."
+)
+
+
+def test_split_passages_drops_navigation_only_blocks():
+    """Test que los bloques solo de menú no generan pasajes."""
+    assert split_passages(NAV) == []
+    assert split_passages(ABOUT, target_chars=50)
+
+
+def test_relevant_late_page_beats_landing_navigation():
+    """Test que una página relevante al final entra aunque la landing sea larga."""
+    pages = [
+        {"type": "home", "url": "https://x.com", "content": NAV + "\n" + "Texto generico de portada sin mas. " * 40},
+        {"type": "blog", "url": "https://x.com/blog", "content": "Entrada de blog sobre recetas y viajes de verano."},
+        {"type": "about", "url": "https://x.com/about", "content": ABOUT},
+        {"type": "customers", "url": "https://x.com/casos", "content": CASES},
+    ]
+    selected = select_passages(pages, max_tokens=120)
+    urls = {p["url"] for p in selected}
+    assert "https://x.com/about" in urls
+    assert "https://x.com/casos" in urls
+    assert sum(tokens.count_tokens(p["text"]) for p in selected) <= 120
+
+
+def test_redundant_passages_are_skipped():
+    """Test que pasajes duplicados en varias páginas solo entran una vez."""
+    pages = [
+        {"type": "about", "url": "https://x.com/a", "content": ABOUT},
+        {"type": "about", "url": "https://x.com/b", "content": ABOUT},
+    ]
+    selected = select_passages(pages, max_tokens=1000)
+    assert len(selected) == 1
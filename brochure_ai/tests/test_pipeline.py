@@ -0,0 +1,289 @@
+"""
+test_pipeline.py - Tests del pipeline completo contra un sitio local (modo mock)
+"""
+import json
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from .. import llm
+from ..pipeline import check_generation_modes, parse_languages, run_pipeline
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+def test_rerun_skips_unchanged_stages(site, tmp_path):
+    """Test que un segundo run sin cambios reutiliza selección, folleto y traducción."""
+    _, url = site
+    out = tmp_path / "out"
+    first = run_pipeline("ACME", url, output_dir=str(out), mock=True, languages=["en"])
+    assert first["skipped"] == []
+    assert (out / "acme_brochure_en.md").exists()
+
+    second = run_pipeline("ACME", url, output_dir=str(out), mock=True, languages=["en"])
+    assert second["skipped"] == ["select", "generate", "translate:en"]
+
+
+def test_changed_page_regenerates_brochure(site, tmp_path):
+    """Test que un cambio en una página regenera el folleto (no la selección)."""
+    root, url = site
+    out = tmp_path / "out"
+    run_pipeline("ACME", url, output_dir=str(out), mock=True, languages=["en"])
+
+    about = root / "about" / "index.html"
+    about.write_text(about.read_text(encoding="utf-8").replace("fundada en 1998", "Nueva mision."), encoding="utf-8")
+    rerun = run_pipeline("ACME", url, output_dir=str(out), mock=True, languages=["en"])
+    assert "select" in rerun["skipped"]
+    assert "generate" not in rerun["skipped"]
+
+
+def test_resume_restarts_from_failed_stage(site, tmp_path, monkeypatch):
+    """Test que tras un fallo en la generación --resume no repite scraping, selección ni compilación."""
+    from .. import pipeline
+
+    _, url = site
+    out, run_dir = tmp_path / "out", tmp_path / "run"
+    real = {name: getattr(pipeline, name) for name in ("generate_brochure", "scrape_and_extract", "compile_pages")}
+
+    def broken(*args, **kwargs):
+        raise TimeoutError("ollama timeout")
+
+    monkeypatch.setattr(pipeline, "generate_brochure", broken)
+    with pytest.raises(TimeoutError):
+        run_pipeline("ACME", url, output_dir=str(out), mock=True, run_dir=str(run_dir))
+    assert (run_dir / "pages.json").exists()
+
+    calls = []
+    monkeypatch.setattr(pipeline, "generate_brochure", real["generate_brochure"])
+    monkeypatch.setattr(pipeline, "scrape_and_extract", lambda *a: calls.append("scrape"))
+    monkeypatch.setattr(pipeline, "compile_pages", lambda *a, **k: calls.append("compile"))
+    result = run_pipeline("ACME", url, output_dir=str(out), mock=True, languages=["en"],
+                          run_dir=str(run_dir), resume=True)
+    assert calls == []
+    assert result["resumed"] == ["scrape", "select", "compile"]
+    assert (out / "acme_brochure_en.md").exists()
+
+    # un run completo no se reanuda: --resume vuelve a empezar
+    for name, fn in real.items():
+        monkeypatch.setattr(pipeline, name, fn)
+    again = run_pipeline("ACME", url, output_dir=str(out), mock=True, run_dir=str(run_dir), resume=True)
+    assert again["resumed"] == []
+
+
+def test_resume_redoes_selection_when_links_model_changes(site, tmp_path, monkeypatch):
+    """Test que --resume no reutiliza una selección hecha con otro modelo de enlaces."""
+    from .. import pipeline
+
+    _, url = site
+    out, run_dir = tmp_path / "out", tmp_path / "run"
+
+    def broken(*args, **kwargs):
+        raise TimeoutError("ollama timeout")
+
+    def select_stage():
+        manifest = json.loads((run_dir / "manifest.json").read_text(encoding="utf-8"))
+        return manifest["stages"]["select"]
+
+    monkeypatch.setattr(pipeline, "generate_brochure", broken)
+    with pytest.raises(TimeoutError):
+        run_pipeline("ACME", url, output_dir=str(out), run_dir=str(run_dir))
+    first = select_stage()
+
+    monkeypatch.setitem(llm.ROUTES, "links", dict(llm.get_route("links"), model="otro-modelo"))
+    with pytest.raises(TimeoutError):
+        run_pipeline("ACME", url, output_dir=str(out), run_dir=str(run_dir), resume=True)
+    assert select_stage()["inputs"]["model"] == "otro-modelo"
+    assert select_stage()["finished_at"] > first["finished_at"]
+
+
+@pytest.mark.parametrize("setting", ["BROCHURE_SECTIONED", "BROCHURE_MAP_REDUCE"])
+def test_mode_from_env_regenerates_brochure(site, tmp_path, monkeypatch, setting):
+    """Test que un modo elegido por variable de entorno cuenta en la huella del folleto."""
+    from .. import brochure
+
+    _, url = site
+    out = tmp_path / "out"
+    run_pipeline("ACME", url, output_dir=str(out))
+
+    monkeypatch.setattr(brochure, setting, True)
+    rerun = run_pipeline("ACME", url, output_dir=str(out))
+    assert "generate" not in rerun["skipped"]
+
+
+def test_compile_budget_follows_mode_from_env(monkeypatch):
+    """Test que el presupuesto de compilación es el del modo resuelto, también por variable de entorno."""
+    from .. import brochure
+    from ..pipeline import new_run
+
+    assert new_run("ACME", "http://x/")["compile_budget"] == brochure.BROCHURE_CONTENT_TOKENS
+    monkeypatch.setattr(brochure, "BROCHURE_MAP_REDUCE", True)
+    assert new_run("ACME", "http://x/")["compile_budget"] is None
+    monkeypatch.setattr(brochure, "BROCHURE_MAP_REDUCE", False)
+    monkeypatch.setattr(brochure, "BROCHURE_SECTIONED", True)
+    run = new_run("ACME", "http://x/")
+    assert run["mode"] == "sectioned"
+    assert run["compile_budget"] == brochure.BROCHURE_SECTION_TOKENS * len(brochure.SECTIONS)
+
+
+def test_resume_recompiles_when_mode_changes(site, tmp_path, monkeypatch):
+    """Test que --resume no reutiliza páginas compiladas con el presupuesto de otro modo."""
+    from .. import brochure, pipeline
+
+    _, url = site
+    out, run_dir = tmp_path / "out", tmp_path / "run"
+
+    def broken(*args, **kwargs):
+        raise TimeoutError("ollama timeout")
+
+    monkeypatch.setattr(pipeline, "generate_brochure", broken)
+    with pytest.raises(TimeoutError):
+        run_pipeline("ACME", url, output_dir=str(out), run_dir=str(run_dir))
+
+    monkeypatch.setattr(brochure, "BROCHURE_MAP_REDUCE", True)
+    with pytest.raises(TimeoutError):
+        run_pipeline("ACME", url, output_dir=str(out), run_dir=str(run_dir), resume=True)
+    manifest = json.loads((run_dir / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["stages"]["compile"]["inputs"] == {"mode": "map_reduce", "budget": None}
+
+
+def test_output_lock_held_from_slug_until_fingerprints(site, tmp_path):
+    """Test que output_lock se pide con el slug tras el scraping y cubre la escritura de ficheros."""
+    from contextlib import contextmanager
+
+    _, url = site
+    out = tmp_path / "out"
+    events = []
+
+    @contextmanager
+    def lock(slug):
+        events.append(("acquire", slug))
+        yield
+        events.append(("release", (out / "acme_fingerprints.json").exists()))
+
+    run_pipeline("ACME", url, output_dir=str(out), mock=True, output_lock=lock)
+    assert events == [("acquire", "acme"), ("release", True)]
+
+
+def test_prefetch_overlaps_link_selection(site, tmp_path, monkeypatch):
+    """Test que las páginas probables se descargan mientras el LLM elige y no se repiten."""
+    from .. import compiler
+
+    _, url = site
+    fetches = []
+    real_fetch = compiler.fetch_page
+
+    def recording_fetch(page_url, *args, **kwargs):
+        fetches.append((page_url, threading.current_thread().name))
+        return real_fetch(page_url, *args, **kwargs)
+
+    monkeypatch.setattr(compiler, "fetch_page", recording_fetch)
+    llm.set_backend(llm.MockBackend(latency={llm.get_route("links")["model"]: 0.3}))
+    run_pipeline("ACME", url, output_dir=str(tmp_path / "out"), force=True)
+
+    urls = [u for u, _ in fetches]
+    assert sorted(urls) == [url + "about/", url + "careers/"]
+    assert all(name.startswith("prefetch") for _, name in fetches)
+
+
+def test_compile_pages_cancels_unused_prefetch(monkeypatch):
+    """Test que compile_pages usa las páginas adelantadas y cancela las que el LLM no eligió."""
+    from concurrent.futures import Future
+
+    from .. import compiler
+
+    monkeypatch.setattr(compiler, "fetch_page", lambda u, **kw: pytest.fail(f"unexpected fetch of {u}"))
+    done, pending = Future(), Future()
+    done.set_result(compiler.Page.from_html("<p>Sobre ACME</p>", "https://acme.example/about"))
+    selected = {"links": [{"type": "about", "url": "https://acme.example/about"}]}
+    pages = compiler.compile_pages(
+        selected, "", "https://acme.example/",
+        prefetched={"https://acme.example/about": done, "https://acme.example/blog": pending},
+    )
+    assert [(p["type"], p["url"], p["content"]) for p in pages] == [("about", "https://acme.example/about", "Sobre ACME")]
+    assert pending.cancelled()
+
+
+def test_compile_pages_stops_when_budget_is_covered(monkeypatch):
+    """Test que con presupuesto se compila por score y no se descargan enlaces sobrantes."""
+    from .. import compiler
+
+    fetched = []
+
+    def fake_fetch(url, deadline=None):
+        fetched.append(url)
+        return f"<html><body><p>{'uno ' * 200}</p></body></html>"
+
+    monkeypatch.setattr(compiler, "fetch_page", fake_fetch)
+    monkeypatch.setattr(compiler, "COMPILE_MIN_PAGES", 1)
+    selected = {"links": [
+        {"type": "blog", "url": "https://acme.example/blog", "score": 50},
+        {"type": "about", "url": "https://acme.example/about", "score": 95},
+        {"type": "careers", "url": "https://acme.example/careers", "score": 80},
+    ]}
+    stats = {}
+    pages = compiler.compile_pages(selected, "", "https://acme.example/", budget_tokens=200, stats=stats)
+
+    assert fetched == ["https://acme.example/about", "https://acme.example/careers"]
+    assert [p["type"] for p in pages] == ["about", "careers"]
+    assert stats["avoided_fetches"] == 1
+    assert stats["skipped"] == 1
+
+
+def test_parse_languages_accepts_lists_and_commas():
+    """Test que ["en,fr"] y ["en", "fr"] son lo mismo y que no hay duplicados."""
+    assert parse_languages(["en,fr"]) == parse_languages(["en", "fr"]) == ["en", "fr"]
+    assert parse_languages(["en", "fr, en", " de ", "fr"]) == ["en", "fr", "de"]
+    assert parse_languages(None) == parse_languages([""]) == []
+
+
+def test_languages_translate_concurrently_and_failures_are_reported(site, tmp_path, monkeypatch):
+    """Test que cada idioma se traduce en su hilo a la vez y que un idioma fallido no tumba el run."""
+    from .. import pipeline
+
+    _, url = site
+    both_running = threading.Barrier(2, timeout=5)
+    threads = {}
+
+    def fake_translate(md, target_lang="en", deadline=None):
+        threads[target_lang] = threading.current_thread().name
+        if target_lang == "fr":
+            raise RuntimeError("modelo caído")
+        both_running.wait()  # en y de tienen que estar en vuelo a la vez
+        return f"[{target_lang}] {md}"
+
+    monkeypatch.setattr(pipeline, "translate_brochure", fake_translate)
+    result = run_pipeline("ACME", url, output_dir=str(tmp_path / "out"), mock=True, languages=["en,fr", "de", "en"])
+
+    assert result["failed_languages"] == ["fr"]
+    assert sorted(threads) == ["de", "en", "fr"]
+    assert threads["en"] != threads["de"] and all(t.startswith("lang") for t in threads.values())
+    assert (tmp_path / "out" / "acme_brochure_en.md").exists()
+    assert (tmp_path / "out" / "acme_brochure_de.md").exists()
+    assert not (tmp_path / "out" / "acme_brochure_fr.md").exists()
+
+
+def test_sectioned_and_map_reduce_are_rejected_together(tmp_path):
+    """Test que pedir a la vez folleto por secciones y map-reduce es un error (pipeline y CLI)."""
+    with pytest.raises(ValueError):
+        run_pipeline("ACME", "http://127.0.0.1:9/", output_dir=str(tmp_path), sectioned=True, map_reduce=True)
+
+    proc = subprocess.run(
+        [sys.executable, "-m", "brochure_ai.cli", "--sectioned", "--map-reduce", "--help"],
+        capture_output=True, text=True,
+    )
+    assert proc.returncode == 2 and "not allowed with" in proc.stderr
+
+
+def test_mode_from_env_conflicts_with_explicit_mode(tmp_path, monkeypatch):
+    """Test que BROCHURE_SECTIONED=true más map_reduce explícito también es un error."""
+    from .. import brochure
+
+    monkeypatch.setattr(brochure, "BROCHURE_SECTIONED", True)
+    with pytest.raises(ValueError):
+        run_pipeline("ACME", "http://127.0.0.1:9/", output_dir=str(tmp_path), map_reduce=True)
+    # la comprobación temprana de batch y servicio también ve la variable
+    with pytest.raises(ValueError):
+        check_generation_modes(None, True)
+    check_generation_modes(False, True)  # un False explícito desactiva la variable
@@ -0,0 +1,83 @@
+"""
+test_service.py - Tests del modo servicio (cola de trabajos HTTP) en modo mock
+"""
+import time
+
+import pytest
+import requests
+
+from ..service import JobQueue
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+def test_submit_status_result(service, site, wait_job):
+    """Test que un trabajo enviado termina y su resultado incluye folleto y traducción."""
+    _, url = site
+    resp = requests.post(f"{service}/jobs", json={"company": "ACME", "url": url, "languages": ["en", "zh_Hant"]})
+    assert resp.status_code == 202
+
+    job_id = resp.json()["id"]
+    assert wait_job(service, job_id)["status"] == "done"
+    result = requests.get(f"{service}/jobs/{job_id}/result").json()
+    assert result["brochure"].startswith("#")
+    assert set(result["translations"]) == {"en", "zh_Hant"}
+
+    health = requests.get(f"{service}/health").json()
+    assert health["jobs"]["done"] == 1
+
+
+def test_bad_requests(service):
+    """Test que las peticiones inválidas devuelven 400/404 sin encolar nada."""
+    assert requests.post(f"{service}/jobs", json={"url": "ftp://x"}).status_code == 400
+    assert requests.post(f"{service}/jobs", json=["http://x/"]).status_code == 400
+    both_modes = {"url": "http://x/", "sectioned": True, "map_reduce": True}
+    assert requests.post(f"{service}/jobs", json=both_modes).status_code == 400
+    for tone in ("sarcástico", ["formal"]):
+        assert requests.post(f"{service}/jobs", json={"url": "http://x/", "tone": tone}).status_code == 400
+    for langs in (["../../etc"], ["en,fr/x"], [3]):
+        resp = requests.post(f"{service}/jobs", json={"url": "http://x/", "languages": langs})
+        assert resp.status_code == 400
+    assert requests.get(f"{service}/jobs/nope").status_code == 404
+    assert requests.get(f"{service}/health").json()["jobs"]["queued"] == 0
+
+
+def test_priority_order(tmp_path, monkeypatch):
+    """Test que con un solo trabajador se ejecuta antes el de menor priority."""
+    order = []
+    monkeypatch.setattr(
+        "brochure_ai.service.run_pipeline",
+        lambda company, url, **kw: order.append(company) or {"skipped": []},
+    )
+    jobs = JobQueue(workers=1, output_dir=str(tmp_path), mock=True)
+    params = {"url": "http://x/", "tone": "formal", "languages": [], "export_html": False,
+              "mock": True, "sectioned": None, "map_reduce": None, "force": False}
+    for company, priority in (("baja", 9), ("alta", 1), ("media", 5)):
+        jobs.submit(dict(params, company=company), priority)
+    jobs.start()
+    jobs.stop()
+    assert order == ["alta", "media", "baja"]
+
+
+def test_jobs_with_same_output_slug_do_not_overlap(tmp_path, monkeypatch):
+    """Test que dos URLs con el mismo slug de salida no escriben a la vez y que el lock se libera."""
+    active, overlaps = [], []
+
+    def fake_run(company, url, output_lock=None, **kw):
+        with output_lock("acme"):
+            active.append(url)
+            overlaps.append(len(active))
+            time.sleep(0.05)
+            active.remove(url)
+        return {"skipped": []}
+
+    monkeypatch.setattr("brochure_ai.service.run_pipeline", fake_run)
+    jobs = JobQueue(workers=2, output_dir=str(tmp_path), mock=True)
+    params = {"company": "ACME", "tone": "formal", "languages": [], "export_html": False,
+              "mock": True, "sectioned": None, "map_reduce": None, "force": False}
+    for url in ("http://acme.example/", "https://www.acme.example/"):
+        jobs.submit(dict(params, url=url))
+    jobs.start()
+    jobs.stop()
+    assert overlaps == [1, 1]
+    assert jobs._slug_locks == {}
@@ -0,0 +1,49 @@
+"""
+test_startup.py - Presupuesto de tiempo de arranque de la CLI (python -X importtime)
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+# Milisegundos de imports permitidos para `cli --help` (sin contar site)
+STARTUP_BUDGET_MS = float(os.getenv("CLI_IMPORT_BUDGET_MS", "100"))
+HEAVY = {"bs4", "requests", "numpy", "markdown", "brochure_ai.pipeline"}
+
+
+def _importtime(*args):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            # indentación = profundidad; solo nos interesan los imports de primer nivel
+            modules[name.strip()] = (int(cumulative), len(name) - len(name.lstrip()) == 1)
+    return proc, modules
+
+
+def test_cli_help_skips_heavy_imports_and_fits_budget():
+    """Test que --help no carga dependencias pesadas y cabe en el presupuesto."""
+    proc, modules = _importtime("-m", "brochure_ai.cli", "--help")
+    assert "--company" in proc.stdout
+    assert not HEAVY & set(modules)
+
+    total_ms = sum(us for name, (us, top) in modules.items() if top and name != "site") / 1000
+    assert total_ms < STARTUP_BUDGET_MS, f"cli --help imports took {total_ms:.1f} ms"
+
+
+def test_pipeline_import_defers_parsers():
+    """Test que importar el pipeline no carga bs4 ni numpy hasta usarlos."""
+    _, modules = _importtime("-c", "import brochure_ai.pipeline")
+    assert "bs4" not in modules
+    assert "numpy" not in modules
@@ -0,0 +1,43 @@
+"""
+test_summarizer.py - Tests para el resumen extractivo de páginas
+"""
+from .. import summarizer
+from ..summarizer import page_summary, split_sentences, summarize_text
+
+NAV = "\n".join(["Inicio", "Productos", "Servicios", "Blog", "Contacto"] * 10)
+BODY = (
+    "Acme es una consultora tecnológica fundada en 1998 que ayuda a las pymes a digitalizarse. "
+    "La consultora Acme ofrece servicios de digitalización, cloud y analítica para pymes. "
+    "El equipo de Acme trabaja con pymes de retail, industria y banca en toda España. "
+    "Hoy hace sol y el café de la oficina es bastante bueno, según algunos compañeros. "
+    "Acme ha completado más de 300 proyectos de digitalización para pymes y grandes cuentas."
+)
+
+
+def test_split_sentences_skips_navigation():
+    """Test que las líneas de menú no se toman como frases."""
+    assert split_sentences(NAV) == []
+    assert len(split_sentences(BODY)) == 5
+
+
+def test_summary_is_bounded_and_skips_off_topic():
+    """Test que el resumen respeta el máximo y elige frases centrales en orden."""
+    out = summarize_text(NAV + "\n" + BODY, max_chars=260)
+    assert 0 < len(out) <= 260
+    assert "Inicio" not in out
+    assert "café" not in out
+
+
+def test_python_fallback_matches_numpy(monkeypatch):
+    """Test que sin NumPy se eligen las mismas frases."""
+    with_numpy = summarize_text(BODY, max_chars=260)
+    monkeypatch.setattr(summarizer, "_NUMPY", None)
+    assert summarize_text(BODY, max_chars=260) == with_numpy
+
+
+def test_page_summary_prepends_description():
+    """Test que la meta description va delante y el contenido sin frases se recorta."""
+    out = page_summary("Consultora para pymes.", BODY, max_chars=200)
+    assert out.startswith("Consultora para pymes. ")
+    assert len(out) <= 200
+    assert page_summary("", NAV, max_chars=30) == NAV[:30]
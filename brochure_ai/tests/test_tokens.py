@@ -0,0 +1,83 @@
+"""
+test_tokens.py - Tests para conteo de tokens y dimensionado de contexto
+"""
+import pytest
+
+from .. import tokens
+
+
+@pytest.fixture(autouse=True)
+def local_only(monkeypatch):
+    """Fuerza la estimación local (sin Ollama)."""
+    monkeypatch.setattr(tokens, "_tokenize_available", False)
+
+
+def test_local_estimate_counts_punctuation_and_long_words():
+    """Test que la estimación local parte palabras largas y cuenta signos."""
+    assert tokens.estimate_tokens_local("") == 0
+    assert tokens.estimate_tokens_local("Hola, mundo.") == 4
+    assert tokens.estimate_tokens_local("internacionalización") > 1
+
+
+def test_pack_to_budget_never_exceeds_budget():
+    """Test que el empaquetado respeta el presupuesto exacto."""
+    chunks = ["uno dos tres " * 50, "cuatro cinco " * 50, "seis " * 50]
+    packed = tokens.pack_to_budget(chunks, 200)
+    assert packed[0] == chunks[0]
+    assert len(packed) == 2 and packed[1] != chunks[1]
+    assert sum(tokens.count_tokens(c) for c in packed) <= 200
+
+
+def test_context_options_keeps_the_model_num_ctx():
+    """Test que num_ctx no cambia con el tamaño del prompt y se redondea a un tamaño fijo."""
+    assert tokens.context_options(1000, 500, 4096) == {"num_ctx": 4096, "num_predict": 500}
+    assert tokens.context_options(100, 50)["num_ctx"] == tokens.OLLAMA_MAX_CTX
+    assert tokens.ctx_bucket(3000) == 4096
+
+
+class _FakeTokenize:
+    """Sustituye a requests.post: 2 tokens por palabra, o error si down."""
+
+    def __init__(self):
+        self.calls = 0
+        self.down = False
+
+    def __call__(self, url, json=None, timeout=None):
+        self.calls += 1
+        if self.down:
+            raise tokens.requests.ConnectionError("down")
+        return _FakeResponse({"tokens": [0] * (2 * len(json["content"].split()))})
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+def test_remote_tokenize_once_per_truncation_and_retry_after_failure(monkeypatch):
+    """Test que recortar cuesta un /api/tokenize, empaquetar ninguno y un fallo no lo desactiva para siempre."""
+    fake = _FakeTokenize()
+    monkeypatch.setattr(tokens.requests, "post", fake)
+    monkeypatch.setattr(tokens, "_tokenize_available", True)
+    monkeypatch.setattr(tokens, "_tokenize_retry_at", 0.0)
+    monkeypatch.setattr(tokens, "_ratios", {})
+    text = " ".join(["casa"] * 400)  # 1 token por palabra en la estimación local
+
+    cut = tokens.truncate_to_tokens(text, 100, "m")
+    assert fake.calls == 1
+    assert 80 <= 2 * len(cut.split()) <= 100  # recorte con la proporción real (2 tokens/palabra)
+
+    tokens.pack_to_budget(text.split(" ")[:50], 40, "m")
+    assert fake.calls == 1
+
+    fake.down = True
+    assert tokens.count_tokens("otro texto", "m") == tokens.estimate_tokens_local("otro texto")
+    fake.down = False
+    monkeypatch.setattr(tokens, "_tokenize_retry_at", 0.0)  # cooldown cumplido
+    assert tokens.count_tokens("y otro más", "m") == 6
@@ -0,0 +1,63 @@
+"""
+test_tracing.py - Tests de las trazas por etapa y por URL
+"""
+import json
+
+import pytest
+
+from .. import tracing
+from ..pipeline import run_pipeline
+
+pytestmark = pytest.mark.usefixtures("offline")
+
+
+@pytest.fixture
+def traced():
+    tracing.reset()
+    tracing.enable(profile_cpu=True)
+    yield
+    tracing.disable()
+    tracing.reset()
+
+
+def test_disabled_span_records_nothing():
+    """Test que sin activar las trazas no se apunta nada."""
+    tracing.reset()
+    with tracing.span("x"):
+        pass
+    assert tracing.get_events() == []
+
+
+def test_pipeline_trace_has_stages_and_url_breakdown(traced, site, tmp_path):
+    """Test que la traza incluye cada etapa y dns/ttfb/download/parse por URL."""
+    _, url = site
+    run_pipeline("ACME", url, output_dir=str(tmp_path / "out"), mock=True, languages=["en"])
+
+    events = tracing.get_events()
+    stages = {e["name"] for e in events if e["cat"] == "stage"}
+    assert stages == {"scrape", "select", "compile", "generate", "translate"}
+    downloads = [e for e in events if e["name"] == "download"]
+    assert {e["args"]["url"] for e in downloads} >= {url}
+    assert all(e["args"]["bytes"] > 0 for e in downloads)
+    for name in ("dns", "connect+ttfb", "parse"):
+        assert any(e["name"] == name for e in events)
+
+    path = tracing.write_chrome_trace(str(tmp_path / "trace.json"))
+    data = json.loads(open(path, encoding="utf-8").read())
+    assert any(e["ph"] == "X" for e in data["traceEvents"])
+    assert "scrape" in tracing.summary_table()
+    assert tracing.dump_cpu_profile(str(tmp_path / "cpu.prof"))
+
+
+def test_failed_span_keeps_error():
+    """Test que un bloque que falla queda en la traza con su error."""
+    tracing.reset()
+    tracing.enable()
+    try:
+        with pytest.raises(ValueError):
+            with tracing.span("boom"):
+                raise ValueError("x")
+        assert tracing.get_events()[0]["args"]["error"] == "ValueError"
+    finally:
+        tracing.disable()
+        tracing.reset()
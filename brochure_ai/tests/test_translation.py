@@ -0,0 +1,89 @@
+"""
+test_translation.py - Tests de traducción por segmentos y memoria de traducción
+"""
+import pytest
+
+from .. import cache, llm, tokens
+from ..translation import join_segments, segment_markdown, translate_markdown
+
+BROCHURE = """# ACME – Folleto Corporativo
+
+## Resumen Ejecutivo
+
+ACME ayuda a las pymes.
+Desde 1998.
+
+- **Consultoría** estratégica
+- Implementación
+1. Paso uno
+
+---
+https://acme.com
+"""
+
+
+class _UpperBackend(llm.MockBackend):
+    name = "upper"
+    cacheable = True
+
+    def chat(self, system_prompt, user_prompt, model, call_type="chat", timeout=None, options=None):
+        self.calls.append(user_prompt)
+        return user_prompt.rsplit("\n\n", 1)[-1].upper()
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    monkeypatch.setattr(tokens, "_tokenize_available", False)
+    monkeypatch.setattr(cache, "BROCHURE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache, "_CACHES", {})
+    b = _UpperBackend()
+    llm.set_backend(b)
+    yield b
+    llm.set_backend(None)
+
+
+def test_segmentation_round_trips_markdown():
+    """Test que segmentar y volver a unir reconstruye el Markdown."""
+    segments = segment_markdown(BROCHURE)
+    assert join_segments(segments) == BROCHURE.rstrip("\n")
+    kinds = [s["kind"] for s in segments if s["translate"]]
+    assert kinds == ["heading", "heading", "paragraph", "bullet", "bullet", "bullet"]
+
+
+def test_translation_keeps_structure_and_reuses_memory(backend):
+    """Test que se conserva la sintaxis y la segunda vez no se llama al LLM."""
+    out = translate_markdown(BROCHURE, "en")
+    assert "## RESUMEN EJECUTIVO" in out
+    assert "- **CONSULTORÍA** ESTRATÉGICA" in out
+    assert "---\nhttps://acme.com" in out
+    first_calls = len(backend.calls)
+    assert first_calls == 6
+
+    assert translate_markdown(BROCHURE, "en") == out
+    assert len(backend.calls) == first_calls
+
+    translate_markdown(BROCHURE, "fr")
+    assert len(backend.calls) == 2 * first_calls
+
+
+def test_mock_translation_returns_fragment_and_is_not_persisted(backend):
+    """Test que el mock traduce solo el fragmento y que sus respuestas no entran en la memoria."""
+    mock = llm.MockBackend()
+    llm.set_backend(mock)
+    out = translate_markdown(BROCHURE, "en")
+    assert out == BROCHURE.rstrip("\n")
+    translate_markdown(BROCHURE, "en")
+    assert len(mock.calls) == 12
+
+
+def test_failover_translation_is_keyed_by_fallback_model(backend, monkeypatch):
+    """Test que lo traducido por el modelo de reserva no se sirve después como traducción del principal."""
+    route = dict(llm.get_route("translate"), fallback="small")
+    monkeypatch.setitem(llm.ROUTES, "translate", route)
+    monkeypatch.setattr(llm, "_FAILOVER_UNTIL", {"translate": float("inf")})
+    translate_markdown(BROCHURE, "en")
+    served_by_fallback = len(backend.calls)
+
+    monkeypatch.setattr(llm, "_FAILOVER_UNTIL", {})
+    translate_markdown(BROCHURE, "en")
+    assert len(backend.calls) == 2 * served_by_fallback
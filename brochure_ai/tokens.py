@@ -0,0 +1,230 @@
+"""
+Conteo de tokens y dimensionado del contexto de cada llamada LLM.
+
+- count_tokens usa el tokenizer real del modelo vía /api/tokenize de Ollama y,
+  si no está disponible, una estimación local (cacheada) más fina que 4 chars/token.
+  /api/tokenize no es parte de la API estándar: si falla se vuelve a probar
+  pasados OLLAMA_TOKENIZE_RETRY segundos.
+- estimate_tokens cuenta en local, corregido con la proporción real/local
+  medida en los conteos remotos del modelo: es lo que usan pack_to_budget,
+  truncate_to_tokens y la selección de pasajes, que cuentan muchos trozos
+  (como mucho un /api/tokenize por texto a recortar).
+- context_options fija num_ctx (uno por modelo y run) y num_predict por llamada.
+"""
+import os
+import re
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import requests
+
+from .llm_ollama import OLLAMA_MODEL, OLLAMA_URL
+
+logger = logging.getLogger(__name__)
+
+# auto: usa /api/tokenize si responde; false: solo estimación local
+OLLAMA_TOKENIZE = os.getenv("OLLAMA_TOKENIZE", "auto").lower()
+# Segundos sin volver a llamar a /api/tokenize tras un fallo
+OLLAMA_TOKENIZE_RETRY = float(os.getenv("OLLAMA_TOKENIZE_RETRY", "300"))
+# Contexto máximo que permitimos pedir a Ollama
+OLLAMA_MAX_CTX = int(os.getenv("OLLAMA_MAX_CTX", "8192"))
+# Ollama recarga el runner cada vez que cambia num_ctx: cada modelo usa un
+# único num_ctx en todo el run (el mayor de sus rutas, llm.model_num_ctx),
+# redondeado a uno de estos tamaños, y el warm-up lo carga ya con ese valor.
+CTX_BUCKETS = (2048, 4096, 8192, 16384, 32768, 65536, 131072)
+# Margen para la plantilla de chat del modelo y tokens especiales
+CTX_MARGIN = 64
+
+_CACHE_SIZE = 4096
+_cache: "OrderedDict[tuple, int]" = OrderedDict()
+_cache_lock = threading.Lock()
+_tokenize_available = (
+    OLLAMA_TOKENIZE != "false"
+    and os.getenv("LLM_BACKEND", "ollama").lower() == "ollama"
+)
+# instante (monotonic) hasta el que no se llama a /api/tokenize tras un fallo (bajo _cache_lock)
+_tokenize_retry_at = 0.0
+# modelo -> tokens reales / estimación local (de los conteos remotos)
+_ratios: Dict[str, float] = {}
+# Textos más cortos no se usan para calibrar la proporción (demasiado ruido)
+_RATIO_MIN_TOKENS = 32
+
+# palabras, números y signos sueltos
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens_local(text: str) -> int:
+    """
+    Estimación local sin modelo:
+    - cada signo de puntuación cuenta como un token
+    - las palabras largas se parten en trozos de ~5 caracteres (como hace BPE)
+    """
+    if not text:
+        return 0
+    total = 0
+    for w in _WORD_RE.findall(text):
+        total += 1 + (len(w) - 1) // 5
+    return total
+
+
+def _tokenize_remote(text: str, model: str) -> Optional[int]:
+    global _tokenize_retry_at
+    if not _tokenize_available:
+        return None
+    with _cache_lock:
+        if time.monotonic() < _tokenize_retry_at:
+            return None
+    try:
+        resp = requests.post(
+            f"{OLLAMA_URL}/api/tokenize",
+            json={"model": model, "content": text},
+            timeout=10,
+        )
+        resp.raise_for_status()
+        n = len(resp.json()["tokens"])
+    except Exception as e:
+        with _cache_lock:
+            _tokenize_retry_at = time.monotonic() + OLLAMA_TOKENIZE_RETRY
+        logger.info(
+            "Ollama /api/tokenize no disponible (%s); estimación local durante %.0fs", e, OLLAMA_TOKENIZE_RETRY
+        )
+        return None
+    local = estimate_tokens_local(text)
+    if local >= _RATIO_MIN_TOKENS:
+        with _cache_lock:
+            _ratios[model] = n / local
+    return n
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Tokens de text sin llamar a Ollama: estimación local corregida con la
+    proporción real/local del modelo (1.0 si aún no hay conteos remotos).
+    """
+    if not text:
+        return 0
+    with _cache_lock:
+        ratio = _ratios.get(model or OLLAMA_MODEL, 1.0)
+    return math.ceil(estimate_tokens_local(text) * ratio)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Número de tokens de text para el modelo indicado (cacheado por hash).
+    """
+    if not text:
+        return 0
+    model = model or OLLAMA_MODEL
+    key = (model, hashlib.sha1(text.encode("utf-8")).digest())
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    n = _tokenize_remote(text, model)
+    if n is None:
+        n = estimate_tokens_local(text)
+
+    with _cache_lock:
+        _cache[key] = n
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return n
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    Recorta text para que no supere max_tokens.
+    Cuenta el texto entero una vez (remoto si se puede) y busca el corte por
+    bisección sobre caracteres con estimate_tokens, cortando en un espacio.
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    lo, hi = 0, len(text)
+    while hi - lo > 16:
+        mid = (lo + hi) // 2
+        if estimate_tokens(text[:mid], model) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid
+    cut = text[:lo]
+    space = cut.rfind(" ")
+    return cut[:space] if space > len(cut) // 2 else cut
+
+
+def pack_to_budget(
+    chunks: List[str],
+    max_tokens: int,
+    model: Optional[str] = None,
+    sep: str = "\n\n",
+) -> List[str]:
+    """
+    Añade chunks en orden hasta llenar max_tokens; el último se recorta.
+    Cuenta con estimate_tokens (sin una llamada a Ollama por chunk).
+    """
+    out: List[str] = []
+    used = 0
+    sep_tokens = estimate_tokens(sep, model) if sep.strip() else 0
+    for chunk in chunks:
+        cost = estimate_tokens(chunk, model) + (sep_tokens if out else 0)
+        if used + cost <= max_tokens:
+            out.append(chunk)
+            used += cost
+            continue
+        remaining = max_tokens - used - (sep_tokens if out else 0)
+        if remaining > 0:
+            tail = truncate_to_tokens(chunk, remaining, model)
+            if tail:
+                out.append(tail)
+        break
+    return out
+
+
+def ctx_bucket(needed: int) -> int:
+    """
+    Tamaño fijo de contexto más pequeño que cubre needed (como mucho OLLAMA_MAX_CTX).
+    """
+    for size in CTX_BUCKETS:
+        if size >= needed:
+            return min(size, OLLAMA_MAX_CTX)
+    return OLLAMA_MAX_CTX
+
+
+def prompt_budget(
+    fixed_text: str,
+    max_output_tokens: int,
+    model: Optional[str] = None,
+    num_ctx: Optional[int] = None,
+) -> int:
+    """
+    Tokens disponibles para contenido variable dentro de num_ctx (por defecto
+    OLLAMA_MAX_CTX), descontando la parte fija del prompt y la salida reservada.
+    """
+    used = count_tokens(fixed_text, model) + max_output_tokens + CTX_MARGIN
+    return max(0, (num_ctx or OLLAMA_MAX_CTX) - used)
+
+
+def context_options(prompt_tokens: int, max_output_tokens: int, num_ctx: Optional[int] = None) -> Dict[str, int]:
+    """
+    Opciones de Ollama para una llamada: num_ctx es el del modelo en todo el
+    run (por defecto OLLAMA_MAX_CTX), para que Ollama no recargue el runner;
+    num_predict limita la salida de esta llamada.
+    """
+    num_ctx = num_ctx or OLLAMA_MAX_CTX
+    needed = prompt_tokens + max_output_tokens + CTX_MARGIN
+    if needed > num_ctx:
+        logger.warning(
+            "Prompt de %d tokens + %d de salida no cabe en num_ctx=%d",
+            prompt_tokens,
+            max_output_tokens,
+            num_ctx,
+        )
+    return {"num_ctx": num_ctx, "num_predict": max_output_tokens}
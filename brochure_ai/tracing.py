@@ -0,0 +1,187 @@
+"""
+Trazas ligeras por etapa (formato Chrome trace) y perfil opcional de CPU.
+
+- span(name, cat, **args) mide un bloque y lo apunta como evento "X" con el
+  hilo en el que corre; desactivado (por defecto) no registra nada.
+- write_chrome_trace(path) genera un JSON que abren chrome://tracing y
+  https://ui.perfetto.dev; summary_table() agrega por nombre para la consola.
+- cpu_profile() envuelve las partes CPU-bound (parseo HTML, resúmenes) con
+  cProfile cuando se activa con enable(profile_cpu=True); dump_cpu_profile()
+  las junta en un único fichero .prof (pstats/snakeviz).
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_ENABLED = False
+_PROFILE_CPU = False
+_EVENTS: List[Dict[str, Any]] = []
+_PROFILES: List[Any] = []
+_LOCK = threading.Lock()
+# cProfile no admite dos perfiles activos a la vez: el bloque que no lo consigue
+# se ejecuta sin perfilar
+_PROFILE_SLOT = threading.Lock()
+_T0 = time.perf_counter()
+
+
+def enable(profile_cpu: bool = False) -> None:
+    global _ENABLED, _PROFILE_CPU
+    _ENABLED = True
+    _PROFILE_CPU = profile_cpu
+
+
+def disable() -> None:
+    global _ENABLED, _PROFILE_CPU
+    _ENABLED = False
+    _PROFILE_CPU = False
+
+
+def is_enabled() -> bool:
+    return _ENABLED
+
+
+def reset() -> None:
+    with _LOCK:
+        _EVENTS.clear()
+        _PROFILES.clear()
+
+
+def get_events() -> List[Dict[str, Any]]:
+    with _LOCK:
+        return list(_EVENTS)
+
+
+def _us(t: float) -> int:
+    return int((t - _T0) * 1_000_000)
+
+
+def add_span(name: str, start: float, end: float, cat: str = "stage", **args: Any) -> None:
+    """
+    Apunta un span ya medido (instantes de time.perf_counter()).
+    """
+    if not _ENABLED:
+        return
+    event = {
+        "name": name,
+        "cat": cat,
+        "ph": "X",
+        "ts": _us(start),
+        "dur": max(0, _us(end) - _us(start)),
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": args,
+    }
+    with _LOCK:
+        _EVENTS.append(event)
+
+
+@contextmanager
+def span(name: str, cat: str = "stage", **args: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Mide el bloque. El dict devuelto admite args extra descubiertos dentro
+    (bytes descargados, tokens...). Si el bloque falla se anota el error.
+    """
+    if not _ENABLED:
+        yield args
+        return
+    start = time.perf_counter()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        add_span(name, start, time.perf_counter(), cat, **args)
+
+
+@contextmanager
+def cpu_profile() -> Iterator[None]:
+    if not (_ENABLED and _PROFILE_CPU) or not _PROFILE_SLOT.acquire(blocking=False):
+        yield
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+    finally:
+        _PROFILE_SLOT.release()
+    with _LOCK:
+        _PROFILES.append(profiler)
+
+
+def dump_cpu_profile(path: str) -> Optional[str]:
+    """
+    Escribe los perfiles acumulados en path (formato pstats). None si no hay.
+    """
+    with _LOCK:
+        profiles = list(_PROFILES)
+    if not profiles:
+        return None
+    import pstats
+
+    stats = pstats.Stats(profiles[0])
+    for p in profiles[1:]:
+        stats.add(p)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    stats.dump_stats(path)
+    return path
+
+
+def write_chrome_trace(path: str, events: Optional[List[Dict[str, Any]]] = None) -> str:
+    events = get_events() if events is None else events
+    names = {}
+    for e in events:
+        names.setdefault(e["tid"], f"thread-{len(names)}")
+    meta = [
+        {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": n}}
+        for tid, n in names.items()
+    ]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return path
+
+
+def summarize(events: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Agrega los spans por (categoría, nombre): llamadas, total, media y máximo en ms.
+    """
+    events = get_events() if events is None else events
+    groups: Dict[tuple, List[int]] = defaultdict(list)
+    for e in events:
+        groups[(e["cat"], e["name"])].append(e["dur"])
+    rows = [
+        {
+            "cat": cat,
+            "name": name,
+            "calls": len(durs),
+            "total_ms": sum(durs) / 1000,
+            "mean_ms": sum(durs) / len(durs) / 1000,
+            "max_ms": max(durs) / 1000,
+        }
+        for (cat, name), durs in groups.items()
+    ]
+    return sorted(rows, key=lambda r: (r["cat"] != "stage", -r["total_ms"]))
+
+
+def summary_table(events: Optional[List[Dict[str, Any]]] = None) -> str:
+    rows = summarize(events)
+    lines = [f"{'cat':<8} {'span':<22} {'calls':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+    for r in rows:
+        lines.append(
+            f"{r['cat']:<8} {r['name'][:22]:<22} {r['calls']:>6} "
+            f"{r['total_ms']:>10.1f} {r['mean_ms']:>9.1f} {r['max_ms']:>9.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,189 @@
+"""
+Traducción del folleto por segmentos Markdown con memoria de traducción.
+
+- El folleto se trocea en encabezados, párrafos y bullets; la sintaxis Markdown
+  (prefijos #, -, 1.) se conserva fuera del texto que ve el modelo.
+- Cada segmento se busca en la memoria de traducción, clave
+  (hash del segmento, idioma destino, backend, modelo); solo los que faltan
+  van al LLM, en paralelo. Se guardan con el modelo que respondió de verdad
+  (el de reserva tras un failover) y nunca las del backend mock.
+"""
+import os
+import re
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import get_cache
+from .deadline import Deadline, DeadlineExceeded, expired
+from .llm import chat, get_backend, get_route
+from .tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_WORKERS = int(os.getenv("TRANSLATION_WORKERS", "4"))
+
+_HEADING_RE = re.compile(r"^(\s*#{1,6}\s+)(.*)$")
+_BULLET_RE = re.compile(r"^(\s*(?:[-*+•]|\d+[.)])\s+)(.*)$")
+_QUOTE_RE = re.compile(r"^(\s*>\s*)(.*)$")
+_RULE_RE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+
+def _segment(prefix: str, text: str, kind: str) -> Dict[str, Any]:
+    # sin letras (urls sueltas, números, separadores) no hay nada que traducir
+    translate = bool(re.search(r"[^\W\d_]", re.sub(r"https?://\S+", "", text)))
+    return {"prefix": prefix, "text": text, "kind": kind, "translate": translate}
+
+
+def segment_markdown(md: str) -> List[Dict[str, Any]]:
+    """
+    Divide el Markdown en segmentos {prefix, text, kind, translate}.
+    Unir prefix + text de todos los segmentos con "\\n" reconstruye el original
+    (los párrafos multilínea son un único segmento).
+    """
+    segments: List[Dict[str, Any]] = []
+    paragraph: List[str] = []
+    in_fence = False
+
+    def flush():
+        if paragraph:
+            segments.append(_segment("", "\n".join(paragraph), "paragraph"))
+            paragraph.clear()
+
+    for line in (md or "").splitlines():
+        if _FENCE_RE.match(line):
+            flush()
+            in_fence = not in_fence
+            segments.append({"prefix": line, "text": "", "kind": "raw", "translate": False})
+            continue
+        if in_fence or not line.strip() or _RULE_RE.match(line):
+            flush()
+            segments.append({"prefix": line, "text": "", "kind": "raw", "translate": False})
+            continue
+        for regex, kind in ((_HEADING_RE, "heading"), (_BULLET_RE, "bullet"), (_QUOTE_RE, "quote")):
+            m = regex.match(line)
+            if m:
+                flush()
+                segments.append(_segment(m.group(1), m.group(2), kind))
+                break
+        else:
+            paragraph.append(line)
+    flush()
+    return segments
+
+
+def join_segments(segments: List[Dict[str, Any]]) -> str:
+    return "\n".join(s["prefix"] + s["text"] for s in segments)
+
+
+def _tm_key(text: str, target_lang: str, backend: str, model: str) -> str:
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{backend}|{model}|{target_lang.lower()}|{digest}"
+
+
+def _clean_output(raw: str, segment: Dict[str, Any]) -> str:
+    out = (raw or "").strip()
+    # vallas de código o comillas que algunos modelos añaden
+    out = re.sub(r"^```\w*\s*|\s*```$", "", out).strip()
+    if len(out) > 1 and out[0] == out[-1] and out[0] in "\"'«»":
+        out = out[1:-1].strip()
+    # si el modelo repite la sintaxis del segmento, la quitamos (ya está en prefix)
+    if segment["kind"] == "heading":
+        out = re.sub(r"^#{1,6}\s+", "", out)
+    elif segment["kind"] == "bullet":
+        out = re.sub(r"^(?:[-*+•]|\d+[.)])\s+", "", out)
+    if segment["kind"] != "paragraph":
+        out = " ".join(out.splitlines())
+    return out
+
+
+def _translate_segment(
+    segment: Dict[str, Any], target_lang: str, deadline: Optional[Deadline] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    (traducción, quién respondió según llm.chat(served=...)).
+    """
+    system_prompt = (
+        "You are a professional translator. "
+        "You ALWAYS respond only in the target language, never in the source language. "
+        "Keep inline Markdown (bold, italics, links, code) exactly as in the source."
+    )
+    user_prompt = (
+        f"Target language: {target_lang}\n"
+        f"Fragment type: {segment['kind']} of a corporate brochure\n\n"
+        "Translate the fragment below. Output ONLY the translation, "
+        "without quotes, explanations or extra Markdown.\n\n"
+        f"{segment['text']}"
+    )
+    model = get_route("translate")["model"]
+    max_output = int(count_tokens(segment["text"], model) * 1.5) + 32
+    served: Dict[str, Any] = {}
+    raw = chat(
+        system_prompt, user_prompt, call_type="translate", max_output_tokens=max_output,
+        deadline=deadline, served=served,
+    )
+    return _clean_output(raw, segment), served
+
+
+def translate_markdown(md: str, target_lang: str = "en", deadline: Optional[Deadline] = None) -> str:
+    """
+    Traduce el Markdown segmento a segmento reutilizando la memoria de traducción.
+    Si el deadline del run corta segmentos lanza DeadlineExceeded (lo traducido
+    queda en la memoria para el próximo run).
+    """
+    segments = segment_markdown(md)
+    model = get_route("translate")["model"]
+    backend = get_backend().name
+    tm = get_cache("translation_memory")
+
+    todo = [s for s in segments if s["translate"]]
+    keys = {id(s): _tm_key(s["text"], target_lang, backend, model) for s in todo}
+    known = tm.get_many(keys.values())
+
+    # segmentos distintos que faltan en la memoria (los repetidos se traducen una vez)
+    pending: Dict[str, Dict[str, Any]] = {}
+    for s in todo:
+        k = keys[id(s)]
+        if k not in known:
+            pending.setdefault(k, s)
+
+    logger.info(
+        "Translation %s: %d segmentos, %d en memoria, %d al LLM",
+        target_lang,
+        len(todo),
+        len(todo) - sum(1 for s in todo if keys[id(s)] in pending),
+        len(pending),
+    )
+
+    if pending:
+        workers = max(1, min(TRANSLATION_WORKERS, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate") as pool:
+            futures = {k: pool.submit(_translate_segment, s, target_lang, deadline) for k, s in pending.items()}
+            fresh = {}
+            # se guarda con la clave de quien respondió: lo que traduce el modelo
+            # de reserva no se sirve luego como traducción del principal, y las
+            # respuestas del mock no se guardan
+            to_store = {}
+            for k, fut in futures.items():
+                try:
+                    out, served = fut.result()
+                except Exception as e:
+                    logger.warning("Segmento sin traducir (%s): %s", e, pending[k]["text"][:60])
+                    continue
+                if out:
+                    fresh[k] = out
+                    if served.get("cacheable"):
+                        key = _tm_key(pending[k]["text"], target_lang, served["backend"], served["model"])
+                        to_store[key] = out
+        tm.set_many(to_store.items())
+        known.update(fresh)
+        if len(fresh) < len(pending) and expired(deadline):
+            raise DeadlineExceeded(
+                f"translation {target_lang}: {len(pending) - len(fresh)} segments left at the run deadline"
+            )
+
+    for s in todo:
+        s["text"] = known.get(keys[id(s)], s["text"])
+    return join_segments(segments)
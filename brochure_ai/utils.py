@@ -5,6 +5,8 @@ from typing import Optional
 from urllib.parse import urlparse
 import requests
 
+from .tokens import count_tokens, truncate_to_tokens
+
 logger = logging.getLogger(__name__)
 
 
@@ -53,36 +55,37 @@ def check_robots_txt(base_url: str, user_agent: str = "BrochureAI") -> Optional[
         return None
 
 
-def estimate_tokens(text: str) -> int:
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
     """
-    Estima el número de tokens en un texto (aproximado).
+    Estima el número de tokens en un texto.
 
     Args:
         text: Texto a estimar
+        model: Modelo cuyo tokenizer se usa (por defecto OLLAMA_MODEL)
 
     Returns:
-        Número estimado de tokens
+        Número de tokens (exacto si Ollama expone /api/tokenize)
     """
-    # Aproximación: ~4 caracteres por token
-    return len(text) // 4
+    return count_tokens(text, model)
 
 
-def truncate_text(text: str, max_tokens: int = 1000) -> str:
+def truncate_text(text: str, max_tokens: int = 1000, model: Optional[str] = None) -> str:
     """
     Trunca texto para no exceder cierto número de tokens.
 
     Args:
         text: Texto a truncar
         max_tokens: Máximo de tokens
+        model: Modelo cuyo tokenizer se usa (por defecto OLLAMA_MODEL)
 
     Returns:
         Texto truncado
     """
-    max_chars = max_tokens * 4
-    if len(text) <= max_chars:
+    truncated = truncate_to_tokens(text, max_tokens, model)
+    if truncated == text:
         return text
 
-    return text[:max_chars] + "..."
+    return truncated + "..."
 
 
 def format_page_types(selected_links: dict) -> str: